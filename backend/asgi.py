@@ -3,6 +3,13 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the site through it to get live verdicts and scoreboards (the server-sent
+event streams in judge/views.py), e.g.:
+
+    gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker
+
+Under WSGI those streams are turned down and the pages poll instead.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
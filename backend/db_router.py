@@ -0,0 +1,62 @@
+# backend/db_router.py
+#
+# Sends the reads of the busiest read-only pages (problem list, leaderboard, OA events)
+# to the Postgres replica, when one is configured (POSTGRES_REPLICA_HOST). Everything
+# else, and every write, goes to the primary, so a user never reads their own writes
+# from a replica that hasn't caught up yet. Cache rebuilds (home/cache.py) read from the
+# primary too: a value built from a lagging replica would be served long after it caught up.
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# Set while a view decorated with @read_from_replica runs
+_use_replica = ContextVar('use_replica', default=False)
+
+REPLICA = 'replica'
+
+# Sessions and logins are always read from the primary: a user who just logged in would
+# otherwise look logged out until the replica caught up
+PRIMARY_ONLY_APPS = {'auth', 'sessions', 'contenttypes'}
+
+
+def read_from_replica(view):
+    """
+    Runs the view's queries against the replica. Only for views that never write and
+    can live with data that is a moment old.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _use_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+@contextmanager
+def read_from_primary():
+    # Sends the reads inside the block to the primary, even within a @read_from_replica view
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema through replication
+        return db == 'default'
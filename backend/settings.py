@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+from dotenv import dotenv_values
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'user_profile',  # Custom app for user profiles
     'contest',  # Custom app for contests
     'oa_events',  # Custom app for organizing events
+    'judge',  # Custom app for the asynchronous judge queue and workers
 ]
 
 MIDDLEWARE = [
@@ -73,12 +75,84 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# "sqlite" (the default, a single file next to the code) or "postgres" for production, where
+# judge verdicts, registrations and comments no longer wait on each other's writes.
+# For tests against a local Postgres stand-in, start one with e.g.
+#   docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=postgres postgres:16
+# and run `DATABASE_ENGINE=postgres POSTGRES_PASSWORD=postgres python manage.py test`
+DATABASE_ENGINE = os.getenv('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgres':
+    _postgres = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('POSTGRES_DB', 'kamand'),
+        'USER': os.getenv('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+        'HOST': os.getenv('POSTGRES_HOST', '127.0.0.1'),
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        # Reused connections are checked before use, so a restarted server doesn't fail a request
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', '0'))
+    if DATABASE_POOL_SIZE:
+        # psycopg's connection pool, shared by the threads of each process (needs CONN_MAX_AGE 0)
+        _postgres['OPTIONS']['pool'] = {'min_size': 1, 'max_size': DATABASE_POOL_SIZE}
+        _postgres['CONN_MAX_AGE'] = 0
+    else:
+        # Without a pool, keep each thread's connection open this many seconds between requests
+        _postgres['CONN_MAX_AGE'] = int(os.getenv('DATABASE_CONN_MAX_AGE', '60'))
+    # Behind PgBouncer in transaction pooling mode, server-side cursors don't survive between statements
+    _postgres['DISABLE_SERVER_SIDE_CURSORS'] = os.getenv('DATABASE_PGBOUNCER', 'False') == 'True'
+
+    DATABASES = {'default': _postgres}
+
+    # A streaming replica for the read-heavy pages (see backend/db_router.py)
+    if os.getenv('POSTGRES_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **_postgres,
+            'OPTIONS': dict(_postgres['OPTIONS']),
+            'HOST': os.getenv('POSTGRES_REPLICA_HOST'),
+            'PORT': os.getenv('POSTGRES_REPLICA_PORT', _postgres['PORT']),
+            # Tests use the primary for both, as there is nothing replicating into a test database
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_ROUTERS = ['backend.db_router.ReplicaRouter']
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {},
+        }
     }
+
+# SQLite profile for single-node deployments: "wal" (the default) lets readers carry on
+# while a verdict is being written and queues writers instead of failing them with
+# "database is locked"; "default" keeps SQLite's own settings (rollback journal).
+# `python manage.py benchmark_sqlite` compares the two.
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'wal')
+# Applied to every new connection in the "wal" profile
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Safe with WAL: a power cut can lose the last commits, but never corrupts the database
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE_MB', '256')) * 1024 * 1024,
+    # Negative: in KiB rather than pages
+    'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE_MB', '64')) * 1024,
+    'temp_store': 'MEMORY',
 }
+# How long a write waits for the lock before giving up with "database is locked"
+SQLITE_BUSY_TIMEOUT_SECONDS = int(os.getenv('SQLITE_BUSY_TIMEOUT_SECONDS', '20'))
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' and SQLITE_PROFILE == 'wal':
+    DATABASES['default']['OPTIONS'].update({
+        'init_command': ''.join(f'PRAGMA {name}={value};' for name, value in SQLITE_PRAGMAS.items()),
+        'timeout': SQLITE_BUSY_TIMEOUT_SECONDS,
+        # Transactions take the write lock when they start, so a reader turning writer
+        # waits for it instead of failing halfway through
+        'transaction_mode': 'IMMEDIATE',
+    })
 
 
 # Password validation
@@ -139,6 +213,117 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache backend: "redis" (shared by every web and judge process, use it in production),
+# "locmem" (per process, the default for development and tests) or "file"
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis' if os.getenv('REDIS_URL') else 'locmem')
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'kamand'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.path.join(BASE_DIR, 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/0')),
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+    }
+}
+# Cached problem / contest / OA event lists and the leaderboard are rebuilt after this many
+# seconds, or as soon as the data behind them changes (see home/cache.py)
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '300'))
+# How long an expired entry is still served while one request rebuilds it
+PAGE_CACHE_STALE_SECONDS = int(os.getenv('PAGE_CACHE_STALE_SECONDS', '600'))
+# Longest a rebuild may hold its lock; requests with nothing to serve wait up to this long
+PAGE_CACHE_LOCK_SECONDS = int(os.getenv('PAGE_CACHE_LOCK_SECONDS', '10'))
+
+# Live updates (verdicts, test progress, scoreboards) pushed to pages as server-sent events.
+# "local" only reaches pages served by the process that judged the submission (fine with
+# JUDGE_RUN_INLINE); "redis" fans out across judge workers and web nodes.
+LIVE_UPDATES_BROKER = os.getenv('LIVE_UPDATES_BROKER', 'redis' if os.getenv('REDIS_URL') else 'local')
+LIVE_UPDATES_REDIS_URL = os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/0')
+# An open event stream re-sends the current state this often, so a missed message is never fatal
+LIVE_UPDATES_KEEPALIVE_SECONDS = int(os.getenv('LIVE_UPDATES_KEEPALIVE_SECONDS', '15'))
+
+# Judge queue settings
+# Submissions are stored as "Queued" and evaluated by `python manage.py run_judge_worker`
+JUDGE_WORKER_CONCURRENCY = int(os.getenv('JUDGE_WORKER_CONCURRENCY', '2'))
+JUDGE_POLL_INTERVAL = float(os.getenv('JUDGE_POLL_INTERVAL', '0.5'))
+# Running tasks whose worker hasn't reported in for this long are assumed to belong to a dead
+# worker and are requeued (workers report on the tasks they run several times per period)
+JUDGE_STALE_TASK_SECONDS = int(os.getenv('JUDGE_STALE_TASK_SECONDS', '600'))
+# A task that crashed or was requeued this many times fails with a System Error instead
+JUDGE_MAX_ATTEMPTS = int(os.getenv('JUDGE_MAX_ATTEMPTS', '3'))
+# Judge inside the web request instead of the worker pool (handy for local development)
+JUDGE_RUN_INLINE = os.getenv('JUDGE_RUN_INLINE', 'False') == 'True'
+# At most this many rejudge tasks run at once across all workers, so the other workers
+# stay free for live submissions during a big rejudge
+JUDGE_REJUDGE_MAX_RUNNING = int(os.getenv('JUDGE_REJUDGE_MAX_RUNNING', '1'))
+# Rejudges are queued this many submissions per transaction
+JUDGE_REJUDGE_BATCH_SIZE = int(os.getenv('JUDGE_REJUDGE_BATCH_SIZE', '500'))
+
+# Warm sandbox pool used by the judge workers (0 disables it and falls back to one `docker run` per test case)
+JUDGE_SANDBOX_POOL_SIZE = int(os.getenv('JUDGE_SANDBOX_POOL_SIZE', '4'))
+# A warm container is thrown away and replaced after this many jobs
+JUDGE_SANDBOX_MAX_USES = int(os.getenv('JUDGE_SANDBOX_MAX_USES', '50'))
+# Idle containers are checked with a no-op `docker exec` if they haven't been used for this many seconds
+JUDGE_SANDBOX_HEALTH_CHECK_INTERVAL = float(os.getenv('JUDGE_SANDBOX_HEALTH_CHECK_INTERVAL', '30'))
+
+# CPU time limit per test case when a problem doesn't set its own, for every language:
+# language multipliers only scale limits set on a problem. (5 s of CPU matches the old
+# 10 s wall clock limit at half a CPU.)
+JUDGE_DEFAULT_TIME_LIMIT_MS = int(os.getenv('JUDGE_DEFAULT_TIME_LIMIT_MS', '5000'))
+# Wall clock budget for judging one submission, all of its sandbox sessions together;
+# cases still running when it is used up are Time Limit Exceeded
+JUDGE_MAX_SUBMISSION_SECONDS = int(os.getenv('JUDGE_MAX_SUBMISSION_SECONDS', '60'))
+
+# Stdout limit per test case when a problem doesn't set its own; writing more is Output Limit Exceeded
+JUDGE_DEFAULT_OUTPUT_LIMIT_MB = int(os.getenv('JUDGE_DEFAULT_OUTPUT_LIMIT_MB', '16'))
+# How much program output / stderr is kept for showing to users (custom runs, error verdicts)
+JUDGE_OUTPUT_PREVIEW_BYTES = int(os.getenv('JUDGE_OUTPUT_PREVIEW_BYTES', str(64 * 1024)))
+
+# Slower languages get their problem's time limit multiplied by this factor unless the
+# problem sets its own multiplier, e.g. JUDGE_TIME_LIMIT_MULTIPLIERS="py=3,cpp=1"
+JUDGE_TIME_LIMIT_MULTIPLIERS = {
+    language: float(factor)
+    for language, factor in (
+        item.split('=', 1) for item in os.getenv('JUDGE_TIME_LIMIT_MULTIPLIERS', 'py=3').split(',') if '=' in item
+    )
+}
+
+# How many test cases of one submission may run at the same time on this node. Keep
+# JUDGE_WORKER_CONCURRENCY x JUDGE_MAX_PARALLEL_CASES at or below the CPU cores available
+# to sandboxes, otherwise cases compete for CPU and timings get unfair.
+JUDGE_MAX_PARALLEL_CASES = int(os.getenv('JUDGE_MAX_PARALLEL_CASES', '2'))
+
+# Extra g++ flags; they are part of the compile cache key
+JUDGE_CPP_FLAGS = os.getenv('JUDGE_CPP_FLAGS', '').split()
+# Content-addressed cache of compiled C++ binaries, kept by the judge process (empty disables it).
+# Sandboxes never see it: a cached binary is sent along with the job that needs it.
+JUDGE_COMPILE_CACHE_DIR = os.getenv('JUDGE_COMPILE_CACHE_DIR', os.path.join(BASE_DIR, 'compile_cache'))
+JUDGE_COMPILE_CACHE_MAX_BYTES = int(os.getenv('JUDGE_COMPILE_CACHE_MAX_MB', '1024')) * 1024 * 1024
+
+# Test case inputs and expected outputs, stored as files named by their sha256 (kept out of
+# MEDIA_ROOT on purpose: test data must never be publicly downloadable). The web app and
+# the judge workers need the same directory; sandboxes never see it, the judge sends them
+# each input with the job.
+JUDGE_TESTDATA_DIR = os.getenv('JUDGE_TESTDATA_DIR', os.path.join(BASE_DIR, 'testdata'))
+
+# AI tutor (see submission/tutor.py): "gemini", or "fake" to answer without calling a
+# model (tests, benchmarks, development without an API key)
+AI_TUTOR_BACKEND = os.getenv('AI_TUTOR_BACKEND', 'gemini')
+AI_TUTOR_MODEL = os.getenv('AI_TUTOR_MODEL', 'gemini-1.5-flash-latest')
+# Read from the environment, or from a .env file next to manage.py
+GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY') or dotenv_values(BASE_DIR / '.env').get('GOOGLE_API_KEY') or ''
+# Answers are cached by problem, code and question for this long
+AI_TUTOR_CACHE_SECONDS = int(os.getenv('AI_TUTOR_CACHE_SECONDS', str(7 * 24 * 3600)))
+# A request gives up waiting for the model after this long
+AI_TUTOR_TIMEOUT_SECONDS = int(os.getenv('AI_TUTOR_TIMEOUT_SECONDS', '60'))
+# Model calls running at once per process; more questions wait their turn
+AI_TUTOR_MAX_CONCURRENT = int(os.getenv('AI_TUTOR_MAX_CONCURRENT', '8'))
+# Questions one user may have waiting for an answer at the same time
+AI_TUTOR_MAX_PER_USER = int(os.getenv('AI_TUTOR_MAX_PER_USER', '1'))
+# How long the fake backend takes to answer
+AI_TUTOR_FAKE_DELAY_MS = int(os.getenv('AI_TUTOR_FAKE_DELAY_MS', '0'))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -28,6 +28,7 @@ urlpatterns = [
     path('profile/', include('user_profile.urls')),  # Include URLs from the user_profile app
     path('contest/', include('contest.urls')),  # Include URLs from the contest app
     path('oa-interviews/', include('oa_events.urls')),  # Include URLs from the oa_events app
+    path('judge/', include('judge.urls')),  # Include URLs from the judge app
 ]
 
 if settings.DEBUG:
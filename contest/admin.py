@@ -1,6 +1,9 @@
 # In contest/admin.py
 from django.contrib import admin
-from .models import Contest, ContestProblem, ContestTestCase, SubAdminRequest, ContestRegistration
+from .models import Contest, ContestProblem, ContestTestCase, SubAdminRequest, ContestRegistration, ContestSubmission
+from judge.admin import message_rejudge_queued
+from judge.forms import TestDataForm
+from judge.queue import enqueue_rejudge
 
 @admin.register(SubAdminRequest)
 class SubAdminRequestAdmin(admin.ModelAdmin):
@@ -23,5 +26,25 @@ class SubAdminRequestAdmin(admin.ModelAdmin):
 # Register other models for basic admin access
 admin.site.register(Contest)
 admin.site.register(ContestProblem)
-admin.site.register(ContestTestCase)
-admin.site.register(ContestRegistration)
\ No newline at end of file
+admin.site.register(ContestRegistration)
+
+@admin.register(ContestTestCase)
+class ContestTestCaseAdmin(admin.ModelAdmin):
+    form = TestDataForm
+    fields = ('problem', 'input_data', 'input_file', 'output_data', 'output_file')
+    list_display = ('__str__', 'input_size', 'output_size')
+
+
+@admin.register(ContestSubmission)
+class ContestSubmissionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'contest', 'problem', 'user', 'language', 'verdict', 'submitted_at')
+    list_filter = ('verdict', 'contest')
+    search_fields = ('user__username', 'problem__title')
+    raw_id_fields = ('contest', 'problem', 'user')
+    actions = ['rejudge_submissions']
+
+    @admin.action(description="Rejudge selected submissions")
+    def rejudge_submissions(self, request, queryset):
+        rejudge = enqueue_rejudge(contest_submissions=queryset, created_by=request.user,
+                                  description=f"Admin: {queryset.count()} selected contest submission(s)")
+        message_rejudge_queued(self, request, rejudge)
@@ -14,7 +14,7 @@ class SubAdminRequestForm(forms.ModelForm):
 class ContestForm(forms.ModelForm):
     class Meta:
         model = Contest
-        fields = ['title', 'description', 'start_time', 'end_time']
+        fields = ['title', 'description', 'start_time', 'end_time', 'scoring', 'penalty_minutes', 'freeze_minutes']
         # Use Bootstrap's datetime-local input widgets
         widgets = {
             'start_time': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
@@ -24,7 +24,11 @@ class ContestForm(forms.ModelForm):
 class ContestProblemForm(forms.ModelForm):
     class Meta:
         model = ContestProblem
-        fields = ['title', 'description', 'difficulty']
+        fields = ['title', 'description', 'difficulty', 'points', 'time_limit', 'memory_limit', 'output_limit',
+                  'checker', 'checker_abs_error', 'checker_rel_error', 'checker_language', 'checker_code']
+        widgets = {
+            'checker_code': forms.Textarea(attrs={'rows': 6, 'placeholder': 'Only needed for a special judge'}),
+        }
         
 ContestProblemFormSet = modelformset_factory(
     ContestProblem,
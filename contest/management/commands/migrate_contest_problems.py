@@ -1,53 +1,106 @@
-from django.core.management.base import BaseCommand
+import argparse
+import datetime
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from contest.models import Contest, ContestProblem
+from django.utils import timezone
+from contest.models import Contest, ContestProblem, ContestTestCase, MigratedProblem
+from home.cache import invalidate
+from problems import search
 from problems.models import Problem, TestCase
 
+# What a problem set problem copies from its contest problem
+COPIED_FIELDS = ['title', 'description', 'difficulty', 'memory_limit', 'time_limit', 'output_limit',
+                 'language_time_multipliers', 'checker', 'checker_abs_error', 'checker_rel_error',
+                 'checker_language', 'checker_code']
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'"{value}" is not a date like 2025-01-31')
+
+
 class Command(BaseCommand):
-    help = 'Migrates problems from a finished contest to the main problem set.'
+    help = ('Copies the problems of finished contests (by id, or those that ended in a date range) to the main '
+            'problem set. Every copied problem is recorded, so running it again only copies what is new, and an '
+            'interrupted run continues where it stopped.')
 
     def add_arguments(self, parser):
-        # Add an argument to specify which contest to migrate
-        parser.add_argument('contest_id', type=int, help='The ID of the contest to migrate.')
+        parser.add_argument('contest_id', type=int, nargs='*', help='The IDs of the contests to migrate.')
+        parser.add_argument('--ended-after', type=_date, help='Migrate the contests that ended on or after this date.')
+        parser.add_argument('--ended-before', type=_date, help='... and on or before this date.')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Problems copied per transaction; their test cases are inserted in the same batches.')
 
     def handle(self, *args, **options):
-        contest_id = options['contest_id']
-        try:
-            contest = Contest.objects.get(id=contest_id)
-        except Contest.DoesNotExist:
-            self.stdout.write(self.style.ERROR(f'Contest with ID "{contest_id}" does not exist.'))
-            return
+        contest_ids = options['contest_id']
+        ended_after, ended_before = options['ended_after'], options['ended_before']
+        if not contest_ids and not ended_after and not ended_before:
+            raise CommandError('Name the contests to migrate, or a date range with --ended-after / --ended-before.')
 
-        self.stdout.write(f'Starting migration for contest: "{contest.title}"...')
+        contests = Contest.objects.all()
+        if contest_ids:
+            contests = contests.filter(id__in=contest_ids)
+            missing = set(contest_ids) - set(contests.values_list('id', flat=True))
+            if missing:
+                raise CommandError(f'Contest(s) {", ".join(map(str, sorted(missing)))} do not exist.')
+        if ended_after:
+            contests = contests.filter(end_time__date__gte=ended_after)
+        if ended_before:
+            contests = contests.filter(end_time__date__lte=ended_before)
+        # Problems of a running contest must not show up in the problem set
+        running = contests.filter(end_time__gt=timezone.now())
+        if running.exists():
+            self.stdout.write(self.style.WARNING(
+                f'Skipping contests that have not ended yet: {", ".join(c.title for c in running)}.'))
+        contests = contests.filter(end_time__lte=timezone.now())
 
-        try:
-            # Use a transaction to ensure that if anything fails, the database is rolled back
-            with transaction.atomic():
-                contest_problems = ContestProblem.objects.filter(contest=contest)
-                if not contest_problems.exists():
-                    self.stdout.write(self.style.WARNING('This contest has no problems to migrate.'))
-                    return
-
-                for contest_problem in contest_problems:
-                    # Create a new main problem
-                    main_problem = Problem.objects.create(
-                        title=contest_problem.title,
-                        description=contest_problem.description,
-                        difficulty=contest_problem.difficulty,
-                        memory_limit=256 # Or another default
-                    )
-                    
-                    # Copy all associated test cases
-                    for contest_test_case in contest_problem.test_cases.all():
-                        TestCase.objects.create(
-                            problem=main_problem,
-                            input_data=contest_test_case.input_data,
-                            output_data=contest_test_case.output_data
-                        )
-                    self.stdout.write(f'  - Migrated problem: "{contest_problem.title}"')
-
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'An error occurred during migration: {e}'))
+        # Contest problems without a record are the ones still to copy
+        pending = ContestProblem.objects.filter(contest__in=contests, migration__isnull=True).order_by('id')
+        total = pending.count()
+        if not total:
+            self.stdout.write(self.style.SUCCESS('Nothing to migrate: every problem has been copied already.'))
             return
+        self.stdout.write(f'Migrating {total} problem(s) from {contests.count()} contest(s)...')
+
+        batch_size = options['batch_size']
+        migrated = test_count = 0
+        while True:
+            # One transaction per batch: a batch is copied completely (with its records) or
+            # not at all, and a run that stops keeps the batches it finished
+            with transaction.atomic():
+                batch = list(pending.only(*COPIED_FIELDS)[:batch_size])
+                if not batch:
+                    break
+                problems = Problem.objects.bulk_create(
+                    [Problem(**{field: getattr(contest_problem, field) for field in COPIED_FIELDS})
+                     for contest_problem in batch])
+                copies = {contest_problem.id: problem for contest_problem, problem in zip(batch, problems)}
+
+                # The test data files are shared: only their hashes are copied
+                cases = ContestTestCase.objects.filter(problem__in=batch).order_by('id').values_list(
+                    'problem_id', 'input_hash', 'input_size', 'output_hash', 'output_size')
+                test_cases = [
+                    TestCase(problem=copies[problem_id], input_hash=input_hash, input_size=input_size,
+                             output_hash=output_hash, output_size=output_size)
+                    for problem_id, input_hash, input_size, output_hash, output_size in cases.iterator()
+                ]
+                TestCase.objects.bulk_create(test_cases, batch_size=500)
+
+                # A concurrent run copying the same problems fails here on the unique
+                # contest_problem, and its batch is rolled back
+                MigratedProblem.objects.bulk_create(
+                    [MigratedProblem(contest_problem=contest_problem, problem=copies[contest_problem.id])
+                     for contest_problem in batch])
+                # bulk_create sends no signals: index the new problems here
+                search.index_problems([problem.pk for problem in problems])
+
+            migrated += len(batch)
+            test_count += len(test_cases)
+            for contest_problem in batch:
+                self.stdout.write(f'  - Migrated problem: "{contest_problem.title}"')
 
-        self.stdout.write(self.style.SUCCESS(f'Successfully migrated all problems from "{contest.title}".'))
\ No newline at end of file
+        invalidate('problems', 'leaderboard')
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully migrated {migrated} problem(s) with {test_count} test case(s).'))
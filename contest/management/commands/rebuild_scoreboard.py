@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from contest.models import Contest
+from contest import scoreboard
+
+
+class Command(BaseCommand):
+    help = "Rebuilds a contest's scoreboard from its submissions (normally it is kept up to date as verdicts come in)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('contest_id', type=int, nargs='+')
+
+    def handle(self, *args, **options):
+        for contest_id in options['contest_id']:
+            try:
+                contest = Contest.objects.get(id=contest_id)
+            except Contest.DoesNotExist:
+                raise CommandError(f'Contest {contest_id} does not exist.')
+            scoreboard.rebuild(contest)
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt the scoreboard of "{contest.title}": {contest.scoreboard_entries.count()} entries.'))
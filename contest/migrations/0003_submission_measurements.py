@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0002_contestsubmission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contestsubmission',
+            name='case_results',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='contestsubmission',
+            name='memory_kb',
+            field=models.PositiveIntegerField(blank=True, help_text='Peak resident memory of a test case in KB', null=True),
+        ),
+        migrations.AddField(
+            model_name='contestsubmission',
+            name='time_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Peak CPU time of a test case in ms', null=True),
+        ),
+        migrations.AddField(
+            model_name='contestsubmission',
+            name='wall_time_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Peak wall clock time of a test case in ms', null=True),
+        ),
+    ]
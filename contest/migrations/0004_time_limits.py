@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0003_submission_measurements'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contestproblem',
+            name='language_time_multipliers',
+            field=models.JSONField(blank=True, default=dict, help_text='Optional per-language time limit multipliers, e.g. {"py": 3}. Languages not listed use the site defaults.'),
+        ),
+        migrations.AddField(
+            model_name='contestproblem',
+            name='memory_limit',
+            field=models.IntegerField(default=256, help_text='Memory limit in MB'),
+        ),
+        migrations.AddField(
+            model_name='contestproblem',
+            name='time_limit',
+            field=models.IntegerField(blank=True, default=None, help_text='CPU time limit per test case in ms (empty: the site default)', null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0004_time_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contestproblem',
+            name='checker',
+            field=models.CharField(choices=[('line', 'Line by line (ignores trailing whitespace)'), ('token', 'Token by token'), ('float', 'Floating point tokens'), ('special', 'Special judge program')], default='line', help_text='How outputs are compared with the expected answers', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='contestproblem',
+            name='checker_abs_error',
+            field=models.FloatField(default=1e-06, help_text='Allowed absolute error for the float checker'),
+        ),
+        migrations.AddField(
+            model_name='contestproblem',
+            name='checker_code',
+            field=models.TextField(blank=True, help_text='Special judge source. It is run as `checker input.txt output.txt answer.txt` and accepts with exit code 0 (1 or 2 mean wrong answer).'),
+        ),
+        migrations.AddField(
+            model_name='contestproblem',
+            name='checker_language',
+            field=models.CharField(choices=[('cpp', 'C++'), ('py', 'Python')], default='cpp', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='contestproblem',
+            name='checker_rel_error',
+            field=models.FloatField(default=1e-06, help_text='Allowed relative error for the float checker'),
+        ),
+    ]
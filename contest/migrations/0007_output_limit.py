@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0006_testdata_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contestproblem',
+            name='output_limit',
+            field=models.IntegerField(default=16, help_text='Output limit per test case in MB'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0007_output_limit'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contest',
+            name='freeze_minutes',
+            field=models.PositiveIntegerField(default=0, help_text='Freeze the public scoreboard for the last N minutes of the contest (0 for no freeze)'),
+        ),
+        migrations.AddField(
+            model_name='contest',
+            name='penalty_minutes',
+            field=models.PositiveIntegerField(default=20, help_text='ICPC penalty per rejected attempt on a solved problem'),
+        ),
+        migrations.AddField(
+            model_name='contest',
+            name='scoring',
+            field=models.CharField(choices=[('icpc', 'ICPC: problems solved, then penalty time'), ('ioi', 'IOI: partial points per passed test case')], default='icpc', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='contestproblem',
+            name='points',
+            field=models.PositiveIntegerField(default=100, help_text='Points for solving it in an IOI contest'),
+        ),
+        migrations.CreateModel(
+            name='ScoreboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Judged attempts (ICPC: rejected ones before the first Accepted)')),
+                ('solved_at', models.DateTimeField(blank=True, help_text='Submission time of the first Accepted', null=True)),
+                ('score', models.FloatField(default=0, help_text='Best IOI points')),
+                ('frozen_attempts', models.PositiveIntegerField(default=0)),
+                ('frozen_solved_at', models.DateTimeField(blank=True, null=True)),
+                ('frozen_score', models.FloatField(default=0)),
+                ('pending', models.PositiveIntegerField(default=0, help_text='Submissions made during the freeze')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('contest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scoreboard_entries', to='contest.contest')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contest.contestproblem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('contest', 'user', 'problem'), name='scoreboard_entry_unique')],
+            },
+        ),
+    ]
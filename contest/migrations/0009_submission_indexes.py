@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0008_scoreboard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contestsubmission',
+            index=models.Index(fields=['user', 'contest', '-submitted_at'], name='contest_sub_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contestsubmission',
+            index=models.Index(fields=['contest', 'user', 'problem', 'submitted_at'], name='contest_sub_cell_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Records which problem set problem each contest problem was copied to, starting with
+# the copies migrate_contest_problems made before it kept such a record
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_earlier_copies(apps, schema_editor):
+    # An earlier copy is a problem set problem with the same title and statement; only
+    # unambiguous matches are recorded, the rest can still be migrated (again)
+    ContestProblem = apps.get_model('contest', 'contestproblem')
+    Problem = apps.get_model('problems', 'problem')
+    MigratedProblem = apps.get_model('contest', 'migratedproblem')
+    copies = {}
+    for problem_id, title, description in Problem.objects.values_list('id', 'title', 'description').iterator():
+        copies.setdefault((title, description), []).append(problem_id)
+    links = []
+    for contest_problem_id, title, description in ContestProblem.objects.values_list(
+            'id', 'title', 'description').iterator():
+        matches = copies.get((title, description), [])
+        if len(matches) == 1:
+            links.append(MigratedProblem(contest_problem_id=contest_problem_id, problem_id=matches[0]))
+    MigratedProblem.objects.bulk_create(links, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0010_submission_paging_index'),
+        ('problems', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MigratedProblem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('migrated_at', models.DateTimeField(auto_now_add=True)),
+                ('contest_problem', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='migration', to='contest.contestproblem')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='problems.problem')),
+            ],
+        ),
+        migrations.RunPython(link_earlier_copies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Time limits are added as nullable in 0004_time_limits; databases that added them with the
+# old 2000 ms default get the nullable column here, and keep the limits they store
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0011_migrated_problems'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contestproblem',
+            name='time_limit',
+            field=models.IntegerField(blank=True, help_text='CPU time limit per test case in ms (empty: the site default)', null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Keeps verdicts short: compiler and runtime error output moves out of the verdict into
+# verdict_details (on PostgreSQL such verdicts never fit; SQLite stored them whole)
+
+from django.db import migrations, models
+from judge.engine import error_verdict
+
+
+def split_verdicts(apps, schema_editor):
+    Model = apps.get_model('contest', 'contestsubmission')
+    for submission in Model.objects.filter(verdict__startswith='Execution Error').iterator():
+        submission.verdict, submission.verdict_details = error_verdict(submission.verdict)
+        submission.save(update_fields=['verdict', 'verdict_details'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contest', '0012_default_time_limit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contestsubmission',
+            name='verdict_details',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(split_verdicts, migrations.RunPython.noop),
+    ]
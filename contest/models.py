@@ -1,16 +1,28 @@
 # In contest/models.py
+import datetime
+from django.conf import settings
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from django.utils import timezone
+from judge.testdata import TestData
 
 # Model to store the main details of a contest
 class Contest(models.Model):
+    SCORING_CHOICES = [
+        ('icpc', 'ICPC: problems solved, then penalty time'),
+        ('ioi', 'IOI: partial points per passed test case'),
+    ]
     title = models.CharField(max_length=200)
     description = models.TextField()
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    scoring = models.CharField(max_length=10, choices=SCORING_CHOICES, default='icpc')
+    penalty_minutes = models.PositiveIntegerField(default=20, help_text="ICPC penalty per rejected attempt on a solved problem")
+    freeze_minutes = models.PositiveIntegerField(default=0,
+                                                 help_text="Freeze the public scoreboard for the last N minutes of the contest (0 for no freeze)")
 
     def __str__(self):
         return self.title
@@ -21,6 +33,19 @@ class Contest(models.Model):
         now = timezone.now()
         return self.start_time <= now <= self.end_time
 
+    # When the public scoreboard stops showing new results (None without a freeze)
+    @property
+    def freeze_time(self):
+        if not self.freeze_minutes:
+            return None
+        return self.end_time - datetime.timedelta(minutes=self.freeze_minutes)
+
+    # The scoreboard stays frozen until the contest is over
+    @property
+    def is_frozen(self):
+        freeze_time = self.freeze_time
+        return freeze_time is not None and freeze_time <= timezone.now() < self.end_time
+
 # Model for problems that are specific to a contest
 class ContestProblem(models.Model):
     DIFFICULTY_CHOICES = [
@@ -28,24 +53,67 @@ class ContestProblem(models.Model):
         ('Medium', 'Medium'),
         ('Hard', 'Hard'),
     ]
+    CHECKER_CHOICES = [
+        ('line', 'Line by line (ignores trailing whitespace)'),
+        ('token', 'Token by token'),
+        ('float', 'Floating point tokens'),
+        ('special', 'Special judge program'),
+    ]
+    CHECKER_LANGUAGE_CHOICES = [
+        ('cpp', 'C++'),
+        ('py', 'Python'),
+    ]
     contest = models.ForeignKey(Contest, related_name='problems', on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     description = models.TextField()
     difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES)
-    # You can add fields like 'points' here later if you want
+    memory_limit = models.IntegerField(default=256, help_text="Memory limit in MB")
+    time_limit = models.IntegerField(null=True, blank=True,
+                                     help_text="CPU time limit per test case in ms (empty: the site default)")
+    output_limit = models.IntegerField(default=16, help_text="Output limit per test case in MB")
+    language_time_multipliers = models.JSONField(default=dict, blank=True,
+                                                 help_text='Optional per-language time limit multipliers, e.g. {"py": 3}. '
+                                                           'Languages not listed use the site defaults.')
+    checker = models.CharField(max_length=10, choices=CHECKER_CHOICES, default='line',
+                               help_text="How outputs are compared with the expected answers")
+    checker_abs_error = models.FloatField(default=1e-6, help_text="Allowed absolute error for the float checker")
+    checker_rel_error = models.FloatField(default=1e-6, help_text="Allowed relative error for the float checker")
+    checker_language = models.CharField(max_length=10, choices=CHECKER_LANGUAGE_CHOICES, default='cpp')
+    checker_code = models.TextField(blank=True,
+                                    help_text="Special judge source. It is run as `checker input.txt output.txt answer.txt` "
+                                              "and accepts with exit code 0 (1 or 2 mean wrong answer).")
+    points = models.PositiveIntegerField(default=100, help_text="Points for solving it in an IOI contest")
 
     def __str__(self):
         return f"{self.title} (Contest: {self.contest.title})"
 
-# Model for test cases specific to a contest problem
-class ContestTestCase(models.Model):
+    @property
+    def effective_time_limit(self):
+        # The CPU time limit in ms: the problem's own (before language multipliers) or the
+        # site default, which applies to every language as it is
+        return self.time_limit or settings.JUDGE_DEFAULT_TIME_LIMIT_MS
+
+    def clean(self):
+        if self.checker == 'special' and not self.checker_code.strip():
+            raise ValidationError({'checker_code': "A special judge needs its checker source code."})
+
+# Model for test cases specific to a contest problem (the data itself lives in files, see judge.testdata)
+class ContestTestCase(TestData):
     problem = models.ForeignKey(ContestProblem, related_name='test_cases', on_delete=models.CASCADE)
-    input_data = models.TextField()
-    output_data = models.TextField()
 
     def __str__(self):
         return f"Test Case for {self.problem.title}"
 
+# Which problem of the main problem set a contest problem was copied to by the
+# migrate_contest_problems command, so it is only ever copied once
+class MigratedProblem(models.Model):
+    contest_problem = models.OneToOneField(ContestProblem, related_name='migration', on_delete=models.CASCADE)
+    problem = models.ForeignKey('problems.Problem', related_name='+', on_delete=models.CASCADE)
+    migrated_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.contest_problem.title} -> problem {self.problem_id}"
+
 # Model for users to register for a contest
 class ContestRegistration(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -81,7 +149,47 @@ class ContestSubmission(models.Model):
     language = models.CharField(max_length=50)
     code = models.TextField()
     verdict = models.CharField(max_length=100, blank=True)
+    # A short label like "Runtime Error"; the compiler's or the program's error output goes here
+    verdict_details = models.TextField(blank=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
+    # Measurements from the judge: the slowest / hungriest test case, plus every case that ran
+    time_ms = models.PositiveIntegerField(null=True, blank=True, help_text="Peak CPU time of a test case in ms")
+    wall_time_ms = models.PositiveIntegerField(null=True, blank=True, help_text="Peak wall clock time of a test case in ms")
+    memory_kb = models.PositiveIntegerField(null=True, blank=True, help_text="Peak resident memory of a test case in KB")
+    case_results = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            # A user's submissions in a contest, newest first, a page at a time (my_contest_submissions)
+            models.Index(fields=['user', 'contest', '-submitted_at', '-id'], name='contest_sub_user_idx'),
+            # One scoreboard cell's submissions in order (contest/scoreboard.py refresh_entry and rebuild)
+            models.Index(fields=['contest', 'user', 'problem', 'submitted_at'], name='contest_sub_cell_idx'),
+        ]
+
+    def __str__(self):
+        return f"Submission by {self.user.username} for {self.problem.title} in {self.contest.title}"
+
+# One cell of a contest scoreboard: how a user is doing on one problem. It is rebuilt
+# from that user's submissions to that problem whenever one of them is judged (see
+# contest/scoreboard.py), so showing the standings never has to look at submissions.
+# The frozen_* fields only count submissions made before the scoreboard freeze.
+class ScoreboardEntry(models.Model):
+    contest = models.ForeignKey(Contest, on_delete=models.CASCADE, related_name='scoreboard_entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    problem = models.ForeignKey(ContestProblem, on_delete=models.CASCADE)
+    attempts = models.PositiveIntegerField(default=0, help_text="Judged attempts (ICPC: rejected ones before the first Accepted)")
+    solved_at = models.DateTimeField(null=True, blank=True, help_text="Submission time of the first Accepted")
+    score = models.FloatField(default=0, help_text="Best IOI points")
+    frozen_attempts = models.PositiveIntegerField(default=0)
+    frozen_solved_at = models.DateTimeField(null=True, blank=True)
+    frozen_score = models.FloatField(default=0)
+    pending = models.PositiveIntegerField(default=0, help_text="Submissions made during the freeze")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['contest', 'user', 'problem'], name='scoreboard_entry_unique'),
+        ]
 
     def __str__(self):
-        return f"Submission by {self.user.username} for {self.problem.title} in {self.contest.title}"
\ No newline at end of file
+        return f"{self.user.username} on {self.problem.title}"
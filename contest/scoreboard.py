@@ -0,0 +1,200 @@
+# contest/scoreboard.py
+#
+# Contest standings. Every judged submission rebuilds a single ScoreboardEntry (one
+# user on one problem) from that user's submissions to that problem, which handles
+# rejudges and deletions as well as new verdicts. The standings themselves are built
+# from the entries alone and cached until an entry of the contest changes, so
+# refreshing the scoreboard never reads a submission.
+from collections import defaultdict
+from django.contrib.auth.models import User
+from django.db import transaction
+from judge import events
+from judge.engine import PENDING_VERDICTS
+from home.cache import get_or_build, invalidate
+from .models import ContestSubmission, ScoreboardEntry
+
+# Cached standings are rebuilt at least this often, even without new verdicts
+STANDINGS_TIMEOUT = 60
+# The contest settings every cell depends on: changing one means a rebuild
+SETTINGS_FIELDS = ('scoring', 'penalty_minutes', 'start_time', 'end_time', 'freeze_minutes')
+
+
+def _cache_group(contest_id):
+    return f'scoreboard-{contest_id}'
+
+
+def counts_as_attempt(verdict):
+    # Submissions still being judged, compile errors and judge failures cost nothing
+    return (verdict not in PENDING_VERDICTS and 'Compilation Error' not in verdict
+            and not verdict.startswith('System Error'))
+
+
+def submission_points(submission, problem, case_count):
+    # IOI: the problem's points in proportion to the test cases passed
+    if submission.verdict == "Accepted":
+        return float(problem.points)
+    if not case_count:
+        return 0.0
+    passed = sum(1 for case in submission.case_results if case.get('verdict') == "Accepted")
+    return round(problem.points * min(passed, case_count) / case_count, 2)
+
+
+def summarize(contest, problem, submissions, case_count):
+    """
+    Returns (attempts, solved_at, score) for one user's submissions to one problem,
+    given in submission order.
+    """
+    attempts, solved_at, score = 0, None, 0.0
+    for submission in submissions:
+        if not counts_as_attempt(submission.verdict):
+            continue
+        if contest.scoring == 'ioi':
+            attempts += 1
+            score = max(score, submission_points(submission, problem, case_count))
+            if submission.verdict == "Accepted" and solved_at is None:
+                solved_at = submission.submitted_at
+        elif submission.verdict == "Accepted":
+            # ICPC: only the attempts before the first Accepted count
+            solved_at = submission.submitted_at
+            break
+        else:
+            attempts += 1
+    return attempts, solved_at, score
+
+
+def refresh_entry(contest, user_id, problem):
+    """
+    Rebuilds one scoreboard cell from the user's submissions to the problem.
+    """
+    submissions = list(ContestSubmission.objects.filter(contest=contest, user_id=user_id, problem=problem)
+                       .only('verdict', 'submitted_at', 'case_results').order_by('submitted_at', 'id'))
+    if not submissions:
+        ScoreboardEntry.objects.filter(contest=contest, user_id=user_id, problem=problem).delete()
+        invalidate(_cache_group(contest.id))
+        transaction.on_commit(lambda: publish_delta(contest, user_id, problem.id))
+        return None
+
+    case_count = problem.test_cases.count() if contest.scoring == 'ioi' else 0
+    freeze_time = contest.freeze_time
+    before_freeze = [sub for sub in submissions if freeze_time is None or sub.submitted_at < freeze_time]
+    attempts, solved_at, score = summarize(contest, problem, submissions, case_count)
+    frozen_attempts, frozen_solved_at, frozen_score = summarize(contest, problem, before_freeze, case_count)
+
+    entry, _ = ScoreboardEntry.objects.update_or_create(
+        contest=contest, user_id=user_id, problem=problem,
+        defaults={
+            'attempts': attempts,
+            'solved_at': solved_at,
+            'score': score,
+            'frozen_attempts': frozen_attempts,
+            'frozen_solved_at': frozen_solved_at,
+            'frozen_score': frozen_score,
+            'pending': len(submissions) - len(before_freeze),
+        },
+    )
+    invalidate(_cache_group(contest.id))
+    # Pages are told about the cell once it is committed, or they would fetch the old one
+    transaction.on_commit(lambda: publish_delta(contest, user_id, problem.id))
+    return entry
+
+
+def rebuild(contest, problem=None):
+    """
+    Rebuilds every cell of a contest (or of one of its problems), e.g. after its
+    scoring, penalty or freeze settings changed.
+    """
+    cells = ContestSubmission.objects.filter(contest=contest)
+    if problem is not None:
+        cells = cells.filter(problem=problem)
+    problems = {p.id: p for p in contest.problems.all()}
+    stale = ScoreboardEntry.objects.filter(contest=contest)
+    if problem is not None:
+        stale = stale.filter(problem=problem)
+    stale.delete()
+    for user_id, problem_id in cells.values_list('user_id', 'problem_id').distinct():
+        refresh_entry(contest, user_id, problems[problem_id])
+
+
+def _new_row():
+    return {'cells': {}, 'solved': 0, 'penalty': 0, 'score': 0.0}
+
+
+def _add_entry(row, contest, entry, frozen):
+    # Adds one entry's cell to a standings row and updates the row's totals
+    if frozen:
+        attempts, solved_at, score = entry.frozen_attempts, entry.frozen_solved_at, entry.frozen_score
+        pending = entry.pending
+    else:
+        attempts, solved_at, score, pending = entry.attempts, entry.solved_at, entry.score, 0
+    cell = {'attempts': attempts, 'solved': solved_at is not None, 'minutes': None,
+            'score': score, 'pending': pending}
+    if solved_at is not None:
+        cell['minutes'] = max(0, int((solved_at - contest.start_time).total_seconds() // 60))
+        row['solved'] += 1
+        row['penalty'] += cell['minutes'] + attempts * contest.penalty_minutes
+    row['score'] += score
+    row['cells'][entry.problem_id] = cell
+
+
+def publish_delta(contest, user_id, problem_id):
+    """
+    Pushes the changed cell and the user's new totals to open scoreboard pages, as
+    the public sees them (so nothing leaks during a freeze).
+    """
+    frozen = contest.is_frozen
+    row = _new_row()
+    username = None
+    for entry in ScoreboardEntry.objects.filter(contest=contest, user_id=user_id).select_related('user'):
+        _add_entry(row, contest, entry, frozen)
+        username = entry.user.username
+    if username is None:
+        # The user's last cell was removed
+        username = User.objects.filter(id=user_id).values_list('username', flat=True).first()
+    events.publish(events.scoreboard_channel(contest.id), 'cell', {
+        'username': username,
+        'problem_id': problem_id,
+        'cell': row['cells'].get(problem_id),
+        'solved': row['solved'],
+        'penalty': row['penalty'],
+        'score': round(row['score'], 2),
+    })
+
+
+def _build_standings(contest, frozen):
+    problems = list(contest.problems.order_by('id').values('id', 'title', 'points'))
+    rows = defaultdict(_new_row)
+    entries = ScoreboardEntry.objects.filter(contest=contest).select_related('user')
+
+    for entry in entries:
+        _add_entry(rows[entry.user.username], contest, entry, frozen)
+
+    if contest.scoring == 'ioi':
+        key = lambda item: (-item[1]['score'], item[0])
+        rank_key = lambda row: row['score']
+    else:
+        key = lambda item: (-item[1]['solved'], item[1]['penalty'], item[0])
+        rank_key = lambda row: (row['solved'], row['penalty'])
+
+    standings = []
+    for position, (username, row) in enumerate(sorted(rows.items(), key=key), start=1):
+        # Tied users share a rank; the next one skips ahead (1, 2, 2, 4)
+        if standings and rank_key(standings[-1]) == rank_key(row):
+            row['rank'] = standings[-1]['rank']
+        else:
+            row['rank'] = position
+        row['username'] = username
+        row['score'] = round(row['score'], 2)
+        row['cells'] = [row['cells'].get(p['id']) for p in problems]
+        standings.append(row)
+
+    return {'problems': problems, 'rows': standings, 'frozen': frozen}
+
+
+def get_standings(contest, frozen):
+    """
+    The contest's standings as plain data, from the cache when nothing has been judged
+    since they were built. `frozen` picks the public view during a scoreboard freeze.
+    """
+    view = 'frozen' if frozen else 'live'
+    return get_or_build(f'scoreboard:{contest.id}:{view}', lambda: _build_standings(contest, frozen),
+                        groups=[_cache_group(contest.id)], timeout=STANDINGS_TIMEOUT)
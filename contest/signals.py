@@ -0,0 +1,67 @@
+# In contest/signals.py
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from judge.engine import PENDING_VERDICTS
+from .models import Contest, ContestProblem, ContestSubmission
+from . import scoreboard
+
+
+# Each judged submission updates its own scoreboard cell
+@receiver(post_save, sender=ContestSubmission)
+def submission_judged(sender, instance, **kwargs):
+    # Nothing changes on the scoreboard until the verdict is in
+    if instance.verdict in PENDING_VERDICTS:
+        return
+    scoreboard.refresh_entry(instance.contest, instance.user_id, instance.problem)
+
+
+@receiver(post_delete, sender=ContestSubmission)
+def submission_deleted(sender, instance, **kwargs):
+    try:
+        scoreboard.refresh_entry(instance.contest, instance.user_id, instance.problem)
+    except (Contest.DoesNotExist, ContestProblem.DoesNotExist):
+        # Deleted along with its contest or problem, and so is its scoreboard cell
+        pass
+
+
+def _touches_settings(update_fields):
+    return update_fields is None or not set(update_fields).isdisjoint(scoreboard.SETTINGS_FIELDS)
+
+
+@receiver(pre_save, sender=Contest)
+def contest_saving(sender, instance, update_fields=None, **kwargs):
+    # Remembers the stored settings so contest_saved can tell whether they changed
+    instance._stored_settings = None
+    if instance.pk is not None and _touches_settings(update_fields):
+        instance._stored_settings = (Contest.objects.filter(pk=instance.pk)
+                                     .values_list(*scoreboard.SETTINGS_FIELDS).first())
+
+
+# Scoring, penalty, timing or freeze settings apply to every cell; editing the title or
+# description leaves the scoreboard alone
+@receiver(post_save, sender=Contest)
+def contest_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or not _touches_settings(update_fields):
+        return
+    settings = tuple(getattr(instance, name) for name in scoreboard.SETTINGS_FIELDS)
+    if instance._stored_settings != settings:
+        scoreboard.rebuild(instance)
+
+
+@receiver(pre_save, sender=ContestProblem)
+def problem_saving(sender, instance, update_fields=None, **kwargs):
+    # Remembers the stored points so problem_saved can tell whether they changed
+    instance._stored_points = None
+    if instance.pk is not None and (update_fields is None or 'points' in update_fields):
+        instance._stored_points = (ContestProblem.objects.filter(pk=instance.pk)
+                                   .values_list('points', flat=True).first())
+
+
+# The points of a problem only matter for IOI scoring; editing its statement leaves the
+# scoreboard alone
+@receiver(post_save, sender=ContestProblem)
+def problem_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'points' not in update_fields):
+        return
+    if instance._stored_points != instance.points and instance.contest.scoring == 'ioi':
+        scoreboard.rebuild(instance.contest, instance)
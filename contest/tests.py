@@ -1,3 +1,200 @@
+import datetime
+import io
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from home.testing import QueryPlanMixin
+from problems.models import Problem, TestCase as ProblemTestCase
+from . import scoreboard
+from .models import Contest, ContestProblem, ContestRegistration, ContestSubmission, ContestTestCase, MigratedProblem
 
-# Create your tests here.
+
+class ContestQueryTests(QueryPlanMixin, TestCase):
+    """
+    Query counts and plans of the contest pages that are hit hardest while a contest runs.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.user = User.objects.create_user('alice', password='pw')
+        other = User.objects.create_user('bob', password='pw')
+        cls.contest = Contest.objects.create(title='Round 1', description='-', created_by=other,
+                                             start_time=now - datetime.timedelta(hours=1),
+                                             end_time=now + datetime.timedelta(hours=1))
+        other_contest = Contest.objects.create(title='Round 2', description='-', created_by=other,
+                                               start_time=now - datetime.timedelta(hours=1),
+                                               end_time=now + datetime.timedelta(hours=1))
+        cls.problems = [ContestProblem.objects.create(contest=contest, title=f'P{i}', description='-',
+                                                      difficulty='Easy')
+                        for contest in (cls.contest, other_contest) for i in range(2)]
+        for user in (cls.user, other):
+            for problem in cls.problems:
+                ContestRegistration.objects.get_or_create(user=user, contest=problem.contest)
+                for verdict in ('Wrong Answer', 'Accepted'):
+                    ContestSubmission.objects.create(contest=problem.contest, problem=problem, user=user,
+                                                     language='py', code='print(1)', verdict=verdict)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_my_contest_submissions(self):
+        # Contest, session, user, the user's permissions (two, for the navigation bar) and the submissions
+        with self.assertNumQueries(6) as queries:
+            response = self.client.get(reverse('my_contest_submissions', args=[self.contest.id]))
+        self.assertEqual(len(response.context['submissions']), 4)
+        sql = self.query_on(queries, 'contest_contestsubmission')
+        self.assertUsesIndex(sql, 'contest_sub_user_idx')
+        # The code is only loaded when a row is expanded
+        self.assertNotIn('"contest_contestsubmission"."code"', sql)
+
+    @mock.patch('contest.views.SUBMISSIONS_PAGE_SIZE', 3)
+    def test_my_contest_submissions_pages(self):
+        url = reverse('my_contest_submissions', args=[self.contest.id])
+        first = self.client.get(url)
+        second = self.client.get(url, {'before': first.context['next_cursor']})
+        self.assertEqual(len(first.context['submissions']), 3)
+        self.assertEqual(len(second.context['submissions']), 1)
+        self.assertEqual(second.context['next_cursor'], '')
+        expected = (ContestSubmission.objects.filter(user=self.user, contest=self.contest)
+                    .order_by('-submitted_at', '-id'))
+        self.assertEqual([sub.id for sub in first.context['submissions'] + second.context['submissions']],
+                         [sub.id for sub in expected])
+
+    def test_contest_submission_code(self):
+        own = ContestSubmission.objects.filter(user=self.user, contest=self.contest).first()
+        response = self.client.get(reverse('contest_submission_code', args=[self.contest.id, own.id]))
+        self.assertEqual(response.json()['code'], own.code)
+        # Nobody else's code
+        other = ContestSubmission.objects.exclude(user=self.user).filter(contest=self.contest).first()
+        response = self.client.get(reverse('contest_submission_code', args=[self.contest.id, other.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_contest_submission_status(self):
+        ids = list(ContestSubmission.objects.filter(user=self.user, contest=self.contest).values_list('id', flat=True))
+        # Session, user, submissions
+        with self.assertNumQueries(3) as queries:
+            response = self.client.get(reverse('contest_submission_status', args=[self.contest.id]),
+                                       {'id': ids})
+        self.assertEqual(len(response.json()['submissions']), 4)
+        self.assertNoFullScan(self.query_on(queries, 'contest_contestsubmission'), 'contest_contestsubmission')
+
+    def test_refresh_entry(self):
+        # Every verdict rebuilds one scoreboard cell from that cell's submissions
+        problem = self.problems[0]
+        with CaptureQueriesContext(connection) as queries:
+            scoreboard.refresh_entry(self.contest, self.user.id, problem)
+        self.assertUsesIndex(self.query_on(queries, 'contest_contestsubmission'), 'contest_sub_cell_idx')
+
+    def test_delta_is_published_on_commit(self):
+        with mock.patch('judge.events.publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                scoreboard.refresh_entry(self.contest, self.user.id, self.problems[0])
+                publish.assert_not_called()
+        self.assertEqual(publish.call_args.args[2]['username'], 'alice')
+
+    def test_rebuild_on_settings_change(self):
+        with mock.patch('contest.scoreboard.rebuild') as rebuild:
+            self.contest.description = 'Updated'
+            self.contest.save()
+            self.contest.save(update_fields=['title'])
+            rebuild.assert_not_called()
+            self.contest.penalty_minutes = 10
+            self.contest.save()
+            rebuild.assert_called_once_with(self.contest)
+            rebuild.reset_mock()
+            self.contest.end_time += datetime.timedelta(minutes=30)
+            self.contest.save(update_fields=['end_time'])
+            rebuild.assert_called_once_with(self.contest)
+
+    def test_rebuild_on_points_change(self):
+        self.contest.scoring = 'ioi'
+        self.contest.save()
+        problem = self.problems[0]
+        with mock.patch('contest.scoreboard.rebuild') as rebuild:
+            problem.description = 'Updated'
+            problem.save()
+            problem.save(update_fields=['title'])
+            rebuild.assert_not_called()
+            problem.points = 50
+            problem.save()
+            rebuild.assert_called_once_with(self.contest, problem)
+            # Points don't count in ICPC contests
+            rebuild.reset_mock()
+            other = self.problems[2]
+            other.points = 50
+            other.save(update_fields=['points'])
+            rebuild.assert_not_called()
+
+    def test_scoreboard_is_cached(self):
+        url = reverse('contest_scoreboard', args=[self.contest.id])
+        self.client.get(url)
+        # Contest, session, user and the user's permissions; the standings come from the cache
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        self.assertEqual([row['username'] for row in response.context['standings']['rows']], ['alice', 'bob'])
+
+
+class MigrateContestProblemsTests(TestCase):
+    """
+    migrate_contest_problems copies each contest problem once, however often it runs.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        user = User.objects.create_user('alice', password='pw')
+        cls.contests = [
+            Contest.objects.create(title=f'Round {i}', description='-', created_by=user,
+                                   start_time=now - datetime.timedelta(days=i, hours=2),
+                                   end_time=now - datetime.timedelta(days=i))
+            for i in (1, 10)
+        ]
+        for contest in cls.contests:
+            for i in range(3):
+                problem = ContestProblem.objects.create(contest=contest, title=f'{contest.title} P{i}',
+                                                        description='-', difficulty='Medium', time_limit=500)
+                for case in range(2):
+                    ContestTestCase.objects.create(problem=problem, input_hash=f'{i}{case}'.ljust(64, 'a'),
+                                                   output_hash=f'{i}{case}'.ljust(64, 'b'), input_size=1,
+                                                   output_size=1)
+
+    def migrate(self, *args, **options):
+        call_command('migrate_contest_problems', *args, batch_size=2, stdout=io.StringIO(), **options)
+
+    def test_reruns_copy_nothing(self):
+        self.migrate(self.contests[0].id)
+        self.assertEqual(Problem.objects.count(), 3)
+        self.assertEqual(ProblemTestCase.objects.count(), 6)
+        copy = MigratedProblem.objects.get(contest_problem__title='Round 1 P2').problem
+        self.assertEqual((copy.title, copy.time_limit), ('Round 1 P2', 500))
+        # The test data is referenced, not duplicated
+        self.assertEqual(sorted(copy.test_cases.values_list('input_hash', flat=True)),
+                         ['20'.ljust(64, 'a'), '21'.ljust(64, 'a')])
+
+        # Both contests: only the second one's problems are new
+        self.migrate(*[contest.id for contest in self.contests])
+        self.assertEqual(Problem.objects.count(), 6)
+        self.migrate(*[contest.id for contest in self.contests])
+        self.assertEqual(Problem.objects.count(), 6)
+        self.assertEqual(ProblemTestCase.objects.count(), 12)
+
+    def test_date_range(self):
+        today = timezone.now().date()
+        self.migrate(ended_after=today - datetime.timedelta(days=5))
+        self.assertEqual(sorted(Problem.objects.values_list('title', flat=True)),
+                         ['Round 1 P0', 'Round 1 P1', 'Round 1 P2'])
+
+    def test_running_contest_is_skipped(self):
+        contest = self.contests[0]
+        contest.end_time = timezone.now() + datetime.timedelta(hours=1)
+        contest.save()
+        self.migrate(contest.id)
+        self.assertFalse(Problem.objects.exists())
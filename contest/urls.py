@@ -18,6 +18,8 @@ urlpatterns = [
     
     path('<int:contest_id>/', views.contest_detail, name='contest_detail'),
 
+    path('<int:contest_id>/scoreboard/', views.contest_scoreboard, name='contest_scoreboard'),
+
     path('<int:contest_id>/register/', views.register_for_contest, name='register_for_contest'),
     
     path('<int:contest_id>/compete/', views.contest_interface, name='contest_interface'),
@@ -25,4 +27,8 @@ urlpatterns = [
     path('<int:contest_id>/problem/<int:problem_id>/submit/', views.submit_contest_problem, name='submit_contest_problem'),
 
     path('<int:contest_id>/my-submissions/', views.my_contest_submissions, name='my_contest_submissions'),
+
+    path('<int:contest_id>/my-submissions/status/', views.contest_submission_status, name='contest_submission_status'),
+
+    path('<int:contest_id>/my-submissions/<int:submission_id>/code/', views.contest_submission_code, name='contest_submission_code'),
 ]
\ No newline at end of file
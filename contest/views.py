@@ -5,8 +5,17 @@ from django.contrib.auth.decorators import login_required, permission_required
 from django.utils import timezone
 from .forms import SubAdminRequestForm, ContestForm, ContestProblemFormSet
 from .models import SubAdminRequest, ContestProblem, Contest, ContestRegistration, ContestSubmission, ContestTestCase
-from submission.views import run_code
 from django.forms import modelformset_factory
+from django.http import JsonResponse
+from judge.engine import QUEUED, PENDING_VERDICTS
+from judge.queue import enqueue_contest_submission
+from home.cache import get_or_build
+from home.pagination import keyset_page
+from .scoreboard import get_standings
+from judge.forms import TestDataForm
+
+# Submissions per page of "My Submissions"
+SUBMISSIONS_PAGE_SIZE = 50
 
 
 def contest_detail(request, contest_id):
@@ -21,6 +30,23 @@ def contest_detail(request, contest_id):
     }
     return render(request, 'contest/contest_detail.html', context)
 
+def contest_scoreboard(request, contest_id):
+    contest = get_object_or_404(Contest, id=contest_id)
+
+    # During the freeze everyone but the organizers sees the standings as of the freeze
+    can_see_live = request.user.is_staff or request.user.id == contest.created_by_id
+    frozen = contest.is_frozen and not (can_see_live and request.GET.get('live'))
+    standings = get_standings(contest, frozen)
+
+    context = {
+        'contest': contest,
+        'standings': standings,
+        'can_see_live': can_see_live and contest.is_frozen,
+        # Pushed changes are those of the public view, so an organizer's live view during the freeze reloads instead
+        'live_updates': contest.is_active and frozen == contest.is_frozen,
+    }
+    return render(request, 'contest/scoreboard.html', context)
+
 @login_required
 def request_sub_admin(request):
     # Check if the user already has a pending or approved request
@@ -85,11 +111,11 @@ def create_contest(request):
 def contest_list(request):
     now = timezone.now()
 
-    # Get all contests and categorize them
-    all_contests = Contest.objects.all().order_by('start_time')
-    upcoming_contests = all_contests.filter(start_time__gt=now)
-    active_contests = all_contests.filter(start_time__lte=now, end_time__gte=now)
-    past_contests = all_contests.filter(end_time__lt=now)
+    # Get all contests (cached until one changes) and categorize them by the current time
+    all_contests = get_or_build('contest_list', lambda: list(Contest.objects.order_by('start_time')), groups=['contests'])
+    upcoming_contests = [contest for contest in all_contests if contest.start_time > now]
+    active_contests = [contest for contest in all_contests if contest.start_time <= now <= contest.end_time]
+    past_contests = [contest for contest in all_contests if contest.end_time < now]
 
     context = {
         'upcoming_contests': upcoming_contests,
@@ -144,38 +170,17 @@ def submit_contest_problem(request, contest_id, problem_id):
         language = request.POST.get('language')
         code = request.POST.get('code')
 
-        # --- MODIFICATION: Added the full verdict checking logic ---
-        final_verdict = "Accepted"
-        test_cases = problem.test_cases.all()
-
-        if not test_cases.exists():
-            final_verdict = "System Error: No Test Cases"
-        else:
-            for case in test_cases:
-                # Use your existing run_code utility for each test case
-                # Note: We're not setting a memory limit here, but you could add it
-                output = run_code(language, code, case.input_data)
-                
-                # Check for execution errors first
-                if "Error" in output or "Timed Out" in output:
-                    final_verdict = output # Set verdict to the error message
-                    break # Stop checking other test cases
-
-                # Check if the code's output matches the test case's expected output
-                if output.strip() != case.output_data.strip():
-                    final_verdict = "Wrong Answer"
-                    break # Stop on the first wrong answer
-        # --- End of added logic ---
-
-        # Create the contest submission record with the correct verdict
-        ContestSubmission.objects.create(
+        # Record the submission as "Queued" and let the judge workers evaluate it,
+        # so a contest rush doesn't tie up web workers for the whole test run
+        submission = ContestSubmission.objects.create(
             contest=contest,
             problem=problem,
             user=request.user,
             language=language,
             code=code,
-            verdict=final_verdict
+            verdict=QUEUED
         )
+        enqueue_contest_submission(submission)
         # Redirect back to the contest interface
         return redirect('contest_interface', contest_id=contest.id)
 
@@ -194,7 +199,7 @@ def manage_contest_detail(request, contest_id):
     # We will create a simple formset for test cases
     TestCaseFormSet = modelformset_factory(
         ContestTestCase, 
-        fields=('input_data', 'output_data'), 
+        form=TestDataForm,
         extra=1, 
         can_delete=True
     )
@@ -205,7 +210,7 @@ def manage_contest_detail(request, contest_id):
         problem = get_object_or_404(ContestProblem, id=problem_id, contest=contest)
         
         formset_prefix = f'testcases-{problem.id}'
-        formset = TestCaseFormSet(request.POST, queryset=problem.test_cases.all(), prefix=formset_prefix)
+        formset = TestCaseFormSet(request.POST, request.FILES, queryset=problem.test_cases.all(), prefix=formset_prefix)
 
         if formset.is_valid():
             instances = formset.save(commit=False)
@@ -235,14 +240,56 @@ def manage_contest_detail(request, contest_id):
 def my_contest_submissions(request, contest_id):
     contest = get_object_or_404(Contest, id=contest_id)
 
-    # Get all of the current user's submissions for this contest
+    # Get the current user's submissions for this contest, with only what the table shows;
+    # the code is loaded when a row is expanded (contest_submission_code)
     submissions = ContestSubmission.objects.filter(
         user=request.user,
         contest=contest
-    ).order_by('-submitted_at')
+    ).select_related('problem').only( # Problem titles in the same query
+        'id', 'problem__title', 'submitted_at', 'verdict', 'time_ms', 'memory_kb'
+    )
+
+    # One page at a time, the most recent submission first
+    submissions, next_cursor = keyset_page(submissions, 'submitted_at', request.GET.get('before', ''),
+                                           SUBMISSIONS_PAGE_SIZE)
 
     context = {
         'contest': contest,
         'submissions': submissions,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('before'),
+        'pending_verdicts': PENDING_VERDICTS,
     }
-    return render(request, 'contest/contest_submissions.html', context)
\ No newline at end of file
+    return render(request, 'contest/contest_submissions.html', context)
+
+@login_required
+def contest_submission_status(request, contest_id):
+    # Polled by the submissions page for the verdicts that are still being judged
+    ids = [int(i) for i in request.GET.getlist('id') if i.isdigit()]
+    submissions = ContestSubmission.objects.filter(
+        user=request.user,
+        contest_id=contest_id,
+        id__in=ids
+    ).values('id', 'verdict')
+
+    return JsonResponse({
+        'submissions': [
+            {
+                'id': sub['id'],
+                'verdict': sub['verdict'],
+                'is_pending': sub['verdict'] in PENDING_VERDICTS,
+            }
+            for sub in submissions
+        ]
+    })
+
+@login_required
+def contest_submission_code(request, contest_id, submission_id):
+    # The code of one of the user's submissions, fetched when its row is expanded
+    submission = get_object_or_404(
+        ContestSubmission.objects.only('language', 'code'),
+        id=submission_id,
+        contest_id=contest_id,
+        user=request.user
+    )
+    return JsonResponse({'language': submission.language, 'code': submission.code})
@@ -0,0 +1,88 @@
+# home/cache.py
+#
+# Cached data for the busiest read-only pages (problem list, contest list, OA events,
+# leaderboard). Every entry belongs to a group, and saving or deleting a model in that
+# group (see home/signals.py) bumps the group's version, which marks its entries stale.
+#
+# To keep an expiry or an invalidation in the middle of a contest from sending the
+# same query to the database from every request at once, only the request that wins
+# a short lock rebuilds a stale entry; everyone else keeps getting the previous value
+# until the new one is stored. Only when there is no value at all do the others wait
+# for the winner. Rebuilds always read from the primary database, since what they read
+# is served until the next invalidation.
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from backend.db_router import read_from_primary
+
+logger = logging.getLogger(__name__)
+
+# How often a request that found no value checks whether the rebuilding request is done
+WAIT_INTERVAL = 0.05
+
+
+def _version_key(group):
+    return f'page-cache:version:{group}'
+
+
+def invalidate(*groups):
+    """
+    Marks every entry of the given groups stale. They are rebuilt by the next request
+    that reads them; the others are served the old value in the meantime. Inside a
+    transaction this waits for the commit, so a rebuild can't cache the old data again.
+    """
+    transaction.on_commit(lambda: _bump(groups))
+
+
+def _bump(groups):
+    for group in groups:
+        key = _version_key(group)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # No version stored yet (or it was evicted): any new value differs from what entries hold
+            cache.set(key, time.time_ns(), None)
+
+
+def get_or_build(name, build, groups, timeout=None):
+    """
+    Returns the cached value of `name`, calling `build()` to (re)compute it when it is
+    missing, older than `timeout` seconds or invalidated through one of `groups`.
+    """
+    timeout = settings.PAGE_CACHE_TIMEOUT if timeout is None else timeout
+    key = f'page-cache:{name}'
+    version_keys = [_version_key(group) for group in groups]
+
+    found = cache.get_many([key, *version_keys])
+    versions = tuple(found.get(version_key, 0) for version_key in version_keys)
+    entry = found.get(key)
+    if entry is not None:
+        entry_versions, refresh_at, value = entry
+        if entry_versions == versions and refresh_at > time.time():
+            return value
+
+    # Stale or missing: only the request that gets the lock rebuilds it
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, True, settings.PAGE_CACHE_LOCK_SECONDS):
+        if entry is not None:
+            return entry[2]
+        # Nothing to serve yet: wait for the rebuild rather than running the same query
+        deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[2]
+        logger.warning("Gave up waiting for cache entry %s to be rebuilt", name)
+        return build()
+
+    try:
+        with read_from_primary():
+            value = build()
+        # Stale entries are kept around for a while longer so they can be served during rebuilds
+        cache.set(key, (versions, time.time() + timeout, value), timeout + settings.PAGE_CACHE_STALE_SECONDS)
+    finally:
+        cache.delete(lock_key)
+    return value
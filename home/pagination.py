@@ -0,0 +1,47 @@
+# home/pagination.py
+#
+# Keyset ("seek") pagination for lists ordered newest first. A page is fetched with
+# WHERE (time, id) < (cursor) ORDER BY time DESC, id DESC LIMIT n, which reads just
+# the rows of that page through an index, however deep the page, unlike OFFSET.
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _encode(moment, pk):
+    # "<microseconds since the epoch>_<id>", exact so no row is skipped or repeated;
+    # ids never contain "_" (integers and UUIDs)
+    return f'{(moment - EPOCH) // MICROSECOND}_{pk}'
+
+
+def _decode(cursor):
+    micros, pk = cursor.split('_', 1)
+    return EPOCH + int(micros) * MICROSECOND, pk
+
+
+def keyset_page(queryset, time_field, cursor, page_size):
+    """
+    Returns (rows, next_cursor) for the page of `queryset` after `cursor` (the first
+    page if it is empty or invalid), newest `time_field` first. next_cursor is '' on
+    the last page.
+    """
+    queryset = queryset.order_by(f'-{time_field}', '-pk')
+    page = queryset
+    if cursor:
+        try:
+            moment, pk = _decode(cursor)
+            page = queryset.filter(Q(**{f'{time_field}__lt': moment}) | Q(**{time_field: moment, 'pk__lt': pk}))
+        except (ValueError, OverflowError, ValidationError):
+            # A cursor that was tampered with: start over
+            page = queryset
+    rows = list(page[:page_size + 1])
+
+    next_cursor = ''
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = _encode(getattr(last, time_field), last.pk)
+    return rows, next_cursor
@@ -0,0 +1,41 @@
+# In home/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from contest.models import Contest
+from judge.engine import QUEUED, RUNNING
+from oa_events.models import Company, OAEvent
+from problems.models import Problem
+from submission.models import CodeSubmission
+from .cache import invalidate
+
+
+# Cached pages (see home/cache.py) go stale as soon as the data they show changes
+@receiver([post_save, post_delete], sender=Problem)
+def problem_changed(sender, instance, **kwargs):
+    # The leaderboard scores solved problems by difficulty
+    invalidate('problems', 'leaderboard')
+
+
+@receiver([post_save, post_delete], sender=Contest)
+def contest_changed(sender, instance, **kwargs):
+    invalidate('contests')
+
+
+@receiver([post_save, post_delete], sender=OAEvent)
+@receiver([post_save, post_delete], sender=Company)
+def oa_event_changed(sender, instance, **kwargs):
+    invalidate('oa_events')
+
+
+@receiver(post_save, sender=CodeSubmission)
+def submission_saved(sender, instance, **kwargs):
+    # Custom runs and submissions still waiting for a verdict can't change the leaderboard,
+    # and skipping them keeps a busy judge queue from invalidating it several times per submission
+    if instance.problem_id is None or instance.verdict in (QUEUED, RUNNING):
+        return
+    invalidate('leaderboard')
+
+
+@receiver(post_delete, sender=CodeSubmission)
+def submission_deleted(sender, instance, **kwargs):
+    invalidate('leaderboard')
@@ -0,0 +1,55 @@
+# home/testing.py
+#
+# Helpers for the query audits in the apps' tests.py: they capture the queries a view
+# runs and check the database's plan for them, so a lost index or a query that starts
+# sorting or scanning a whole table fails a test instead of slowing down a contest.
+import re
+from django.db import connection
+
+
+def explain(sql):
+    """
+    The database's query plan for `sql` as text. On Postgres, sequential scans are
+    discouraged first: test tables are tiny, and for tiny tables it would rather scan
+    than use any index.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_bitmapscan = off')
+            cursor.execute('EXPLAIN ' + sql)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return '\n'.join(row[-1] for row in cursor.fetchall())
+
+
+class QueryPlanMixin:
+    """
+    For TestCases: pick a captured query by the table it reads and assert on its plan.
+    """
+
+    def query_on(self, queries, table, contains=''):
+        # The one captured query reading `table` (and containing `contains`)
+        found = [query['sql'] for query in queries.captured_queries
+                 if re.search(rf'\bFROM "{table}"', query['sql']) and contains in query['sql']]
+        self.assertEqual(len(found), 1, f'Expected one query on {table}, got {found}')
+        return found[0]
+
+    def assertUsesIndex(self, sql, index, sorts=False):
+        """
+        Asserts the query reads through `index` and, unless `sorts`, needs no sort of
+        its own (the index already returns the rows in order).
+        """
+        plan = explain(sql)
+        self.assertRegex(plan, rf'(USING (COVERING )?INDEX|Index (Only )?Scan using) {index}\b',
+                         f'{index} is not used:\n{plan}')
+        if not sorts:
+            self.assertNotRegex(plan, r'TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY|(^|->  )(Incremental )?Sort\b',
+                                f'The query sorts:\n{plan}')
+        return plan
+
+    def assertNoFullScan(self, sql, table):
+        plan = explain(sql)
+        self.assertNotRegex(plan, rf'^(.*\b)?SCAN {table}$|Seq Scan on {table}\b',
+                            f'The query reads all of {table}:\n{plan}')
+        return plan
@@ -1,3 +1,42 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from backend.db_router import ReplicaRouter, read_from_replica
+from problems.models import Problem
+from .cache import get_or_build
 
-# Create your tests here.
+
+class PageCacheTests(SimpleTestCase):
+    """
+    The cache behind the busiest read-only pages.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rebuilds_read_from_primary(self):
+        # A replica view reads the replica, but what it caches comes from the primary
+        router = ReplicaRouter()
+
+        @read_from_replica
+        def view(request):
+            return router.db_for_read(Problem), get_or_build('test', lambda: router.db_for_read(Problem),
+                                                             groups=['problems'])
+
+        self.assertEqual(view(None), ('replica', 'default'))
+
+
+class InvalidationTests(TestCase):
+    """
+    Saved changes mark the cached pages that show them stale.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_waits_for_commit(self):
+        get_or_build('test', lambda: 'old', groups=['problems'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Problem.objects.create(title='P', description='-', difficulty='Easy')
+            # Still in the transaction: the change isn't visible to anyone else yet
+            self.assertEqual(get_or_build('test', lambda: 'new', groups=['problems']), 'old')
+        self.assertEqual(get_or_build('test', lambda: 'new', groups=['problems']), 'new')
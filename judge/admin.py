@@ -0,0 +1,61 @@
+from django.contrib import admin
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from .models import JudgeTask, JudgeCounter, Rejudge
+
+# Verdict changes shown on a rejudge's admin page; the rejudge command lists all of them
+REJUDGE_CHANGES_SHOWN = 500
+
+
+def message_rejudge_queued(modeladmin, request, rejudge):
+    # Used by the "rejudge" admin actions: points to the page that tracks the new rejudge
+    url = reverse('admin:judge_rejudge_change', args=[rejudge.id])
+    modeladmin.message_user(request, format_html(
+        'Queued {} submission(s) for rejudging. <a href="{}">Follow the progress</a>.', rejudge.total, url))
+
+
+# Register your models here.
+@admin.register(JudgeTask)
+class JudgeTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'priority', 'code_submission', 'contest_submission', 'verdict', 'worker', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'priority')
+    raw_id_fields = ('code_submission', 'contest_submission', 'rejudge')
+    readonly_fields = ('created_at', 'started_at', 'heartbeat_at', 'finished_at')
+
+
+@admin.register(Rejudge)
+class RejudgeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'description', 'created_by', 'created_at', 'total', 'progress_display', 'changed_count')
+    fields = ('description', 'created_by', 'created_at', 'total', 'progress_display', 'verdict_changes')
+    readonly_fields = ('created_by', 'created_at', 'total', 'progress_display', 'verdict_changes')
+
+    def has_add_permission(self, request):
+        # Rejudges are started from the submission admin actions or the rejudge command
+        return False
+
+    @admin.display(description='Progress')
+    def progress_display(self, obj):
+        progress = obj.progress()
+        finished = progress.get('Done', 0) + progress.get('Failed', 0)
+        return f"{finished}/{obj.total} judged, {progress.get('Pending', 0)} pending, {progress.get('Failed', 0)} failed"
+
+    @admin.display(description='Changed verdicts')
+    def changed_count(self, obj):
+        return obj.changes().count()
+
+    @admin.display(description='Verdict changes')
+    def verdict_changes(self, obj):
+        changes = obj.changes()[:REJUDGE_CHANGES_SHOWN]
+        if not changes:
+            return 'No verdict has changed (yet).'
+        rows = format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>', (
+            (task.submission, task.submission.user.username, task.previous_verdict or '-', task.verdict)
+            for task in changes
+        ))
+        return format_html('<table><tr><th>Submission</th><th>User</th><th>Before</th><th>After</th></tr>{}</table>', rows)
+
+
+@admin.register(JudgeCounter)
+class JudgeCounterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'value', 'updated_at')
+    readonly_fields = ('name', 'value', 'updated_at')
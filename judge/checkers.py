@@ -0,0 +1,188 @@
+# judge/checkers.py
+#
+# Checkers decide whether a program's output is correct for one test case. The
+# built-in ones compare the output with the expected answer a chunk at a time, so
+# neither side is ever held whole or split into one big list of lines or tokens: the
+# expected answer is streamed from its memory-mapped test data file, and the output
+# from the temporary file the judge spooled it into while reading the runner's reply.
+# Everything is compared as raw bytes; nothing is decoded.
+import math
+from itertools import zip_longest
+
+WRONG_ANSWER = "Wrong Answer"
+CHECKER_FAILED = "System Error: Checker Failed"
+
+# Outputs are compared in slices of this many bytes
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_chunks(data, size=CHUNK_SIZE):
+    # The pieces of `data`: bytes, or a binary file that is read from where it is
+    if hasattr(data, 'read'):
+        yield from iter(lambda: data.read(size), b'')
+        return
+    view = memoryview(data or b'')
+    for start in range(0, len(view), size):
+        yield bytes(view[start:start + size])
+
+
+def lstrip_chunks(chunks):
+    # Drops the whitespace (blank lines included) at the start of a stream of byte chunks
+    chunks = iter(chunks)
+    for chunk in chunks:
+        chunk = chunk.lstrip()
+        if chunk:
+            yield chunk
+            break
+    yield from chunks
+
+
+def iter_tokens(chunks):
+    """
+    Yields the whitespace-separated tokens of a stream of byte chunks.
+    A token split across two chunks is yielded once, joined back together.
+    """
+    partial = b''
+    for chunk in chunks:
+        parts = chunk.split()
+        if not parts:
+            # Only whitespace: whatever came before is complete
+            if partial:
+                yield partial
+                partial = b''
+            continue
+        if chunk[:1].isspace() and partial:
+            yield partial
+            partial = b''
+        parts[0] = partial + parts[0]
+        # The last token may continue in the next chunk
+        partial = b'' if chunk[-1:].isspace() else parts.pop()
+        yield from parts
+    if partial:
+        yield partial
+
+
+def iter_lines(chunks):
+    # Yields the lines of a stream of byte chunks without trailing whitespace (including \r)
+    partial = b''
+    for chunk in chunks:
+        lines = chunk.split(b'\n')
+        lines[0] = partial + lines[0]
+        partial = lines.pop()
+        for line in lines:
+            yield line.rstrip()
+    if partial:
+        yield partial.rstrip()
+
+
+class Checker:
+    """
+    Compares a program's output with the expected output of a test case.
+    Subclasses implement compare() over the two outputs as chunk iterators.
+    """
+
+    def sandbox_options(self, test_cases):
+        # Extra run_batch() arguments; only the special judge needs any
+        return {}
+
+    def check(self, event, case):
+        """
+        Returns None if the output of a cleanly finished case is accepted,
+        otherwise the failing verdict.
+        """
+        if self.compare(case.output_chunks(), iter_chunks(event['stdout'])):
+            return None
+        return WRONG_ANSWER
+
+    def compare(self, expected, actual):
+        raise NotImplementedError
+
+
+class LineChecker(Checker):
+    # Line by line, ignoring trailing whitespace on every line and blank lines at the end.
+    # Whitespace before the first line is ignored too, as the plain strip() comparison did.
+    def compare(self, expected, actual):
+        for want, got in zip_longest(iter_lines(lstrip_chunks(expected)), iter_lines(lstrip_chunks(actual))):
+            # One side ran out of lines: the rest of the other side must be blank
+            if want is None or got is None:
+                if (got if want is None else want) != b'':
+                    return False
+            elif want != got:
+                return False
+        return True
+
+
+class TokenChecker(Checker):
+    # Token by token: any amount and kind of whitespace between tokens is fine
+    def compare(self, expected, actual):
+        for want, got in zip_longest(iter_tokens(expected), iter_tokens(actual)):
+            if want != got:
+                return False
+        return True
+
+
+class FloatChecker(Checker):
+    """
+    Token by token, but tokens that are numbers on both sides only have to match
+    within an absolute or relative error.
+    """
+
+    def __init__(self, abs_error=1e-6, rel_error=1e-6):
+        self.abs_error = abs_error
+        self.rel_error = rel_error
+
+    def tokens_match(self, want, got):
+        if want == got:
+            return True
+        try:
+            expected, value = float(want), float(got)
+        except (TypeError, ValueError):
+            return False
+        if not (math.isfinite(expected) and math.isfinite(value)):
+            return False
+        error = abs(expected - value)
+        return error <= self.abs_error or error <= self.rel_error * abs(expected)
+
+    def compare(self, expected, actual):
+        for want, got in zip_longest(iter_tokens(expected), iter_tokens(actual)):
+            if want is None or got is None or not self.tokens_match(want, got):
+                return False
+        return True
+
+
+class SpecialJudgeChecker(Checker):
+    """
+    A problem-specific checker program. It runs inside the sandbox right after each
+    test case as `checker input.txt output.txt answer.txt` and accepts with exit code 0.
+    """
+
+    def __init__(self, language, code):
+        self.language = language
+        self.code = code
+
+    def sandbox_options(self, test_cases):
+        return {
+            'checker': {'language': self.language, 'code': self.code},
+            'answers': [case.output_reference() for case in test_cases],
+            # The runner checks the output itself, so none of it needs to come back
+            'stdout_capture': 0,
+        }
+
+    def check(self, event, case):
+        result = event.get('checker')
+        if result is None or result['status'] == 'failed':
+            return CHECKER_FAILED
+        if result['status'] == 'wrong_answer':
+            return WRONG_ANSWER
+        return None
+
+
+def get_checker(problem):
+    # Builds the checker a Problem or ContestProblem is configured to use
+    if problem.checker == 'token':
+        return TokenChecker()
+    if problem.checker == 'float':
+        return FloatChecker(problem.checker_abs_error, problem.checker_rel_error)
+    if problem.checker == 'special':
+        return SpecialJudgeChecker(problem.checker_language, problem.checker_code)
+    return LineChecker()
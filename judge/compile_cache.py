@@ -0,0 +1,126 @@
+# judge/compile_cache.py
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HIT_COUNTER = 'compile_cache.hit'
+MISS_COUNTER = 'compile_cache.miss'
+
+
+def cache_key(code, flags, image_digest):
+    """
+    Content address of a compiled binary: the same source, compiler flags and
+    sandbox image always produce the same artifact.
+    """
+    digest = hashlib.sha256()
+    for part in (image_digest, '\0'.join(flags), code):
+        digest.update(part.encode())
+        digest.update(b'\0\0')
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """
+    Compiled binaries stored as one file per key on a local volume.
+
+    The directory is never mounted into a sandbox: on a hit the judge sends the one
+    binary a job needs along with its request, so user programs can neither read
+    other submissions' binaries nor tamper with them. Entries are evicted
+    least-recently-used first (by mtime, refreshed on every hit) once the
+    directory grows past `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+
+    def path(self, key):
+        return self.directory / key
+
+    def lookup(self, key):
+        path = self.path(key)
+        try:
+            # Touch the entry so LRU eviction sees it as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def read(self, key):
+        # The cached binary, or None
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            # Evicted in the meantime
+            return None
+
+    def store(self, key, binary):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary name first so no job is ever sent a half-written binary
+        tmp_path = self.directory / f'.{key}.{uuid.uuid4().hex}.tmp'
+        tmp_path.write_bytes(binary)
+        # Only the judge reads the cache; the runner makes its copy executable
+        tmp_path.chmod(0o600)
+        os.replace(tmp_path, self.path(key))
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(binary)
+            if self._size > self.max_bytes:
+                self._size = self._evict()
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith('.'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Other worker processes share the directory, so always start from a fresh scan
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        # Evict down to 90% of the cap so we don't rescan on every single store
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        logger.info("Compile cache evicted down to %d bytes", total)
+        return total
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_compile_cache():
+    # Returns None when the cache is disabled
+    global _cache
+    if not settings.JUDGE_COMPILE_CACHE_DIR:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = CompileCache(settings.JUDGE_COMPILE_CACHE_DIR, settings.JUDGE_COMPILE_CACHE_MAX_BYTES)
+        return _cache
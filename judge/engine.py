@@ -0,0 +1,334 @@
+# judge/engine.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from django.conf import settings
+from django.utils import timezone
+from . import events
+from .checkers import LineChecker, get_checker
+from .sandbox import run_batch, case_error
+from .writes import result_write
+
+logger = logging.getLogger(__name__)
+
+# Verdicts shown while a submission is still waiting for (or inside) a judge worker
+QUEUED = "Queued"
+RUNNING = "Running"
+PENDING_VERDICTS = (QUEUED, RUNNING)
+# The verdict of a submission the judge itself failed on
+SYSTEM_ERROR = "System Error"
+
+
+def case_verdict(event, case, checker):
+    """
+    Returns the failing verdict for one runner event, or None if the test case passed.
+    """
+    # Check for compilation and execution errors first
+    error = case_error(event)
+    if error:
+        return error # Use the error message as the verdict
+
+    # Let the problem's checker decide whether the output is correct
+    return checker.check(event, case)
+
+
+def error_verdict(verdict):
+    """
+    Splits a failing verdict into the short label stored as the submission's verdict
+    and the details shown under it: the compiler's or the program's error output
+    from case_error. Other verdicts have no details.
+    """
+    if verdict.startswith("Execution Error:\nCompilation Error:\n"):
+        return "Compilation Error", verdict[len("Execution Error:\nCompilation Error:\n"):]
+    if verdict.startswith("Execution Error:\n"):
+        return "Runtime Error", verdict[len("Execution Error:\n"):]
+    return verdict, ''
+
+
+def case_record(index, event, verdict):
+    # The per-test-case row stored on the submission; the error details go on the submission itself
+    return {
+        'case': index,
+        'verdict': "Accepted" if verdict is None else error_verdict(verdict)[0],
+        'cpu_ms': event.get('cpu_ms', 0),
+        'wall_ms': event.get('wall_ms', 0),
+        'memory_kb': event.get('memory_kb', 0),
+    }
+
+
+class Judgement:
+    """
+    The outcome of judging one submission: its verdict plus the measurements
+    of every test case that ran.
+    """
+
+    def __init__(self, verdict, cases=None):
+        self.verdict, self.details = error_verdict(verdict)
+        self.cases = sorted(cases or [], key=lambda case: case['case'])
+
+    @property
+    def time_ms(self):
+        return max((case['cpu_ms'] for case in self.cases), default=None)
+
+    @property
+    def wall_time_ms(self):
+        return max((case['wall_ms'] for case in self.cases), default=None)
+
+    @property
+    def memory_kb(self):
+        return max((case['memory_kb'] for case in self.cases), default=None)
+
+    def apply_to(self, submission):
+        submission.verdict = self.verdict
+        submission.verdict_details = self.details
+        submission.time_ms = self.time_ms
+        submission.wall_time_ms = self.wall_time_ms
+        submission.memory_kb = self.memory_kb
+        submission.case_results = self.cases
+        return ['verdict', 'verdict_details', 'time_ms', 'wall_time_ms', 'memory_kb', 'case_results']
+
+
+def evaluate(language, code, test_cases, memory_limit=256, time_limit_ms=None, checker=None, output_limit=None,
+             stop_on_failure=True, on_case=None):
+    """
+    Compiles the code once, runs it against the test cases and returns a Judgement
+    whose verdict is always the one of the lowest-index failing test case.
+    Outputs are judged by `checker` (line by line if not given). With
+    `stop_on_failure` off every case runs anyway, for partial scoring.
+    `on_case` is called with each case's record as soon as it is judged. Judging stops
+    after JUDGE_MAX_SUBMISSION_SECONDS, whatever the number of cases and their limits.
+    """
+    if not test_cases:
+        return Judgement("System Error: No Test Cases")
+    checker = checker or LineChecker()
+    deadline = time.monotonic() + settings.JUDGE_MAX_SUBMISSION_SECONDS
+
+    parallel = min(settings.JUDGE_MAX_PARALLEL_CASES, len(test_cases))
+    if parallel > 1:
+        return ParallelEvaluation(language, code, test_cases, memory_limit, time_limit_ms, parallel,
+                                  checker, output_limit, stop_on_failure, on_case, deadline).run()
+
+    # Sequential: stop at the first failing test case (unless every case is wanted)
+    cases = []
+    first_failure = None
+    inputs = [case.input_reference() for case in test_cases]
+    events = run_batch(language, code, inputs, memory_limit, time_limit_ms, output_limit=output_limit,
+                       deadline=deadline, **checker.sandbox_options(test_cases))
+    with closing(events):
+        for event in events:
+            if event['type'] in ('compile_error', 'checker_error'):
+                return Judgement(case_error(event))
+            index = event.get('case', len(cases))
+            verdict = case_verdict(event, test_cases[index], checker)
+            cases.append(case_record(index, event, verdict))
+            if on_case:
+                on_case(cases[-1])
+            if verdict:
+                if stop_on_failure:
+                    return Judgement(verdict, cases)
+                first_failure = first_failure or verdict
+
+    return Judgement(first_failure or "Accepted", cases)
+
+
+class ParallelEvaluation:
+    """
+    Fans the test cases of one submission out over `parallel` sandbox sessions.
+
+    Session w runs cases w, w + parallel, w + 2 * parallel, ... in order. As soon as
+    any case fails, every session whose next case comes after that failure is
+    cancelled. Cases before the failure always run to completion, so the reported
+    verdict is deterministic: the one of the lowest-index failing case. Without
+    `stop_on_failure` nothing is cancelled and every case runs.
+    """
+
+    def __init__(self, language, code, test_cases, memory_limit, time_limit_ms, parallel, checker,
+                 output_limit=None, stop_on_failure=True, on_case=None, deadline=None):
+        self.language = language
+        self.code = code
+        self.test_cases = test_cases
+        self.checker = checker
+        self.output_limit = output_limit
+        self.stop_on_failure = stop_on_failure
+        self.on_case = on_case
+        self.memory_limit = memory_limit
+        self.time_limit_ms = time_limit_ms
+        self.deadline = deadline
+        self.shards = [list(range(w, len(test_cases), parallel)) for w in range(parallel)]
+        self.positions = [0] * parallel
+        self.cancels = [threading.Event() for _ in range(parallel)]
+        self.verdicts = {}
+        self.records = {}
+        self.first_failure = None
+        self.compile_failure = None
+        # Set once the first session has compiled the code, so the others hit the compile cache
+        self.compiled = threading.Event()
+        self.lock = threading.Lock()
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=len(self.shards)) as executor:
+            futures = [executor.submit(self._run_shard, 0)]
+            self.compiled.wait()
+            if self.compile_failure is None:
+                futures += [executor.submit(self._run_shard, w) for w in range(1, len(self.shards))]
+            for future in futures:
+                future.result()
+
+        if self.compile_failure:
+            return Judgement(self.compile_failure)
+        cases = list(self.records.values())
+        if self.first_failure is not None:
+            if self.stop_on_failure:
+                # Cases after the failure may have finished before they were cancelled; drop them
+                cases = [case for case in cases if case['case'] <= self.first_failure]
+            return Judgement(self.verdicts[self.first_failure], cases)
+        if len(self.verdicts) < len(self.test_cases):
+            return Judgement("System Error: Incomplete Judging", cases)
+        return Judgement("Accepted", cases)
+
+    def _run_shard(self, w):
+        if self.cancels[w].is_set():
+            return
+        indices = self.shards[w]
+        shard_cases = [self.test_cases[index] for index in indices]
+        inputs = [case.input_reference() for case in shard_cases]
+        try:
+            events = run_batch(self.language, self.code, inputs, self.memory_limit, self.time_limit_ms,
+                               cancel=self.cancels[w], output_limit=self.output_limit, deadline=self.deadline,
+                               **self.checker.sandbox_options(shard_cases))
+            with closing(events):
+                for event in events:
+                    if self.cancels[w].is_set():
+                        break
+                    if event['type'] in ('compile_error', 'checker_error'):
+                        self.compile_failure = case_error(event)
+                        break
+
+                    index = indices[self.positions[w]]
+                    verdict = case_verdict(event, self.test_cases[index], self.checker)
+                    if not self._record(w, index, verdict, case_record(index, event, verdict)):
+                        break
+                    if w == 0:
+                        self.compiled.set()
+        finally:
+            if w == 0:
+                self.compiled.set()
+
+    def _record(self, w, index, verdict, record):
+        """
+        Stores one case verdict and cancels the sessions that can no longer matter.
+        Returns whether session w should keep going.
+        """
+        with self.lock:
+            self.verdicts[index] = verdict
+            self.records[index] = record
+            self.positions[w] += 1
+            if self.on_case:
+                self.on_case(record)
+
+            if verdict is not None and (self.first_failure is None or index < self.first_failure):
+                self.first_failure = index
+                if not self.stop_on_failure:
+                    return self.positions[w] < len(self.shards[w])
+                for other, shard in enumerate(self.shards):
+                    position = self.positions[other]
+                    if position >= len(shard) or shard[position] > index:
+                        self.cancels[other].set()
+
+            position = self.positions[w]
+            if position >= len(self.shards[w]):
+                return False
+            return (not self.stop_on_failure or self.first_failure is None
+                    or self.shards[w][position] < self.first_failure)
+
+
+def problem_limits(problem, language):
+    """
+    Returns (memory limit in MB, CPU time limit in ms) for running `language` on a
+    Problem or ContestProblem. A time limit set on the problem is scaled by the problem's
+    own multiplier for the language, or by the site-wide one from JUDGE_TIME_LIMIT_MULTIPLIERS;
+    without one, JUDGE_DEFAULT_TIME_LIMIT_MS is the limit for every language.
+    """
+    if not problem.time_limit:
+        return problem.memory_limit, settings.JUDGE_DEFAULT_TIME_LIMIT_MS
+    multipliers = problem.language_time_multipliers or {}
+    factor = multipliers.get(language, settings.JUDGE_TIME_LIMIT_MULTIPLIERS.get(language, 1))
+    try:
+        factor = float(factor)
+    except (TypeError, ValueError):
+        # A typo in the admin JSON shouldn't take the judge down
+        factor = 1
+    time_limit_ms = max(1, int(problem.time_limit * factor))
+    return problem.memory_limit, time_limit_ms
+
+
+def judge_code_submission(submission, on_case=None):
+    problem = submission.problem
+    test_cases = list(problem.test_cases.all())
+    memory_limit, time_limit_ms = problem_limits(problem, submission.language)
+    return evaluate(submission.language, submission.code, test_cases, memory_limit, time_limit_ms,
+                    get_checker(problem), problem.output_limit, on_case=on_case)
+
+
+def judge_contest_submission(submission, on_case=None):
+    problem = submission.problem
+    test_cases = list(problem.test_cases.all())
+    memory_limit, time_limit_ms = problem_limits(problem, submission.language)
+    # IOI contests give points per passed test case, so every case has to run
+    return evaluate(submission.language, submission.code, test_cases, memory_limit, time_limit_ms,
+                    get_checker(problem), problem.output_limit,
+                    stop_on_failure=submission.contest.scoring != 'ioi', on_case=on_case)
+
+
+def judge_task(task):
+    """
+    Judges the submission behind a claimed JudgeTask and stores the verdict on it.
+    """
+    submission = task.submission
+    submission.verdict = RUNNING
+    submission.save(update_fields=['verdict'])
+    # Result pages listening for live updates get the verdict and every judged test case
+    kind = 'code' if task.code_submission_id else 'contest'
+    publish_verdict(kind, submission)
+    channel = events.submission_channel(kind, submission.pk)
+
+    def on_case(record):
+        events.publish(channel, 'progress', record)
+
+    try:
+        if task.code_submission_id:
+            judgement = judge_code_submission(submission, on_case)
+        else:
+            judgement = judge_contest_submission(submission, on_case)
+    except Exception as e:
+        logger.exception("Judge task %s crashed", task.id)
+        submission.verdict = SYSTEM_ERROR
+        submission.verdict_details = ''
+        update_fields = ['verdict', 'verdict_details']
+        task.status = 'Failed'
+        task.error = str(e)
+    else:
+        update_fields = judgement.apply_to(submission)
+        task.status = 'Done'
+
+    task.verdict = submission.verdict
+    task.finished_at = timezone.now()
+    # The verdict and the task's status are stored together, one result at a time on SQLite
+    with result_write():
+        submission.save(update_fields=update_fields)
+        task.save(update_fields=['status', 'error', 'verdict', 'finished_at'])
+
+    publish_verdict(kind, submission)
+    return submission.verdict
+
+
+def publish_verdict(kind, submission):
+    # Live update for a submission's result page (see judge.events)
+    events.publish(events.submission_channel(kind, submission.pk), 'verdict', {
+        'verdict': submission.verdict,
+        'is_pending': submission.verdict in PENDING_VERDICTS,
+        'time_ms': submission.time_ms,
+        'memory_kb': submission.memory_kb,
+    })
@@ -0,0 +1,162 @@
+# judge/events.py
+#
+# Publish/subscribe for live updates: verdicts and per-test progress of a submission,
+# and scoreboard changes of a contest. The judge publishes from ordinary (sync) code;
+# the server-sent event views in judge/views.py subscribe from the ASGI event loop.
+#
+# The "local" broker only reaches subscribers in the same process, which is enough
+# when the judge runs inline. With separate judge workers or several web nodes, use
+# the "redis" broker: messages go through Redis PUBLISH and every web process runs one
+# listener that hands them on to its own local subscribers.
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Messages a slow subscriber may have waiting before newer ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def submission_channel(kind, submission_id):
+    # kind is 'code' or 'contest'
+    return f'submission:{kind}:{submission_id}'
+
+
+def scoreboard_channel(contest_id):
+    return f'scoreboard:{contest_id}'
+
+
+class Subscription:
+    """
+    Messages published to one channel since subscribing, in order. Must be created
+    and read on the subscriber's event loop, and closed when done.
+    """
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+
+class LocalBroker:
+    """
+    Fans messages out to the subscribers of this process. publish() may be called
+    from any thread; each subscriber gets its messages on its own event loop.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(self._deliver, subscription.queue, message)
+            except RuntimeError:
+                # The subscriber's event loop has already been closed
+                pass
+
+    @staticmethod
+    def _deliver(queue, message):
+        if queue.full():
+            logger.warning("Dropping a live update for a slow subscriber")
+            return
+        queue.put_nowait(message)
+
+    def subscribe(self, channel):
+        # Receives everything published to `channel` from now on
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+
+class RedisBroker(LocalBroker):
+    """
+    Publishes through Redis so subscribers in every process (and on every node) get
+    the message. Each process keeps a single Redis subscription, however many
+    clients are connected to it.
+    """
+
+    def __init__(self, url, prefix='live:'):
+        super().__init__()
+        import redis
+        self.url = url
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._listeners = {}
+
+    def publish(self, channel, message):
+        try:
+            self._client.publish(self.prefix + channel, json.dumps(message))
+        except Exception:
+            # Live updates are best effort; pages still load the current state on their own
+            logger.exception("Could not publish a live update to Redis")
+
+    def subscribe(self, channel):
+        # One Redis listener per event loop feeds the local subscribers
+        loop = asyncio.get_running_loop()
+        listener = self._listeners.get(loop)
+        if listener is None or listener.done():
+            self._listeners[loop] = loop.create_task(self._listen())
+        return super().subscribe(channel)
+
+    async def _listen(self):
+        import redis.asyncio
+        while True:
+            try:
+                client = redis.asyncio.Redis.from_url(self.url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(self.prefix + '*')
+                    async for message in pubsub.listen():
+                        if message['type'] != 'pmessage':
+                            continue
+                        channel = message['channel'].decode()[len(self.prefix):]
+                        LocalBroker.publish(self, channel, json.loads(message['data']))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost the Redis subscription for live updates, reconnecting")
+                await asyncio.sleep(1)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if settings.LIVE_UPDATES_BROKER == 'redis':
+                _broker = RedisBroker(settings.LIVE_UPDATES_REDIS_URL)
+            else:
+                _broker = LocalBroker()
+        return _broker
+
+
+def publish(channel, event, data):
+    # `event` becomes the server-sent event name, `data` its JSON payload
+    get_broker().publish(channel, {'event': event, 'data': data})
+
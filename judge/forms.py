@@ -0,0 +1,50 @@
+# judge/forms.py
+from django import forms
+from django.template.defaultfilters import filesizeformat
+
+# Test data up to this size is shown (and edited) in a text box; anything bigger is
+# only replaced by uploading a file, so big stress tests are never rendered into a page
+INLINE_EDIT_LIMIT = 64 * 1024
+
+
+class TestDataForm(forms.ModelForm):
+    """
+    Edits a test case stored as files (see judge.testdata): small inputs and outputs
+    can be typed in, big ones are uploaded and streamed to the test data volume.
+    """
+    input_data = forms.CharField(widget=forms.Textarea(attrs={'rows': 3}), required=False, strip=False)
+    output_data = forms.CharField(widget=forms.Textarea(attrs={'rows': 3}), required=False, strip=False)
+    input_file = forms.FileField(required=False, help_text="Upload instead of typing, for big inputs")
+    output_file = forms.FileField(required=False, help_text="Upload instead of typing, for big outputs")
+
+    class Meta:
+        fields = ['input_data', 'output_data', 'input_file', 'output_file']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Which sides of an existing test case are too big to show in the text box
+        self.stored_only = set()
+        for side in ('input', 'output'):
+            if not self.instance.pk:
+                continue
+            size = getattr(self.instance, f'{side}_size')
+            if size > INLINE_EDIT_LIMIT:
+                self.stored_only.add(side)
+                self.fields[f'{side}_data'].widget.attrs['placeholder'] = (
+                    f"Stored file ({filesizeformat(size)}). Upload a file or type here to replace it.")
+            else:
+                self.initial[f'{side}_data'] = getattr(self.instance, f'{side}_data')
+
+    def save(self, commit=True):
+        for side in ('input', 'output'):
+            upload = self.cleaned_data.get(f'{side}_file')
+            text = self.cleaned_data.get(f'{side}_data', '')
+            # An uploaded file wins over whatever is in the text box
+            if upload:
+                setattr(self.instance, f'{side}_data', upload)
+            elif side in self.stored_only and not text:
+                # Left blank: keep the big file that wasn't shown
+                continue
+            else:
+                setattr(self.instance, f'{side}_data', text)
+        return super().save(commit)
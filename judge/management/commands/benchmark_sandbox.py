@@ -0,0 +1,68 @@
+import statistics
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from judge.sandbox import SANDBOX_MEMORY_HEADROOM_MB, SandboxPool, build_request, run_batch_cold, session_timeout
+
+SAMPLES = {
+    'py': 'print(input())',
+    'cpp': '#include <iostream>\nint main() { int x; std::cin >> x; std::cout << x; return 0; }',
+}
+
+
+class Command(BaseCommand):
+    help = 'Compares per-test-case latency of cold `docker run` containers against the warm sandbox pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20, help='Test cases to run in each mode.')
+        parser.add_argument('--language', choices=sorted(SAMPLES), default='py')
+        parser.add_argument('--memory-limit', type=int, default=256)
+
+    def handle(self, *args, **options):
+        runs = options['runs']
+        language = options['language']
+        memory_limit = options['memory_limit']
+        time_limit_ms = settings.JUDGE_DEFAULT_TIME_LIMIT_MS
+        request = build_request(language, SAMPLES[language], ['42'], time_limit_ms, memory_limit)
+        timeout = session_timeout(1, time_limit_ms)
+        container_memory = memory_limit + SANDBOX_MEMORY_HEADROOM_MB
+
+        self.stdout.write(f'Running {runs} "{language}" test case(s) per mode...')
+
+        cold = self._measure(runs, lambda: run_batch_cold(request, 1, timeout, container_memory))
+
+        pool = SandboxPool(
+            size=1,
+            max_uses=settings.JUDGE_SANDBOX_MAX_USES,
+            health_check_interval=settings.JUDGE_SANDBOX_HEALTH_CHECK_INTERVAL,
+        )
+        try:
+            # Container startup is paid once here, outside the timed loop
+            pool.warm_up(container_memory)
+            warm = self._measure(runs, lambda: pool.run_batch(request, 1, timeout, container_memory))
+        finally:
+            pool.shutdown()
+
+        self._report('cold docker run', cold)
+        self._report('warm pool exec', warm)
+        speedup = statistics.mean(cold) / statistics.mean(warm)
+        self.stdout.write(self.style.SUCCESS(f'Warm pool is {speedup:.1f}x faster per test case on average.'))
+
+    def _measure(self, runs, job):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            events = list(job())
+            timings.append((time.perf_counter() - started) * 1000)
+            output = events[-1]['stdout'].read() if events and 'stdout' in events[-1] else b''
+            if output.strip() != b'42':
+                self.stdout.write(self.style.WARNING(f'Unexpected result: {events!r:.200}'))
+        return timings
+
+    def _report(self, label, timings):
+        ordered = sorted(timings)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.stdout.write(
+            f'{label:>16}: mean {statistics.mean(timings):7.1f} ms | '
+            f'p50 {statistics.median(timings):7.1f} ms | p95 {p95:7.1f} ms'
+        )
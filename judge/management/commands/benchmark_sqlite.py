@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# A stand-in for the submissions table: what the judge writes and the pages read
+SCHEMA = '''
+CREATE TABLE submission (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    problem_id INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    verdict TEXT NOT NULL,
+    time_ms INTEGER,
+    case_results TEXT NOT NULL,
+    submitted_at REAL NOT NULL
+);
+CREATE INDEX submission_user_idx ON submission (user_id, submitted_at);
+'''
+CODE = 'def solve():\n    print(sum(map(int, input().split())))\n\nsolve()\n' * 10
+CASES = '[' + ', '.join('{"case": %d, "verdict": "Accepted", "cpu_ms": 12, "wall_ms": 15, "memory_kb": 9000}' % i
+                         for i in range(20)) + ']'
+USERS = 200
+
+
+class Command(BaseCommand):
+    help = ('Measures concurrent submission writes and page reads on a scratch SQLite database, '
+            'with SQLite\'s default settings and with the "wal" profile (see SQLITE_PROFILE).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5, help='Duration of each run.')
+        parser.add_argument('--writers', type=int, default=4,
+                            help='Threads submitting code and storing verdicts, like judge workers.')
+        parser.add_argument('--readers', type=int, default=8, help='Threads reading, like web requests.')
+        parser.add_argument('--rows', type=int, default=20000, help='Submissions in the table beforehand.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['writers']} writer(s) and {options['readers']} reader(s) for "
+            f"{options['seconds']:g}s per run, {options['rows']} existing submission(s)..."
+        )
+        runs = [
+            ('default', self._default_connection, False),
+            ('wal', self._wal_connection, False),
+            ('wal + serialized', self._wal_connection, True),
+        ]
+        results = {}
+        for label, connect, serialize in runs:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self._prepare(path, connect, options['rows'])
+                results[label] = self._run(path, connect, serialize, options)
+            self._report(label, results[label], options['seconds'])
+
+        before, after = results['default'], results['wal + serialized']
+        if before['writes'] and before['reads']:
+            self.stdout.write(self.style.SUCCESS(
+                f"WAL profile: {after['writes'] / before['writes']:.1f}x the writes and "
+                f"{after['reads'] / before['reads']:.1f}x the reads of the default settings."
+            ))
+
+    def _default_connection(self, path):
+        # What Django used before: rollback journal, 5 second timeout, deferred transactions
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        return connection, 'BEGIN'
+
+    def _wal_connection(self, path):
+        # The same options as the "wal" profile in backend/settings.py
+        connection = sqlite3.connect(path, timeout=settings.SQLITE_BUSY_TIMEOUT_SECONDS, isolation_level=None,
+                                     check_same_thread=False)
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            connection.execute(f'PRAGMA {name}={value}')
+        return connection, 'BEGIN IMMEDIATE'
+
+    def _prepare(self, path, connect, rows):
+        connection, _ = connect(path)
+        connection.executescript(SCHEMA)
+        connection.execute('BEGIN')
+        now = time.time()
+        connection.executemany(
+            'INSERT INTO submission (user_id, problem_id, code, verdict, time_ms, case_results, submitted_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ((i % USERS, i % 50, CODE, 'Accepted', 12, CASES, now - i) for i in range(rows)),
+        )
+        connection.execute('COMMIT')
+        connection.close()
+
+    def _run(self, path, connect, serialize, options):
+        stop = threading.Event()
+        write_lock = threading.Lock()
+        stats = {'writes': 0, 'reads': 0, 'errors': 0, 'write_ms': [], 'read_ms': []}
+        stats_lock = threading.Lock()
+
+        def record(kind, started):
+            elapsed = (time.perf_counter() - started) * 1000
+            with stats_lock:
+                stats[kind + 's'] += 1
+                stats[kind + '_ms'].append(elapsed)
+
+        def transaction(connection, begin, statement, params):
+            connection.execute(begin)
+            try:
+                connection.execute(statement, params)
+                connection.execute('COMMIT')
+            except Exception:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                raise
+
+        def write(connection, begin, statement, params):
+            # Like judge.writes.result_write: one writer thread of this process at a time
+            if serialize:
+                with write_lock:
+                    transaction(connection, begin, statement, params)
+            else:
+                transaction(connection, begin, statement, params)
+
+        def writer(index):
+            connection, begin = connect(path)
+            user_id = index
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    # A submission arrives as Queued, then its verdict is stored
+                    write(connection, begin,
+                          'INSERT INTO submission (user_id, problem_id, code, verdict, case_results, submitted_at) '
+                          'VALUES (?, ?, ?, ?, ?, ?)', (user_id, index, CODE, 'Queued', '[]', time.time()))
+                    submission_id = connection.execute('SELECT last_insert_rowid()').fetchone()[0]
+                    write(connection, begin, 'UPDATE submission SET verdict = ?, time_ms = ?, case_results = ? '
+                                             'WHERE id = ?', ('Accepted', 12, CASES, submission_id))
+                except sqlite3.OperationalError:
+                    # "database is locked"
+                    with stats_lock:
+                        stats['errors'] += 1
+                    continue
+                record('write', started)
+            connection.close()
+
+        def reader(index):
+            connection, begin = connect(path)
+            user_id = index % USERS
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    # A user's recent submissions, then the verdict counts of a problem
+                    connection.execute('SELECT id, verdict, time_ms FROM submission WHERE user_id = ? '
+                                       'ORDER BY submitted_at DESC LIMIT 20', (user_id,)).fetchall()
+                    connection.execute('SELECT verdict, COUNT(*) FROM submission WHERE problem_id = ? '
+                                       'GROUP BY verdict', (index % 50,)).fetchall()
+                except sqlite3.OperationalError:
+                    with stats_lock:
+                        stats['errors'] += 1
+                    continue
+                record('read', started)
+            connection.close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return stats
+
+    def _report(self, label, stats, seconds):
+        def p95(timings):
+            if not timings:
+                return 0.0
+            ordered = sorted(timings)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+        self.stdout.write(
+            f"{label:>17}: {stats['writes'] / seconds:8.1f} submissions/s "
+            f"(p50 {statistics.median(stats['write_ms'] or [0]):6.1f} ms, p95 {p95(stats['write_ms']):6.1f} ms) | "
+            f"{stats['reads'] / seconds:8.1f} reads/s "
+            f"(p50 {statistics.median(stats['read_ms'] or [0]):6.1f} ms, p95 {p95(stats['read_ms']):6.1f} ms) | "
+            f"{stats['errors']} locked"
+        )
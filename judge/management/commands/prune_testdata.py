@@ -0,0 +1,44 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from contest.models import ContestTestCase
+from problems.models import TestCase
+from judge import testdata
+
+
+class Command(BaseCommand):
+    help = 'Deletes test data files that no test case refers to any more.'
+
+    def add_arguments(self, parser):
+        # A file stored by a form that is still being saved isn't referenced yet, so leave recent files alone
+        parser.add_argument('--min-age-hours', type=float, default=1,
+                            help='Only delete files older than this.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted.')
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options['min_age_hours'] * 3600
+        referenced = set()
+        for model in (TestCase, ContestTestCase):
+            for input_hash, output_hash in model.objects.values_list('input_hash', 'output_hash').iterator():
+                referenced.add(input_hash)
+                referenced.add(output_hash)
+
+        directory = testdata.get_directory()
+        if not directory.exists():
+            self.stdout.write('No test data directory, nothing to do.')
+            return
+
+        deleted = freed = 0
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                if name in referenced or stat.st_mtime > cutoff:
+                    continue
+                if not options['dry_run']:
+                    os.remove(path)
+                deleted += 1
+                freed += stat.st_size
+
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{action} {deleted} file(s), {freed} bytes.'))
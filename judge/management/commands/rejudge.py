@@ -0,0 +1,112 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from contest.models import ContestSubmission
+from submission.models import CodeSubmission
+from judge.models import Rejudge
+from judge.queue import enqueue_rejudge
+
+
+class Command(BaseCommand):
+    help = ('Judges existing submissions again (e.g. after test data changed) at background priority, '
+            'and reports which verdicts changed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problem', type=int, action='append', default=[],
+                            help='Practice problem id (repeatable).')
+        parser.add_argument('--contest', type=int, action='append', default=[],
+                            help='Contest id (repeatable).')
+        parser.add_argument('--contest-problem', type=int, action='append', default=[],
+                            help='Contest problem id (repeatable).')
+        parser.add_argument('--user', action='append', default=[], help='Username (repeatable).')
+        parser.add_argument('--verdict', action='append', default=[],
+                            help='Only submissions with this verdict (repeatable).')
+        parser.add_argument('--description', default='', help='Shown next to the rejudge in the admin.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Submissions queued per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the matching submissions.')
+        parser.add_argument('--wait', action='store_true',
+                            help='Report progress until the rejudge finishes, then list the verdict changes.')
+        parser.add_argument('--report', type=int, metavar='REJUDGE_ID',
+                            help='Show the progress and verdict changes of an earlier rejudge instead.')
+
+    def handle(self, *args, **options):
+        if options['report']:
+            try:
+                rejudge = Rejudge.objects.get(id=options['report'])
+            except Rejudge.DoesNotExist:
+                raise CommandError(f"Rejudge {options['report']} does not exist.")
+            self._report(rejudge, options['wait'])
+            return
+
+        code_submissions, contest_submissions = self._select(options)
+        count = sum(qs.count() for qs in (code_submissions, contest_submissions) if qs is not None)
+        if options['dry_run']:
+            self.stdout.write(f'{count} submission(s) match.')
+            return
+
+        rejudge = enqueue_rejudge(code_submissions, contest_submissions,
+                                  description=options['description'] or self._describe(options),
+                                  batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rejudge {rejudge.id}: queued {rejudge.total} submission(s).'))
+        if rejudge.total:
+            self._report(rejudge, options['wait'])
+
+    def _select(self, options):
+        # Practice filters only make sense for practice submissions and contest filters for contest ones;
+        # user and verdict filters apply to both
+        practice = bool(options['problem'])
+        contest = bool(options['contest'] or options['contest_problem'])
+        if not (practice or contest or options['user'] or options['verdict']):
+            raise CommandError('Give at least one of --problem, --contest, --contest-problem, --user or --verdict.')
+
+        code_submissions = contest_submissions = None
+        if practice or not contest:
+            # Custom runs have no problem and are never judged
+            code_submissions = CodeSubmission.objects.filter(problem__isnull=False)
+            if options['problem']:
+                code_submissions = code_submissions.filter(problem_id__in=options['problem'])
+        if contest or not practice:
+            contest_submissions = ContestSubmission.objects.all()
+            if options['contest']:
+                contest_submissions = contest_submissions.filter(contest_id__in=options['contest'])
+            if options['contest_problem']:
+                contest_submissions = contest_submissions.filter(problem_id__in=options['contest_problem'])
+
+        querysets = []
+        for queryset in (code_submissions, contest_submissions):
+            if queryset is not None:
+                if options['user']:
+                    queryset = queryset.filter(user__username__in=options['user'])
+                if options['verdict']:
+                    queryset = queryset.filter(verdict__in=options['verdict'])
+            querysets.append(queryset)
+        return querysets
+
+    def _describe(self, options):
+        filters = [
+            f"{name.replace('_', ' ')} {', '.join(map(str, options[name]))}"
+            for name in ('problem', 'contest', 'contest_problem', 'user', 'verdict') if options[name]
+        ]
+        return 'Command line: ' + '; '.join(filters)
+
+    def _report(self, rejudge, wait):
+        while True:
+            progress = rejudge.progress()
+            finished = progress.get('Done', 0) + progress.get('Failed', 0)
+            self.stdout.write(
+                f'Rejudge {rejudge.id}: {finished}/{rejudge.total} judged '
+                f"({progress.get('Running', 0)} running, {progress.get('Pending', 0)} pending, "
+                f"{progress.get('Failed', 0)} failed)"
+            )
+            if not wait or rejudge.is_finished():
+                break
+            time.sleep(5)
+
+        changes = list(rejudge.changes())
+        self.stdout.write(f'{len(changes)} verdict(s) changed so far.')
+        for task in changes:
+            submission = task.submission
+            self.stdout.write(
+                f'  {submission._meta.model_name} {submission.pk} ({submission.user.username}): '
+                f'{task.previous_verdict or "-"} -> {task.verdict}'
+            )
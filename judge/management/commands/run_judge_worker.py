@@ -0,0 +1,129 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from judge.engine import judge_task
+from judge.queue import claim_next_task, fail_task, heartbeat, requeue_stale_tasks
+from judge.sandbox import start_pool, stop_pool
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Runs a pool of judge workers that evaluate queued submissions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.JUDGE_WORKER_CONCURRENCY,
+                            help='Number of worker threads in this process.')
+        parser.add_argument('--poll-interval', type=float, default=settings.JUDGE_POLL_INTERVAL,
+                            help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue and exit instead of polling forever.')
+
+    def handle(self, *args, **options):
+        self.stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        # The tasks each worker thread is judging right now, by worker name
+        self.running = {}
+        # Anything still marked Running from a crashed worker goes back to the queue
+        self._check_tasks()
+
+        concurrency = max(1, options['concurrency'])
+        base_name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'Starting {concurrency} judge worker(s) on {base_name}...')
+
+        # Pre-start the warm sandbox containers so the first submissions don't pay for a cold start
+        pool = start_pool()
+        if pool is not None:
+            try:
+                pool.warm_up()
+                self.stdout.write(f'Warm sandbox pool ready with {pool.size} container(s).')
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f'Could not warm up the sandbox pool: {e}'))
+
+        threads = []
+        for index in range(concurrency):
+            thread = threading.Thread(
+                target=self._work,
+                args=(f'{base_name}:{index}', options['poll_interval'], options['once']),
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+
+        # While the workers run, report on their tasks and pick up those of dead workers,
+        # several times per JUDGE_STALE_TASK_SECONDS
+        check_interval = settings.JUDGE_STALE_TASK_SECONDS / 4
+        last_check = time.monotonic()
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+            if time.monotonic() - last_check >= check_interval:
+                last_check = time.monotonic()
+                self._check_tasks()
+
+        stop_pool()
+        self.stdout.write(self.style.SUCCESS('Judge workers stopped.'))
+
+    def _request_stop(self, signum, frame):
+        self.stdout.write('Stopping after the current submissions finish...')
+        self.stop_event.set()
+
+    def _check_tasks(self):
+        try:
+            close_old_connections()
+            heartbeat(list(self.running.values()))
+            requeued, failed = requeue_stale_tasks(settings.JUDGE_STALE_TASK_SECONDS)
+        except Exception:
+            # Most likely the database is briefly unavailable; try again at the next check
+            logger.exception("Could not check on the running judge tasks")
+            return
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale task(s).'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Failed {failed} task(s) that kept getting abandoned.'))
+
+    def _work(self, worker_name, poll_interval, once):
+        while not self.stop_event.is_set():
+            try:
+                close_old_connections()
+                task = claim_next_task(worker_name)
+            except Exception:
+                logger.exception("[%s] Could not claim a task", worker_name)
+                self.stop_event.wait(poll_interval)
+                continue
+            if task is None:
+                if once:
+                    break
+                self.stop_event.wait(poll_interval)
+                continue
+
+            self.running[worker_name] = task.id
+            started = time.monotonic()
+            try:
+                verdict = judge_task(task)
+            except Exception as e:
+                # Crashed outside the sandbox run (storing or publishing the result): the
+                # thread lives on, and the task is retried until it runs out of attempts
+                logger.exception("[%s] Judge task %s crashed", worker_name, task.id)
+                try:
+                    close_old_connections()
+                    status = fail_task(task, f'{type(e).__name__}: {e}')
+                except Exception:
+                    # Left Running; requeued once its heartbeat is stale
+                    logger.exception("[%s] Could not release judge task %s", worker_name, task.id)
+                    status = None
+                self.stdout.write(self.style.ERROR(
+                    f'[{worker_name}] task {task.id} crashed: {e} ({status or "left Running"})'))
+                continue
+            finally:
+                self.running.pop(worker_name, None)
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'[{worker_name}] task {task.id}: {verdict} ({elapsed:.2f}s)')
+        close_old_connections()
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contest', '0002_contestsubmission'),
+        ('submission', '0005_codesubmission_verdict_delete_solution'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JudgeTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Running', 'Running'), ('Done', 'Done'), ('Failed', 'Failed')], default='Pending', max_length=10)),
+                ('priority', models.IntegerField(default=10, help_text='Higher priority tasks are judged first.')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('code_submission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='judge_tasks', to='submission.codesubmission')),
+                ('contest_submission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='judge_tasks', to='contest.contestsubmission')),
+            ],
+            options={
+                'ordering': ['-priority', 'created_at'],
+                'indexes': [models.Index(fields=['status', '-priority', 'created_at'], name='judge_task_poll_idx')],
+            },
+        ),
+    ]
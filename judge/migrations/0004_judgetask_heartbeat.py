@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0003_rejudge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='judgetask',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
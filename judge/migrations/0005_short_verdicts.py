@@ -0,0 +1,24 @@
+# The verdicts kept on judge tasks are the submissions' short labels (see
+# submission 0010_verdict_details); shortens the ones copied before
+
+from django.db import migrations
+from judge.engine import error_verdict
+
+
+def shorten_verdicts(apps, schema_editor):
+    JudgeTask = apps.get_model('judge', 'judgetask')
+    for field in ('verdict', 'previous_verdict'):
+        for task in JudgeTask.objects.filter(**{f'{field}__startswith': 'Execution Error'}).iterator():
+            setattr(task, field, error_verdict(getattr(task, field))[0])
+            task.save(update_fields=[field])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0004_judgetask_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RunPython(shorten_verdicts, migrations.RunPython.noop),
+    ]
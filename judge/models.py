@@ -0,0 +1,107 @@
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models import Count, F
+from submission.models import CodeSubmission
+from contest.models import ContestSubmission
+
+
+# A bulk re-evaluation of existing submissions, e.g. after a problem's test data
+# changed. Its tasks remember each submission's verdict from before the rejudge,
+# so organizers can see exactly what changed.
+class Rejudge(models.Model):
+    description = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    total = models.PositiveIntegerField(default=0, help_text="Number of submissions queued")
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def progress(self):
+        # Number of this rejudge's tasks in each status
+        return dict(self.tasks.values_list('status').annotate(count=Count('id')))
+
+    def is_finished(self):
+        return not self.tasks.filter(status__in=['Pending', 'Running']).exists()
+
+    def changes(self):
+        """
+        The finished tasks whose verdict differs from the one the submission had before.
+        """
+        return (self.tasks.filter(status__in=['Done', 'Failed'])
+                .exclude(verdict=F('previous_verdict'))
+                .select_related('code_submission__user', 'contest_submission__user'))
+
+    def __str__(self):
+        return f"Rejudge {self.id}: {self.description or 'no description'}"
+
+
+# A single unit of work for the judge workers. Exactly one of the two
+# submission foreign keys is set, depending on where the code was submitted.
+class JudgeTask(models.Model):
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Running', 'Running'),
+        ('Done', 'Done'),
+        ('Failed', 'Failed'),
+    ]
+    # Live submissions always jump ahead of background work
+    PRIORITY_LIVE = 10
+    # Rejudges and other bulk work only run when no live submission is waiting
+    PRIORITY_REJUDGE = 0
+
+    code_submission = models.ForeignKey(CodeSubmission, on_delete=models.CASCADE,
+                                        null=True, blank=True, related_name='judge_tasks')
+    contest_submission = models.ForeignKey(ContestSubmission, on_delete=models.CASCADE,
+                                           null=True, blank=True, related_name='judge_tasks')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    priority = models.IntegerField(default=PRIORITY_LIVE, help_text="Higher priority tasks are judged first.")
+    attempts = models.PositiveIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while it judges the task; a task whose heartbeat stops is requeued
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # The verdict this task ended with, and for rejudges the one the submission had before
+    verdict = models.CharField(max_length=100, blank=True)
+    previous_verdict = models.CharField(max_length=100, blank=True)
+    rejudge = models.ForeignKey(Rejudge, on_delete=models.SET_NULL, null=True, blank=True, related_name='tasks')
+
+    class Meta:
+        ordering = ['-priority', 'created_at']
+        indexes = [
+            # The worker poll query: oldest pending task with the highest priority
+            models.Index(fields=['status', '-priority', 'created_at'], name='judge_task_poll_idx'),
+        ]
+
+    @property
+    def submission(self):
+        return self.code_submission or self.contest_submission
+
+    def __str__(self):
+        return f"Judge task {self.id} ({self.status})"
+
+
+# Monotonic counters shared by every judge worker process (e.g. compile cache hits),
+# kept in the database so they can be read from the admin or the metrics endpoint.
+class JudgeCounter(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def increment(cls, name, amount=1):
+        # A single UPDATE keeps concurrent workers from losing increments
+        updated = cls.objects.filter(name=name).update(value=models.F('value') + amount)
+        if not updated:
+            cls.objects.get_or_create(name=name)
+            cls.objects.filter(name=name).update(value=models.F('value') + amount)
+
+    @classmethod
+    def snapshot(cls):
+        return dict(cls.objects.values_list('name', 'value'))
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
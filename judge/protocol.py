@@ -0,0 +1,79 @@
+# judge/protocol.py
+#
+# Framing for the pipe between the judge and sandbox/runner.py (which keeps its own
+# copy of these few lines, since it can't import Django code inside the sandbox).
+#
+# A frame is a 4-byte big-endian header length, a JSON header, and then the raw
+# bytes of every blob the header lists in "blobs": [[name, size], ...]. Sources,
+# test inputs, program output and compiled binaries travel as blobs, so they are
+# never escaped, split on delimiters or decoded on the way.
+import json
+import struct
+import tempfile
+
+FRAME_PREFIX = struct.Struct('>I')
+# Spooled blobs are copied in pieces of this many bytes, and kept in memory up to SPOOL_MAX_MEMORY
+SPOOL_CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+
+def encode_frame(header, **blobs):
+    """
+    Returns the frame as a list of byte strings to be written in order; the blobs
+    are passed through as they are instead of being copied into one buffer.
+    """
+    header = dict(header, blobs=[[name, len(data)] for name, data in blobs.items()])
+    encoded = json.dumps(header).encode()
+    return [FRAME_PREFIX.pack(len(encoded)) + encoded, *blobs.values()]
+
+
+def encode_stream_frame(header, name, size, chunks):
+    """
+    Like encode_frame for one blob of `size` bytes that comes from the iterable
+    `chunks` (e.g. a file read a piece at a time). Returns a generator, so nothing
+    is read before the frame is actually written.
+    """
+    encoded = json.dumps(dict(header, blobs=[[name, size]])).encode()
+    yield FRAME_PREFIX.pack(len(encoded)) + encoded
+    yield from chunks
+
+
+def _read_exact(stream, size):
+    # A buffered read only comes back short at the end of the stream
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError("The frame was cut off.")
+    return data
+
+
+def _spool(stream, size):
+    # Copies the next `size` bytes to a temporary file that only goes to disk once it is big
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    while size:
+        chunk = stream.read(min(size, SPOOL_CHUNK_SIZE))
+        if not chunk:
+            spooled.close()
+            raise EOFError("The frame was cut off.")
+        spooled.write(chunk)
+        size -= len(chunk)
+    spooled.seek(0)
+    return spooled
+
+
+def read_frame(stream, spool=()):
+    """
+    Reads the next frame as a dict of its header fields plus one bytes value per blob.
+    The blobs named in `spool` come as binary files to read instead, copied over a
+    piece at a time, so a big one (a program's whole output) never sits in memory.
+    Returns None at a clean end of the stream and raises EOFError on a truncated frame.
+    """
+    prefix = stream.read(FRAME_PREFIX.size)
+    if not prefix:
+        return None
+    if len(prefix) < FRAME_PREFIX.size:
+        raise EOFError("The frame was cut off.")
+    (header_size,) = FRAME_PREFIX.unpack(prefix)
+    frame = json.loads(_read_exact(stream, header_size))
+    for name, size in frame.pop('blobs', []):
+        frame[name] = _spool(stream, size) if name in spool else _read_exact(stream, size)
+    return frame
@@ -0,0 +1,151 @@
+# judge/queue.py
+import datetime
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from contest.models import ContestSubmission
+from submission.models import CodeSubmission
+from .models import JudgeTask, Rejudge
+from .engine import QUEUED, SYSTEM_ERROR, judge_task
+
+
+def enqueue_code_submission(submission, priority=JudgeTask.PRIORITY_LIVE):
+    return _enqueue(JudgeTask(code_submission=submission, priority=priority), submission)
+
+
+def enqueue_contest_submission(submission, priority=JudgeTask.PRIORITY_LIVE):
+    return _enqueue(JudgeTask(contest_submission=submission, priority=priority), submission)
+
+
+def _enqueue(task, submission):
+    # The submission row must already exist so the result page can show "Queued"
+    if submission.verdict != QUEUED:
+        submission.verdict = QUEUED
+        submission.verdict_details = ''
+        submission.save(update_fields=['verdict', 'verdict_details'])
+    task.save()
+
+    # Development setups without a running worker can judge right inside the request
+    if getattr(settings, 'JUDGE_RUN_INLINE', False):
+        claimed = claim_task(task, worker='inline')
+        if claimed:
+            judge_task(claimed)
+    return task
+
+
+def enqueue_rejudge(code_submissions=None, contest_submissions=None, created_by=None, description='',
+                    batch_size=None):
+    """
+    Queues existing submissions (querysets of CodeSubmission / ContestSubmission) to be
+    judged again at rejudge priority, in batches of `batch_size`. Returns the Rejudge
+    that tracks their progress and verdict changes.
+    """
+    batch_size = batch_size or settings.JUDGE_REJUDGE_BATCH_SIZE
+    rejudge = Rejudge.objects.create(created_by=created_by, description=description)
+    for field, submissions in (('code_submission', code_submissions), ('contest_submission', contest_submissions)):
+        if submissions is None:
+            continue
+        # Submissions still waiting for the judge will get the new test data anyway
+        rows = list(submissions.exclude(judge_tasks__status__in=['Pending', 'Running'])
+                    .values_list('pk', 'verdict').distinct())
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            with transaction.atomic():
+                # The old verdict is kept on the task before the submission goes back to Queued
+                JudgeTask.objects.bulk_create([
+                    JudgeTask(**{f'{field}_id': pk}, priority=JudgeTask.PRIORITY_REJUDGE,
+                              rejudge=rejudge, previous_verdict=verdict)
+                    for pk, verdict in batch
+                ])
+                (submissions.model.objects.filter(pk__in=[pk for pk, _ in batch])
+                 .update(verdict=QUEUED, verdict_details=''))
+            rejudge.total += len(batch)
+    rejudge.save(update_fields=['total'])
+
+    if getattr(settings, 'JUDGE_RUN_INLINE', False):
+        for task in rejudge.tasks.filter(status='Pending'):
+            claimed = claim_task(task, worker='inline')
+            if claimed:
+                judge_task(claimed)
+    return rejudge
+
+
+def claim_task(task, worker):
+    """
+    Atomically moves a pending task to Running. Returns the refreshed task,
+    or None if another worker claimed it first.
+    """
+    now = timezone.now()
+    claimed = JudgeTask.objects.filter(id=task.id, status='Pending').update(
+        status='Running',
+        worker=worker,
+        started_at=now,
+        heartbeat_at=now,
+        attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return None
+    task.refresh_from_db()
+    return task
+
+
+def claim_next_task(worker):
+    # Several workers may race for the same row, so keep trying until we win one
+    # or the queue is empty. The conditional UPDATE works the same on SQLite and Postgres.
+    while True:
+        pending = JudgeTask.objects.filter(status='Pending')
+        # Rejudges only get a few workers at a time; the rest stay free for live submissions
+        running_rejudges = JudgeTask.objects.filter(status='Running', priority__lt=JudgeTask.PRIORITY_LIVE).count()
+        if running_rejudges >= settings.JUDGE_REJUDGE_MAX_RUNNING:
+            pending = pending.filter(priority__gte=JudgeTask.PRIORITY_LIVE)
+        task = pending.order_by('-priority', 'created_at').first()
+        if task is None:
+            return None
+        claimed = claim_task(task, worker)
+        if claimed:
+            return claimed
+
+
+def heartbeat(task_ids):
+    # Tells the other workers that these tasks are still being judged
+    return JudgeTask.objects.filter(id__in=task_ids, status='Running').update(heartbeat_at=timezone.now())
+
+
+def _give_up(tasks, error):
+    # Fails the tasks for good; their submissions show a System Error
+    ids = list(tasks.values_list('id', flat=True))
+    if not ids:
+        return 0
+    CodeSubmission.objects.filter(judge_tasks__id__in=ids).update(verdict=SYSTEM_ERROR, verdict_details='')
+    ContestSubmission.objects.filter(judge_tasks__id__in=ids).update(verdict=SYSTEM_ERROR, verdict_details='')
+    return JudgeTask.objects.filter(id__in=ids).update(status='Failed', verdict=SYSTEM_ERROR, error=error,
+                                                       finished_at=timezone.now())
+
+
+def fail_task(task, error):
+    """
+    Handles a task whose judging crashed outside the sandbox run (e.g. while storing
+    its result): it goes back to the queue, or fails for good once it has been tried
+    JUDGE_MAX_ATTEMPTS times. Returns the task's new status, or None if it had already
+    finished.
+    """
+    tasks = JudgeTask.objects.filter(id=task.id, status='Running')
+    if task.attempts < settings.JUDGE_MAX_ATTEMPTS:
+        return 'Pending' if tasks.update(status='Pending', worker='', error=error) else None
+    return 'Failed' if _give_up(tasks, error) else None
+
+
+def requeue_stale_tasks(max_age_seconds):
+    """
+    Puts tasks whose worker died mid-run (no heartbeat for `max_age_seconds`) back in
+    the queue, and fails those that already used up their attempts. Returns the number
+    of tasks requeued and failed.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=max_age_seconds)
+    stale = JudgeTask.objects.filter(status='Running').filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff))
+    failed = _give_up(stale.filter(attempts__gte=settings.JUDGE_MAX_ATTEMPTS),
+                      f'Abandoned by its worker {settings.JUDGE_MAX_ATTEMPTS} time(s)')
+    requeued = stale.update(status='Pending', worker='')
+    return requeued, failed
@@ -0,0 +1,638 @@
+# judge/sandbox.py
+import atexit
+import functools
+import io
+import logging
+import os
+import subprocess
+import threading
+import time
+import uuid
+from contextlib import closing
+from django.conf import settings
+from .models import JudgeCounter
+from . import testdata
+from .protocol import encode_frame, encode_stream_frame, read_frame
+from .compile_cache import HIT_COUNTER, MISS_COUNTER, cache_key, get_compile_cache
+
+logger = logging.getLogger(__name__)
+
+RUNNER_PATH = '/judge/runner.py'
+# Outer timeout for one judging session: container startup and compilation,
+# plus every test case's wall clock limit (and a second of slack per case)
+SESSION_OVERHEAD = 30
+# Extra time per test case when a special judge checks it (the runner gives the checker
+# 20 s of wall clock time), on top of one more SESSION_OVERHEAD for compiling the checker
+CHECKER_OVERHEAD = 21
+# CPU share of one sandbox container; wall clock limits are scaled by it
+SANDBOX_CPUS = 0.5
+# Processes and threads per container, enough for a compiler but not for a fork bomb
+SANDBOX_PIDS_LIMIT = 64
+# Containers get this much memory on top of the problem's limit for the runner itself,
+# so the runner's precise per-case check fires before the container's OOM killer
+SANDBOX_MEMORY_HEADROOM_MB = 64
+# Case statuses after which a container may be left in a bad state, so it is never reused
+POLICY_VIOLATIONS = ('timeout', 'memory', 'output_limit', 'killed')
+# The runner starts as root only to hand the submission and the special judge their own
+# users (see sandbox/runner.py); these are all the capabilities it needs for that
+SANDBOX_SECURITY_ARGS = [
+    '--cap-drop', 'ALL',
+    *[arg for capability in ('CHOWN', 'DAC_OVERRIDE', 'FOWNER', 'KILL', 'SETGID', 'SETUID')
+      for arg in ('--cap-add', capability)],
+    '--security-opt', 'no-new-privileges',
+]
+
+
+def container_args(memory_limit):
+    # The isolation and limits of every sandbox container, warm or cold
+    return [
+        '--network', 'none',
+        '--memory', f'{memory_limit}m',
+        '--memory-swap', f'{memory_limit}m',
+        '--cpus', str(SANDBOX_CPUS),
+        '--pids-limit', str(SANDBOX_PIDS_LIMIT),
+        *SANDBOX_SECURITY_ARGS,
+    ]
+
+
+def get_image_name():
+    return os.getenv('DOCKER_SANDBOX_IMAGE_NAME', 'onlinejudge-sandbox:latest')
+
+
+@functools.lru_cache(maxsize=None)
+def get_image_digest(image_name):
+    # Part of the compile cache key, so rebuilding the sandbox image invalidates old binaries
+    try:
+        result = subprocess.run(['docker', 'image', 'inspect', '--format', '{{.Id}}', image_name],
+                                capture_output=True, text=True, timeout=10)
+    except Exception:
+        return image_name
+    return result.stdout.strip() or image_name
+
+
+def wall_limit_ms(time_limit_ms):
+    # A program using its whole CPU budget needs 1 / SANDBOX_CPUS times as long on the wall clock
+    return int(time_limit_ms / SANDBOX_CPUS) + 1000
+
+
+def session_timeout(case_count, time_limit_ms):
+    return SESSION_OVERHEAD + case_count * (wall_limit_ms(time_limit_ms) / 1000 + 1)
+
+
+def _data_frame(kind, index, data):
+    # Stored test data is streamed from its file a piece at a time; inline text or bytes go as they are
+    header = {'type': kind, 'case': index}
+    if isinstance(data, dict):
+        size = testdata.path(data['file']).stat().st_size
+        return encode_stream_frame(header, 'data', size, testdata.iter_bytes(data['file']))
+    if isinstance(data, str):
+        data = data.encode()
+    return encode_frame(header, data=data)
+
+
+def build_request(language, code, inputs, time_limit_ms, memory_limit, binary=None, return_binary=False,
+                  checker=None, answers=None, output_limit=None, stdout_capture=None):
+    """
+    Encodes a runner request as an iterator of frames: a header frame with the
+    language, limits and case count that carries the source, then one frame per input.
+    The runner reads the inputs one at a time, as it gets to each test case, and stored
+    inputs are only read from their files as the pipe to the runner takes them.
+    `binary` is the program already compiled (from the compile cache), which the
+    runner uses instead of compiling; the checker's is in checker['binary'].
+    `output_limit` is in MB; `stdout_capture` caps how much of each output comes
+    back (None for all of it, as the built-in checkers need).
+    """
+    header = {
+        'type': 'request',
+        'language': language,
+        'case_count': len(inputs),
+        'time_limit_ms': time_limit_ms,
+        'wall_limit_ms': wall_limit_ms(time_limit_ms),
+        'memory_limit_kb': memory_limit * 1024,
+        'output_limit_bytes': (output_limit or settings.JUDGE_DEFAULT_OUTPUT_LIMIT_MB) * 1024 * 1024,
+        'stdout_capture_bytes': stdout_capture,
+        'stderr_capture_bytes': settings.JUDGE_OUTPUT_PREVIEW_BYTES,
+        'compile_flags': settings.JUDGE_CPP_FLAGS,
+        'return_binary': return_binary,
+    }
+    blobs = {'code': code.encode()}
+    if binary is not None:
+        blobs['binary'] = binary
+    if checker is not None:
+        # Special judge: the runner checks each output itself, so it needs the expected answers too
+        header['checker'] = {name: value for name, value in checker.items() if name not in ('code', 'binary')}
+        blobs['checker_code'] = checker['code'].encode()
+        if checker.get('binary') is not None:
+            blobs['checker_binary'] = checker['binary']
+
+    def frames():
+        yield from encode_frame(header, **blobs)
+        for index, data in enumerate(inputs):
+            yield from _data_frame('input', index, data)
+            if checker is not None:
+                yield from _data_frame('answer', index, answers[index])
+
+    return frames()
+
+
+def preview(data, size):
+    # Decodes a captured prefix of program output, saying how much was left out
+    text = data.decode(errors='replace')
+    if size > len(data):
+        text += f"\n... ({size - len(data)} more bytes not shown)"
+    return text
+
+
+def case_error(event):
+    """
+    Returns the error message for a failed runner event, or None if the case ran cleanly
+    and its output should be compared.
+    """
+    if event['type'] == 'compile_error':
+        return f"Execution Error:\nCompilation Error:\n{event['message']}"
+    if event['type'] == 'error':
+        return f"Execution Error:\n{event['message']}"
+    if event['type'] == 'checker_error':
+        return "System Error: Checker Compilation Failed"
+    if event['status'] == 'timeout':
+        return "Time Limit Exceeded"
+    # Over the limit, or a SIGKILL the runner didn't send (the container's OOM killer)
+    if event['status'] in ('memory', 'killed'):
+        return "Memory Limit Exceeded"
+    if event['status'] == 'output_limit':
+        return "Output Limit Exceeded"
+    # If the program wrote to stderr or crashed, it's a runtime error.
+    if event['stderr'] or event['status'] == 'runtime_error':
+        stderr = preview(event['stderr'], event.get('stderr_size', 0))
+        return f"Execution Error:\n{stderr or 'Exited with code ' + str(event['exit_code'])}"
+    return None
+
+
+def _synthetic_case(index, status):
+    return {
+        'type': 'case', 'case': index, 'status': status, 'exit_code': None,
+        'stdout': io.BytesIO(), 'stderr': b'', 'stdout_size': 0, 'stderr_size': 0,
+        'wall_ms': 0, 'cpu_ms': 0, 'memory_kb': 0,
+    }
+
+
+def _feed(pipe, frames):
+    try:
+        for data in frames:
+            pipe.write(data)
+        pipe.close()
+    except BrokenPipeError:
+        # The runner stopped reading (it finished early or was killed)
+        pass
+    except OSError:
+        # E.g. a test data file is missing; the runner sees a cut-off request and reports an error
+        logger.exception("Could not send the request to the sandbox")
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
+def _read_events(stream):
+    # Yields the runner's frames until its output ends; a frame cut off by a kill is dropped.
+    # A case's stdout comes as a binary file (see protocol.read_frame), to be compared in pieces.
+    while True:
+        try:
+            event = read_frame(stream, spool=('stdout',))
+        except EOFError:
+            return
+        if event is None:
+            return
+        yield event
+
+
+def stream_session(command, request, case_count, timeout, on_abort=None, cancel=None):
+    """
+    Runs one runner session and yields its events as they arrive. Always yields
+    either a compile/runner error or exactly `case_count` case events; missing cases
+    (the whole session timed out or was OOM-killed) are filled in here.
+
+    If the caller stops iterating early, `on_abort` is called to clean up whatever
+    is still running inside the sandbox. Setting the optional `cancel` event from
+    another thread kills the session even while it is waiting for a slow test case.
+    """
+    proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    stderr = []
+    threading.Thread(target=_feed, args=(proc.stdin, request), daemon=True).start()
+    stderr_reader = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+    stderr_reader.start()
+
+    timed_out = threading.Event()
+
+    def on_timeout():
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, on_timeout)
+    timer.start()
+
+    if cancel is not None:
+        def watch_cancel():
+            while proc.poll() is None:
+                if cancel.wait(0.05):
+                    proc.kill()
+                    return
+        threading.Thread(target=watch_cancel, daemon=True).start()
+
+    received = 0
+    finished = False
+    try:
+        for event in _read_events(proc.stdout):
+            if event['type'] == 'case':
+                received += 1
+            # The session counts as finished once its last event is delivered
+            terminal = event['type'] in ('compile_error', 'checker_error', 'error')
+            finished = terminal or received == case_count
+            yield event
+            if terminal:
+                return
+
+        proc.wait()
+        stderr_reader.join(timeout=1)
+        finished = True
+        if received < case_count:
+            if timed_out.is_set():
+                # If the entire session takes too long, the next case is a TLE.
+                yield _synthetic_case(received, 'timeout')
+            elif proc.returncode == 137:
+                # Exit code 137 from Docker means the sandbox was killed for using too much memory.
+                yield _synthetic_case(received, 'killed')
+            else:
+                message = b''.join(stderr).decode(errors='replace').strip() or f'Sandbox exited with code {proc.returncode}'
+                yield {'type': 'error', 'message': message}
+    finally:
+        timer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        if (not finished or timed_out.is_set()) and on_abort is not None:
+            on_abort()
+
+
+class SandboxContainer:
+    """
+    A pre-started, network-less sandbox container that runs jobs through `docker exec`.
+    """
+
+    def __init__(self, name, memory_limit):
+        self.name = name
+        self.memory_limit = memory_limit
+        self.uses = 0
+        self.last_health_check = time.monotonic()
+
+    def __repr__(self):
+        return f"<SandboxContainer {self.name} uses={self.uses}>"
+
+
+class SandboxPool:
+    """
+    Keeps a fixed number of warm sandbox containers around so judging a test case
+    costs one `docker exec` instead of a full container create/start/teardown.
+
+    Containers are reset between jobs and recycled after `max_uses` jobs, after
+    any limit violation, or when a health check fails.
+    """
+
+    def __init__(self, size, max_uses, health_check_interval, image_name=None):
+        self.size = size
+        self.max_uses = max_uses
+        self.health_check_interval = health_check_interval
+        self.image_name = image_name or get_image_name()
+        self._idle = []
+        self._total = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    # --- Container lifecycle ---
+
+    def _start_container(self, memory_limit):
+        name = f"oj-sandbox-{uuid.uuid4().hex[:12]}"
+        subprocess.run(
+            [
+                'docker', 'run',
+                '-d',           # Run in the background and keep it warm
+                '--rm',
+                '--name', name,
+                '--label', 'onlinejudge.sandbox=1',
+                *container_args(memory_limit),
+                self.image_name,
+                'sleep', 'infinity',
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+        return SandboxContainer(name, memory_limit)
+
+    def _destroy_container(self, container):
+        try:
+            subprocess.run(['docker', 'rm', '-f', container.name], capture_output=True, timeout=30)
+        except Exception:
+            logger.exception("Could not remove sandbox container %s", container.name)
+
+    def _is_healthy(self, container):
+        try:
+            result = subprocess.run(
+                ['docker', 'exec', container.name, 'true'],
+                capture_output=True,
+                timeout=5,
+            )
+        except subprocess.TimeoutExpired:
+            return False
+        container.last_health_check = time.monotonic()
+        return result.returncode == 0
+
+    def _reset(self, container):
+        try:
+            result = subprocess.run(
+                ['docker', 'exec', container.name, 'python', RUNNER_PATH, '--reset'],
+                capture_output=True,
+                text=True,
+                timeout=10,
+            )
+        except subprocess.TimeoutExpired:
+            return False
+        return result.returncode == 0
+
+    def _set_memory_limit(self, container, memory_limit):
+        if container.memory_limit == memory_limit:
+            return
+        subprocess.run(
+            ['docker', 'update', '--memory', f'{memory_limit}m', '--memory-swap', f'{memory_limit}m', container.name],
+            check=True,
+            capture_output=True,
+            timeout=10,
+        )
+        container.memory_limit = memory_limit
+
+    # --- Public API ---
+
+    def warm_up(self, memory_limit=256 + SANDBOX_MEMORY_HEADROOM_MB):
+        """
+        Starts containers until the pool is full, so the first jobs don't pay the cold start.
+        """
+        while True:
+            with self._condition:
+                if self._closed or self._total >= self.size:
+                    return
+                self._total += 1
+            try:
+                container = self._start_container(memory_limit)
+            except Exception:
+                with self._condition:
+                    self._total -= 1
+                raise
+            self._return(container)
+
+    def acquire(self, memory_limit):
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Sandbox pool is shut down.")
+                if self._idle:
+                    container = self._idle.pop()
+                    break
+                if self._total < self.size:
+                    # Reserve a slot, then start the container outside the lock
+                    self._total += 1
+                    container = None
+                    break
+                self._condition.wait()
+
+        try:
+            if container is None:
+                container = self._start_container(memory_limit)
+            elif time.monotonic() - container.last_health_check > self.health_check_interval:
+                if not self._is_healthy(container):
+                    logger.warning("Sandbox container %s failed its health check, replacing it", container.name)
+                    self._destroy_container(container)
+                    container = self._start_container(memory_limit)
+            self._set_memory_limit(container, memory_limit)
+        except Exception:
+            if container is not None:
+                self._destroy_container(container)
+            with self._condition:
+                self._total -= 1
+                self._condition.notify()
+            raise
+        return container
+
+    def release(self, container, dirty=False):
+        container.uses += 1
+        recycle = dirty or container.uses >= self.max_uses or not self._reset(container)
+        self._return(container, recycle)
+
+    def _return(self, container, recycle=False):
+        with self._condition:
+            keep = not recycle and not self._closed
+            if keep:
+                self._idle.append(container)
+            else:
+                self._total -= 1
+            self._condition.notify()
+        if not keep:
+            self._destroy_container(container)
+
+    def run_batch(self, request, case_count, timeout, memory_limit=256, cancel=None):
+        """
+        Judges all inputs of a runner request in one warm container, yielding runner
+        events as they arrive.
+        """
+        container = self.acquire(memory_limit)
+        dirty = False
+        complete = False
+        events = stream_session(
+            ['docker', 'exec', '-i', container.name, 'python', RUNNER_PATH],
+            request,
+            case_count,
+            timeout,
+            cancel=cancel,
+        )
+        try:
+            for event in events:
+                if event['type'] == 'case' and event['status'] in POLICY_VIOLATIONS:
+                    dirty = True
+                if cancel is not None and cancel.is_set():
+                    dirty = True
+                complete = event['type'] in ('compile_error', 'error') or event.get('case') == case_count - 1
+                yield event
+        except BaseException:
+            # Stopped early or failed: the user program may still be running inside,
+            # so the container is thrown away instead of being reused
+            if not complete:
+                dirty = True
+            raise
+        finally:
+            events.close()
+            self.release(container, dirty=dirty)
+
+    def shutdown(self):
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._condition.notify_all()
+        for container in idle:
+            self._destroy_container(container)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def start_pool():
+    """
+    Starts the warm container pool for this process. Only the judge workers call this;
+    other processes (e.g. the "Run Code" button in the web app) keep using cold containers.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None and settings.JUDGE_SANDBOX_POOL_SIZE > 0:
+            _pool = SandboxPool(
+                size=settings.JUDGE_SANDBOX_POOL_SIZE,
+                max_uses=settings.JUDGE_SANDBOX_MAX_USES,
+                health_check_interval=settings.JUDGE_SANDBOX_HEALTH_CHECK_INTERVAL,
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def stop_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def run_batch_cold(request, case_count, timeout, memory_limit=256, cancel=None):
+    """
+    Judges all inputs of a runner request in a fresh container that is removed afterwards.
+    """
+    name = f"oj-sandbox-{uuid.uuid4().hex[:12]}"
+
+    def abort():
+        # Killing the docker client doesn't stop the container, so remove it explicitly
+        subprocess.run(['docker', 'rm', '-f', name], capture_output=True)
+
+    yield from stream_session(
+        [
+            'docker', 'run',
+            '--rm',         # Automatically remove the container when it exits
+            '-i',           # Keep STDIN open to send our payload
+            '--name', name,
+            *container_args(memory_limit),
+            get_image_name(),
+        ],
+        request,
+        case_count,
+        timeout,
+        on_abort=abort,
+        cancel=cancel,
+    )
+
+
+def _track_compilation(events, keys):
+    """
+    Consumes the runner's "compiled" events: counts compile cache hits and misses
+    and stores freshly compiled binaries under their key in `keys` (by target,
+    "main" or "checker"). Every other event is passed through.
+    """
+    try:
+        for event in events:
+            if event['type'] != 'compiled':
+                yield event
+                continue
+
+            JudgeCounter.increment(HIT_COUNTER if event['cache'] == 'hit' else MISS_COUNTER)
+            compile_cache = get_compile_cache()
+            key = keys.get(event.get('target', 'main'))
+            if compile_cache is not None and key and event.get('binary'):
+                try:
+                    compile_cache.store(key, event['binary'])
+                except OSError:
+                    logger.exception("Could not store compiled binary %s", key)
+    finally:
+        events.close()
+
+
+def _compile_cache_lookup(language, code):
+    # Returns (cache key, the cached binary or None); no key when the language isn't cached
+    compile_cache = get_compile_cache()
+    if language != 'cpp' or compile_cache is None:
+        return None, None
+    key = cache_key(code, settings.JUDGE_CPP_FLAGS, get_image_digest(get_image_name()))
+    return key, compile_cache.read(key)
+
+
+def run_batch(language, code, inputs, memory_limit=256, time_limit_ms=None, cancel=None,
+              checker=None, answers=None, output_limit=None, stdout_capture=None, deadline=None):
+    """
+    Compiles the code once and runs it on every input, yielding one event per test case
+    (or a single compile/runner error event). `memory_limit` is in MB and `time_limit_ms`
+    is the CPU time limit per test case. Uses the warm pool when this process has one,
+    and skips compilation entirely when the binary is already in the compile cache.
+    Wrap the result in contextlib.closing() when you may stop iterating early, and pass
+    a threading.Event as `cancel` to be able to stop it from another thread.
+
+    Each input is either text or a {"file": <hash>} reference to stored test data,
+    which is streamed from its file into the request. Sandboxes never mount the test
+    data: a program can only ever see the input it is given.
+    For special judge problems, `checker` is a {"language", "code"} dict and `answers`
+    holds the expected output of every input; each case event then carries the
+    checker's result.
+
+    A program writing more than `output_limit` MB to stdout is killed with status
+    output_limit. Events only carry the first `stdout_capture` bytes of stdout
+    (everything when None) and a bounded prefix of stderr.
+
+    `deadline` (a time.monotonic() value) cuts the session short: the case running
+    then comes back as a timeout and the rest don't run.
+    """
+    time_limit_ms = time_limit_ms or settings.JUDGE_DEFAULT_TIME_LIMIT_MS
+    output_limit = output_limit or settings.JUDGE_DEFAULT_OUTPUT_LIMIT_MB
+    # A cached binary travels with the request; otherwise the runner sends the fresh one back
+    key, binary = _compile_cache_lookup(language, code)
+    keys = {'main': key}
+    if checker is not None:
+        checker_key, checker_binary = _compile_cache_lookup(checker['language'], checker['code'])
+        checker = {**checker, 'binary': checker_binary,
+                   'return_binary': bool(checker_key) and checker_binary is None}
+        keys['checker'] = checker_key
+
+    request = build_request(language, code, inputs, time_limit_ms, memory_limit, binary,
+                            bool(key) and binary is None, checker, answers, output_limit, stdout_capture)
+    timeout = session_timeout(len(inputs), time_limit_ms)
+    if checker is not None:
+        timeout += SESSION_OVERHEAD + len(inputs) * CHECKER_OVERHEAD
+    if deadline is not None:
+        timeout = max(0, min(timeout, deadline - time.monotonic()))
+    # The runner holds up to one full output in memory on top of its own headroom
+    container_memory = memory_limit + output_limit + SANDBOX_MEMORY_HEADROOM_MB
+    if _pool is None:
+        events = run_batch_cold(request, len(inputs), timeout, container_memory, cancel)
+    else:
+        events = _pool.run_batch(request, len(inputs), timeout, container_memory, cancel)
+    return _track_compilation(events, keys)
+
+
+def run_code(language, code, input_data, memory_limit=256, time_limit_ms=None, output_limit=None):
+    # Runs the code on a single custom input and returns (a bounded prefix of) its output or error message
+    if not get_image_name():
+        return "Error: Sandbox image is not configured."
+    try:
+        events = run_batch(language, code, [input_data], memory_limit, time_limit_ms, output_limit=output_limit,
+                           stdout_capture=settings.JUDGE_OUTPUT_PREVIEW_BYTES)
+        with closing(events):
+            for event in events:
+                return case_error(event) or preview(event['stdout'].read(), event['stdout_size'])
+    except Exception as e:
+        return f"An unexpected error occurred: {e}"
+    return "Execution Error:\nNo output from the sandbox."
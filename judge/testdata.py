@@ -0,0 +1,141 @@
+# judge/testdata.py
+#
+# Test case inputs and expected outputs live as files on a volume, addressed by the
+# sha256 of their content, instead of in the database. The database only keeps the
+# hash and size of each file. The judge streams a test's input from its file into the
+# sandbox request a piece at a time, so large stress tests never sit whole in the
+# Django process's memory. The volume itself is never mounted into a sandbox.
+import codecs
+import hashlib
+import mmap
+import os
+import uuid
+from pathlib import Path
+from django.conf import settings
+from django.db import models
+
+# Files are read and hashed in pieces of this many bytes
+CHUNK_SIZE = 64 * 1024
+
+
+def get_directory():
+    return Path(settings.JUDGE_TESTDATA_DIR)
+
+
+def path(key):
+    # Two-level layout so no single directory ends up with every test file
+    return get_directory() / key[:2] / key
+
+
+def _iter_content(content):
+    # Accepts text, bytes, an uploaded file or a binary file object (e.g. a member of an
+    # archive) and yields its bytes in pieces
+    if isinstance(content, str):
+        content = content.encode()
+    if isinstance(content, bytes):
+        for start in range(0, len(content), CHUNK_SIZE):
+            yield content[start:start + CHUNK_SIZE]
+    elif hasattr(content, 'chunks'):
+        yield from content.chunks(CHUNK_SIZE)
+    else:
+        yield from iter(lambda: content.read(CHUNK_SIZE), b'')
+
+
+def store(content):
+    """
+    Writes test data to its content address (if it isn't stored yet) and returns
+    (hash, size in bytes). `content` can be text, bytes, an uploaded file or a
+    binary file object, which is hashed while it is copied so it is only read once.
+    """
+    directory = get_directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary name first so a sandbox never sees a half-written file
+    tmp_path = directory / f'.{uuid.uuid4().hex}.tmp'
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as tmp:
+            for chunk in _iter_content(content):
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        key = digest.hexdigest()
+        target = path(key)
+        if target.exists():
+            tmp_path.unlink()
+            # Refresh the mtime so prune_testdata doesn't delete it before it is referenced again
+            os.utime(target)
+        else:
+            target.parent.mkdir(exist_ok=True)
+            tmp_path.chmod(0o644)
+            os.replace(tmp_path, target)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return key, size
+
+
+def iter_bytes(key, size=CHUNK_SIZE):
+    """
+    Yields the content of a test data file `size` bytes at a time. The file is
+    memory-mapped, so the page cache holds it rather than the worker's heap.
+    """
+    with open(path(key), 'rb') as data_file:
+        if os.fstat(data_file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start in range(0, len(data), size):
+                yield data[start:start + size]
+
+
+def iter_text(key, size=CHUNK_SIZE):
+    # The same as text; a multi-byte character may straddle two chunks
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for chunk in iter_bytes(key, size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def read_text(key):
+    return ''.join(iter_text(key))
+
+
+class TestData(models.Model):
+    """
+    Input and expected output of one test case, stored as files. `input_data` and
+    `output_data` still read (and, when assigned, store) the whole text, for
+    forms and small cases; the judge only ever passes the hashes around.
+    """
+    input_hash = models.CharField(max_length=64, editable=False)
+    input_size = models.BigIntegerField(default=0, editable=False, help_text="Input size in bytes")
+    output_hash = models.CharField(max_length=64, editable=False)
+    output_size = models.BigIntegerField(default=0, editable=False, help_text="Expected output size in bytes")
+
+    class Meta:
+        abstract = True
+
+    @property
+    def input_data(self):
+        return read_text(self.input_hash)
+
+    @input_data.setter
+    def input_data(self, content):
+        self.input_hash, self.input_size = store(content)
+
+    @property
+    def output_data(self):
+        return read_text(self.output_hash)
+
+    @output_data.setter
+    def output_data(self, content):
+        self.output_hash, self.output_size = store(content)
+
+    def input_reference(self):
+        # What run_batch() streams into the sandbox for this input
+        return {'file': self.input_hash}
+
+    def output_reference(self):
+        return {'file': self.output_hash}
+
+    def output_chunks(self):
+        return iter_bytes(self.output_hash)
@@ -0,0 +1,734 @@
+import datetime
+import importlib.util
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from problems.models import Problem
+from submission.models import CodeSubmission
+from . import engine, events, sandbox
+from .checkers import FloatChecker, LineChecker, TokenChecker, iter_chunks, iter_lines, iter_tokens
+from .models import JudgeTask
+from .protocol import SPOOL_MAX_MEMORY, encode_frame, encode_stream_frame, read_frame
+from .queue import (claim_next_task, claim_task, enqueue_code_submission, enqueue_rejudge, fail_task,
+                    requeue_stale_tasks)
+
+
+class FakeCase:
+    # Stands in for a TestCase: its "input" is its index, and its expected output is "ok"
+    def __init__(self, index):
+        self.index = index
+
+    def input_reference(self):
+        return self.index
+
+    def output_chunks(self):
+        return iter([b'ok\n'])
+
+
+class FakeSandbox:
+    """
+    Replaces sandbox.run_batch: every session "runs" its inputs in order. `outcomes`
+    maps a case index to "wrong" (prints the wrong answer), "crash" (runtime error) or
+    "compile" (the code doesn't compile), and `delays` to how long that case takes.
+    A cancelled session stops like a killed one, even in the middle of a case.
+    """
+
+    def __init__(self, outcomes=None, delays=None):
+        self.outcomes = outcomes or {}
+        self.delays = delays or {}
+        self.sessions = []
+        self.deadlines = []
+        self.started = []
+        self.finished = []
+        self.lock = threading.Lock()
+
+    def __call__(self, language, code, inputs, memory_limit=256, time_limit_ms=None, cancel=None, **options):
+        with self.lock:
+            self.sessions.append(list(inputs))
+            self.deadlines.append(options.get('deadline'))
+        return self._events(inputs, cancel or threading.Event())
+
+    def _events(self, inputs, cancel):
+        for position, index in enumerate(inputs):
+            if self.outcomes.get(index) == 'compile':
+                yield {'type': 'compile_error', 'message': 'main.cpp:1: error'}
+                return
+            with self.lock:
+                self.started.append(index)
+            if cancel.wait(self.delays.get(index, 0)):
+                return
+            with self.lock:
+                self.finished.append(index)
+            outcome = self.outcomes.get(index)
+            yield {
+                'type': 'case', 'case': position, 'status': 'runtime_error' if outcome == 'crash' else 'ok',
+                'exit_code': 1 if outcome == 'crash' else 0, 'stdout': b'nope\n' if outcome == 'wrong' else b'ok\n',
+                'stderr': b'Traceback' if outcome == 'crash' else b'', 'stderr_size': 9 if outcome == 'crash' else 0,
+                'cpu_ms': 10, 'wall_ms': 20, 'memory_kb': 1000,
+            }
+
+
+class FakePool(sandbox.SandboxPool):
+    # A pool whose containers are only names: docker is never called
+    def __init__(self, size=1, max_uses=10, health_check_interval=60, healthy=True):
+        super().__init__(size, max_uses, health_check_interval, image_name='sandbox')
+        self.healthy = healthy
+        self.started = []
+        self.destroyed = []
+
+    def _start_container(self, memory_limit):
+        container = sandbox.SandboxContainer(f'c{len(self.started)}', memory_limit)
+        self.started.append(container.name)
+        return container
+
+    def _destroy_container(self, container):
+        self.destroyed.append(container.name)
+
+    def _is_healthy(self, container):
+        container.last_health_check = time.monotonic()
+        return self.healthy
+
+    def _reset(self, container):
+        return True
+
+    def _set_memory_limit(self, container, memory_limit):
+        container.memory_limit = memory_limit
+
+
+class SandboxPoolTests(SimpleTestCase):
+    """
+    Reuse and retirement of the warm sandbox containers.
+    """
+
+    def test_containers_are_reused(self):
+        pool = FakePool()
+        for _ in range(3):
+            pool.release(pool.acquire(256))
+        self.assertEqual(pool.started, ['c0'])
+        self.assertEqual(pool.destroyed, [])
+
+    def test_retired_after_max_uses(self):
+        pool = FakePool(max_uses=2)
+        for _ in range(3):
+            pool.release(pool.acquire(256))
+        self.assertEqual(pool.started, ['c0', 'c1'])
+        self.assertEqual(pool.destroyed, ['c0'])
+
+    def test_dirty_containers_are_not_reused(self):
+        pool = FakePool()
+        pool.release(pool.acquire(256), dirty=True)
+        self.assertEqual(pool.destroyed, ['c0'])
+        self.assertEqual(pool.acquire(256).name, 'c1')
+
+    def test_failed_health_check_replaces_container(self):
+        pool = FakePool(health_check_interval=0, healthy=False)
+        pool.release(pool.acquire(256))
+        container = pool.acquire(512)
+        self.assertEqual((container.name, container.memory_limit), ('c1', 512))
+        self.assertEqual(pool.destroyed, ['c0'])
+
+    def test_size_is_never_exceeded(self):
+        pool = FakePool(size=1)
+        first = pool.acquire(256)
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire(256)))
+        waiter.start()
+        time.sleep(0.05)
+        self.assertEqual(acquired, [])
+        pool.release(first)
+        waiter.join(timeout=5)
+        self.assertEqual(acquired, [first])
+
+    def test_warm_and_cold_containers_get_the_same_limits(self):
+        with mock.patch('judge.sandbox.subprocess.run') as run:
+            sandbox.SandboxPool(1, 10, 60, image_name='sandbox')._start_container(300)
+        warm = run.call_args.args[0]
+        with mock.patch('judge.sandbox.stream_session', return_value=iter([])) as session:
+            list(sandbox.run_batch_cold(iter([]), 1, 10, memory_limit=300))
+        cold = session.call_args.args[0]
+        limits = sandbox.container_args(300)
+        self.assertIn('--pids-limit', limits)
+        for command in (warm, cold):
+            start = command.index(limits[0])
+            self.assertEqual(command[start:start + len(limits)], limits)
+
+
+def load_runner():
+    # sandbox/runner.py isn't a package module: it is copied into the sandbox image on its own
+    spec = importlib.util.spec_from_file_location('sandbox_runner', Path(settings.BASE_DIR) / 'sandbox' / 'runner.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+runner = load_runner()
+
+
+class RunnerTestCase(SimpleTestCase):
+    """
+    Runs sandbox/runner.py in this process, in a temporary directory instead of the
+    sandbox's and without switching users.
+    """
+
+    def setUp(self):
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, True)
+        # The runner changes into its job directory
+        self.addCleanup(os.chdir, os.getcwd())
+        for patcher in (mock.patch.object(runner, 'JOB_DIR', root / 'job'),
+                        mock.patch.object(runner, 'CASES_DIR', root / 'cases'),
+                        mock.patch.object(runner, '_account', return_value=None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def judge(self, language, code, inputs, time_limit_ms=1000, memory_limit=256, **options):
+        # The runner's events for one request, with every blob read into bytes
+        request = b''.join(sandbox.build_request(language, code, inputs, time_limit_ms, memory_limit, **options))
+        stdin, stdout = io.TextIOWrapper(io.BytesIO(request)), io.TextIOWrapper(io.BytesIO())
+        with mock.patch.object(sys, 'stdin', stdin), mock.patch.object(sys, 'stdout', stdout):
+            runner.main()
+        stdout.buffer.seek(0)
+        return list(iter(lambda: read_frame(stdout.buffer), None))
+
+
+class ProtocolTests(SimpleTestCase):
+    """
+    Frames written by either end of the pipe read back the same at the other end
+    (the runner keeps its own copy of the framing).
+    """
+
+    def test_request_to_runner(self):
+        data = bytes(range(256)) * 10
+        stream = io.BytesIO(b''.join([
+            *encode_frame({'type': 'request', 'case_count': 1}, code=b'print(1)', empty=b''),
+            *encode_stream_frame({'type': 'input', 'case': 0}, 'data', len(data), [data[:100], data[100:]]),
+        ]))
+        self.assertEqual(runner.read_frame(stream), {'type': 'request', 'case_count': 1,
+                                                     'code': b'print(1)', 'empty': b''})
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'input.txt'
+            self.assertEqual(runner.read_data(stream, 'input', 0, path), path)
+            self.assertEqual(path.read_bytes(), data)
+
+    def test_runner_events_to_judge(self):
+        stdout = io.TextIOWrapper(io.BytesIO())
+        with mock.patch.object(sys, 'stdout', stdout):
+            runner.emit({'type': 'case', 'case': 0, 'status': 'ok'}, stdout=b'\x00\n' * 3, stderr=b'')
+            runner.emit({'type': 'error', 'message': 'caf\u00e9'})
+        stream = stdout.buffer
+        stream.seek(0)
+        case = read_frame(stream, spool=('stdout',))
+        self.assertEqual(case['stdout'].read(), b'\x00\n' * 3)
+        self.assertEqual(case['stderr'], b'')
+        self.assertEqual(read_frame(stream), {'type': 'error', 'message': 'caf\u00e9'})
+        # A clean end of the stream
+        self.assertIsNone(read_frame(stream))
+
+    def test_cut_off_frames(self):
+        frame = b''.join(encode_frame({'type': 'case'}, stdout=b'x' * 10))
+        for size in (2, 10, len(frame) - 1):
+            with self.assertRaises(EOFError):
+                read_frame(io.BytesIO(frame[:size]))
+            with self.assertRaises(EOFError):
+                runner.read_frame(io.BytesIO(frame[:size]))
+
+    def test_wrong_frame_is_rejected(self):
+        stream = io.BytesIO(b''.join(encode_frame({'type': 'input', 'case': 1}, data=b'1')))
+        with tempfile.TemporaryDirectory() as directory, self.assertRaises(ValueError):
+            runner.read_data(stream, 'input', 0, Path(directory) / 'input.txt')
+
+
+class RunnerSessionTests(RunnerTestCase):
+    """
+    One runner session compiles the submission once and then runs every test case.
+    """
+
+    @skipUnless(shutil.which('g++'), "needs a C++ compiler")
+    def test_compiles_once_and_runs_every_case(self):
+        code = '#include <iostream>\nint main(){long a,b;std::cin>>a>>b;std::cout<<a+b<<"\\n";}'
+        events = self.judge('cpp', code, ['1 2', '3 4', '5 6'])
+        self.assertEqual([event['type'] for event in events], ['compiled', 'case', 'case', 'case'])
+        self.assertEqual([(event['case'], event['stdout']) for event in events[1:]],
+                         [(0, b'3\n'), (1, b'7\n'), (2, b'11\n')])
+
+    @skipUnless(shutil.which('g++'), "needs a C++ compiler")
+    def test_compile_error_ends_the_session(self):
+        events = self.judge('cpp', 'int main( {', ['1', '2'])
+        self.assertEqual([event['type'] for event in events], ['compile_error'])
+        self.assertIn('error', events[0]['message'])
+
+    def test_cases_run_in_order(self):
+        events = self.judge('py', 'print(input()[::-1])', ['abc', 'xy'])
+        self.assertEqual([(event['type'], event['status'], event['stdout']) for event in events],
+                         [('case', 'ok', b'cba\n'), ('case', 'ok', b'yx\n')])
+
+    def test_session_timeout_fails_the_next_case(self):
+        # The whole session is cut off: the case that was running is a time limit exceeded
+        events = list(sandbox.stream_session([sys.executable, '-c', 'import time; time.sleep(30)'],
+                                             iter([]), 2, timeout=0.5))
+        self.assertEqual([(event['type'], event['case'], event['status']) for event in events],
+                         [('case', 0, 'timeout')])
+
+
+class RunnerLimitTests(RunnerTestCase):
+    """
+    The runner measures each case's own CPU time and peak memory and holds it to its limits.
+    """
+
+    def run_python(self, code, time_limit_ms=2000, memory_limit_kb=256 * 1024, **options):
+        return runner.run_case([sys.executable, '-c', code], b'', time_limit_ms, time_limit_ms * 3,
+                               memory_limit_kb, **options)
+
+    def test_measures_a_clean_run(self):
+        result = self.run_python('x = bytearray(32 * 1024 * 1024); print(len(x))')
+        self.assertEqual((result['status'], result['stdout']), ('ok', b'33554432\n'))
+        # The program's own peak, which includes the 32 MB it allocated
+        self.assertGreater(result['memory_kb'], 32 * 1024)
+        self.assertLess(result['memory_kb'], 256 * 1024)
+
+    def test_cpu_time_limit(self):
+        result = self.run_python('while True: pass', time_limit_ms=300)
+        self.assertEqual(result['status'], 'timeout')
+        self.assertGreaterEqual(result['cpu_ms'], 300)
+
+    def test_sleeping_uses_no_cpu_time(self):
+        # Only the wall clock limit catches a program that waits
+        result = self.run_python('import time; time.sleep(5)', time_limit_ms=200)
+        self.assertEqual(result['status'], 'timeout')
+        self.assertLess(result['cpu_ms'], 200)
+        self.assertGreaterEqual(result['wall_ms'], 600)
+
+    def test_memory_limit(self):
+        result = self.run_python('x = bytearray(128 * 1024 * 1024)', memory_limit_kb=64 * 1024)
+        self.assertEqual(result['status'], 'memory')
+
+    def test_runtime_error(self):
+        result = self.run_python('raise SystemExit(3)')
+        self.assertEqual((result['status'], result['exit_code']), ('runtime_error', 3))
+
+
+class OutputLimitTests(RunnerTestCase):
+    """
+    Only a bounded prefix of a program's output is kept, and writing past the output
+    limit is Output Limit Exceeded.
+    """
+
+    def test_bounded_buffer(self):
+        buffer = runner.BoundedBuffer(5)
+        for chunk in (b'abc', b'def', b'gh'):
+            buffer.add(chunk)
+        self.assertEqual((bytes(buffer.getvalue()), buffer.size, buffer.overflowed), (b'abcde', 8, True))
+        buffer = runner.BoundedBuffer(5)
+        buffer.add(b'abcde')
+        self.assertFalse(buffer.overflowed)
+
+    def test_output_limit_kills_the_program(self):
+        # Writes forever: only the kill at the limit ends it
+        code = 'import sys\nwhile True: sys.stdout.write("x" * 4096)'
+        result = runner.run_case([sys.executable, '-c', code], b'', 5000, 10000, 256 * 1024, output_limit=10000)
+        self.assertEqual(result['status'], 'output_limit')
+        self.assertEqual(bytes(result['stdout']), b'x' * 10000)
+        self.assertGreater(result['stdout_size'], 10000)
+        self.assertEqual(sandbox.case_error(dict(result, type='case')), 'Output Limit Exceeded')
+
+    def test_stderr_is_bounded(self):
+        code = 'import sys; sys.stderr.write("e" * 100000)'
+        result = runner.run_case([sys.executable, '-c', code], b'', 5000, 10000, 256 * 1024, stderr_limit=100)
+        self.assertEqual((len(result['stderr']), result['stderr_size']), (100, 100000))
+
+    def test_only_the_capture_is_sent_back(self):
+        events = self.judge('py', 'print("y" * 5000)', ['', ''], stdout_capture=10)
+        for event in events:
+            self.assertEqual((event['status'], event['stdout'], event['stdout_size']), ('ok', b'y' * 10, 5001))
+
+
+class CheckerTests(SimpleTestCase):
+    """
+    The built-in checkers work on chunks, so every way of cutting an output into
+    chunks has to give the same answer.
+    """
+
+    def splits(self, data):
+        # `data` cut into pieces of every size, from single bytes to one piece
+        for size in range(1, len(data) + 1):
+            yield [data[start:start + size] for start in range(0, len(data), size)]
+
+    def test_tokens_across_chunks(self):
+        data = b'  12 -3.5\n\n word\t\r\nlast'
+        for chunks in self.splits(data):
+            self.assertEqual(list(iter_tokens(chunks)), [b'12', b'-3.5', b'word', b'last'], chunks)
+
+    def test_lines_across_chunks(self):
+        data = b'1 2  \r\n\nthree\nfour \n'
+        for chunks in self.splits(data):
+            self.assertEqual(list(iter_lines(chunks)), [b'1 2', b'', b'three', b'four'], chunks)
+
+    def compare(self, checker, expected, actual, chunk_size=3):
+        return checker.compare(iter_chunks(expected, chunk_size), iter_chunks(actual, chunk_size))
+
+    def test_line_checker(self):
+        checker = LineChecker()
+        self.assertTrue(self.compare(checker, b'1 2\n3\n', b'1 2   \r\n3\n\n\n'))
+        # Whitespace before the first line doesn't count either, as with the old strip() comparison
+        self.assertTrue(self.compare(checker, b'1 2\n3\n', b'\n\n  1 2\n3'))
+        self.assertFalse(self.compare(checker, b'1 2\n3\n', b'1  2\n3\n'))
+        self.assertFalse(self.compare(checker, b'1 2\n3\n', b'1 2\n\n3\n'))
+        self.assertFalse(self.compare(checker, b'1 2\n3\n', b'1 2\n'))
+
+    def test_token_checker(self):
+        checker = TokenChecker()
+        self.assertTrue(self.compare(checker, b'1 2\n3\n', b'1\n2 3'))
+        self.assertFalse(self.compare(checker, b'1 2\n3\n', b'1 23'))
+
+    def test_float_checker(self):
+        checker = FloatChecker(abs_error=1e-6, rel_error=1e-6)
+        self.assertTrue(self.compare(checker, b'1 0.5 YES', b'1.0000009 0.4999991 YES'))
+        self.assertFalse(self.compare(checker, b'0.5', b'0.500002'))
+        # Big numbers only have to be close relative to their size
+        self.assertTrue(self.compare(checker, b'1000000000', b'1000000900'))
+        self.assertFalse(self.compare(checker, b'1000000000', b'1000001100'))
+        # Words must match exactly, infinities and NaNs never match a number
+        self.assertFalse(self.compare(checker, b'YES', b'yes'))
+        self.assertFalse(self.compare(checker, b'1e308', b'inf'))
+        self.assertFalse(self.compare(checker, b'1', b'nan'))
+        self.assertFalse(self.compare(checker, b'1 2', b'1'))
+        self.assertTrue(self.compare(FloatChecker(abs_error=0.1, rel_error=0), b'2.0', b'2.09'))
+
+    def test_spooled_output(self):
+        # A big output is read off the runner's pipe into a temporary file, and checked from there
+        output = b'7\n' * SPOOL_MAX_MEMORY
+        stream = io.BytesIO(b''.join(encode_frame({'type': 'case'}, stdout=output, stderr=b'oops')))
+        frame = read_frame(stream, spool=('stdout',))
+        self.assertEqual(frame['stderr'], b'oops')
+        self.assertTrue(frame['stdout']._rolled)
+        case = mock.Mock(output_chunks=lambda: iter_chunks(output))
+        self.assertIsNone(LineChecker().check(frame, case))
+
+
+@override_settings(JUDGE_MAX_PARALLEL_CASES=2)
+class EvaluateTests(SimpleTestCase):
+    """
+    engine.evaluate on a fake sandbox: the verdict is always the one of the lowest-index
+    failing case, however the sessions' timings interleave.
+    """
+
+    def evaluate(self, sandbox, case_count=6, **kwargs):
+        with mock.patch('judge.engine.run_batch', sandbox):
+            return engine.evaluate('cpp', 'int main() {}', [FakeCase(i) for i in range(case_count)], **kwargs)
+
+    def test_accepted(self):
+        sandbox = FakeSandbox()
+        judgement = self.evaluate(sandbox)
+        self.assertEqual(judgement.verdict, 'Accepted')
+        self.assertEqual([case['case'] for case in judgement.cases], [0, 1, 2, 3, 4, 5])
+        # Cases are dealt out round robin over the sessions
+        self.assertEqual(sorted(sandbox.sessions), [[0, 2, 4], [1, 3, 5]])
+
+    def test_earlier_failure_wins(self):
+        # Case 4 fails first, but the slower case 3 fails too and comes before it
+        sandbox = FakeSandbox(outcomes={3: 'crash', 4: 'wrong'}, delays={3: 0.3})
+        judgement = self.evaluate(sandbox)
+        self.assertEqual((judgement.verdict, judgement.details), ('Runtime Error', 'Traceback'))
+        self.assertEqual([case['verdict'] for case in judgement.cases],
+                         ['Accepted', 'Accepted', 'Accepted', 'Runtime Error'])
+        # Nothing after the failure is run
+        self.assertNotIn(5, sandbox.started)
+
+    def test_failure_cancels_later_cases(self):
+        # Case 1 fails while the other session is stuck in the slow case 2
+        sandbox = FakeSandbox(outcomes={1: 'wrong'}, delays={2: 10})
+        started = time.monotonic()
+        judgement = self.evaluate(sandbox)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(judgement.verdict, 'Wrong Answer')
+        self.assertEqual([case['case'] for case in judgement.cases], [0, 1])
+        self.assertNotIn(2, sandbox.finished)
+        self.assertFalse({3, 4, 5} & set(sandbox.started))
+
+    @override_settings(JUDGE_MAX_SUBMISSION_SECONDS=30)
+    def test_sessions_share_one_deadline(self):
+        sandbox = FakeSandbox()
+        started = time.monotonic()
+        self.evaluate(sandbox)
+        self.assertEqual(len(set(sandbox.deadlines)), 1)
+        self.assertAlmostEqual(sandbox.deadlines[0], started + 30, delta=1)
+
+    def test_deadline_caps_the_session(self):
+        with mock.patch('judge.sandbox.run_batch_cold', return_value=iter([])) as cold:
+            sandbox.run_batch('py', 'print(1)', ['1'] * 50, time_limit_ms=10000, deadline=time.monotonic() + 20)
+        self.assertLessEqual(cold.call_args.args[2], 20)
+        with mock.patch('judge.sandbox.run_batch_cold', return_value=iter([])) as cold:
+            sandbox.run_batch('py', 'print(1)', ['1'] * 50, time_limit_ms=10000, deadline=time.monotonic() - 5)
+        self.assertEqual(cold.call_args.args[2], 0)
+
+    def test_every_case_runs_without_stop_on_failure(self):
+        sandbox = FakeSandbox(outcomes={1: 'wrong', 4: 'crash'}, delays={1: 0.2})
+        judgement = self.evaluate(sandbox, stop_on_failure=False)
+        self.assertEqual(judgement.verdict, 'Wrong Answer')
+        self.assertEqual([case['verdict'] for case in judgement.cases],
+                         ['Accepted', 'Wrong Answer', 'Accepted', 'Accepted', 'Runtime Error', 'Accepted'])
+
+    def test_compile_error_starts_no_other_session(self):
+        sandbox = FakeSandbox(outcomes={0: 'compile'})
+        judgement = self.evaluate(sandbox)
+        self.assertEqual((judgement.verdict, judgement.details), ('Compilation Error', 'main.cpp:1: error'))
+        self.assertEqual(len(sandbox.sessions), 1)
+
+    @override_settings(JUDGE_MAX_PARALLEL_CASES=1)
+    def test_sequential(self):
+        sandbox = FakeSandbox(outcomes={2: 'wrong', 4: 'crash'})
+        judged = []
+        judgement = self.evaluate(sandbox, on_case=judged.append)
+        self.assertEqual(judgement.verdict, 'Wrong Answer')
+        self.assertEqual([record['case'] for record in judged], [0, 1, 2])
+        self.assertEqual(sandbox.started, [0, 1, 2])
+
+
+@override_settings(JUDGE_DEFAULT_TIME_LIMIT_MS=5000, JUDGE_TIME_LIMIT_MULTIPLIERS={'py': 3})
+class ProblemLimitsTests(SimpleTestCase):
+    def test_time_limits(self):
+        # No time limit of its own: the site default, for every language
+        problem = Problem(memory_limit=128)
+        self.assertEqual(engine.problem_limits(problem, 'cpp'), (128, 5000))
+        self.assertEqual(engine.problem_limits(problem, 'py'), (128, 5000))
+        # Multipliers scale the problem's own limit: its own ones first, then the site's
+        problem = Problem(memory_limit=128, time_limit=1000, language_time_multipliers={'py': 2})
+        self.assertEqual(engine.problem_limits(problem, 'py'), (128, 2000))
+        problem = Problem(memory_limit=128, time_limit=1000)
+        self.assertEqual(engine.problem_limits(problem, 'py'), (128, 3000))
+
+
+@override_settings(JUDGE_MAX_ATTEMPTS=2)
+class JudgeQueueTests(TestCase):
+    """
+    Claiming, requeueing and giving up on judge tasks.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='pw')
+        cls.problem = Problem.objects.create(title='Sum', description='a+b', difficulty='Easy')
+
+    def enqueue(self, **kwargs):
+        submission = CodeSubmission.objects.create(user=self.user, problem=self.problem, language='py',
+                                                   code='print(1)')
+        return enqueue_code_submission(submission, **kwargs)
+
+    def test_claim_order(self):
+        rejudge = self.enqueue(priority=JudgeTask.PRIORITY_REJUDGE)
+        first, second = self.enqueue(), self.enqueue()
+        self.assertEqual(claim_next_task('w1'), first)
+        # A task can only be claimed once
+        self.assertIsNone(claim_task(first, 'w2'))
+        self.assertEqual(claim_next_task('w2'), second)
+        # Live submissions go before rejudges
+        self.assertEqual(claim_next_task('w3'), rejudge)
+        self.assertIsNone(claim_next_task('w4'))
+
+    def test_requeue_stale_tasks(self):
+        alive, dead, poison = self.enqueue(), self.enqueue(), self.enqueue()
+        for task in (alive, dead, poison):
+            claim_task(task, 'w1')
+        long_ago = timezone.now() - datetime.timedelta(hours=1)
+        JudgeTask.objects.filter(id__in=[dead.id, poison.id]).update(heartbeat_at=long_ago)
+        JudgeTask.objects.filter(id=poison.id).update(attempts=2)
+
+        self.assertEqual(requeue_stale_tasks(600), (1, 1))
+        statuses = dict(JudgeTask.objects.values_list('id', 'status'))
+        self.assertEqual([statuses[alive.id], statuses[dead.id], statuses[poison.id]],
+                         ['Running', 'Pending', 'Failed'])
+        poison.refresh_from_db()
+        self.assertEqual(poison.submission.verdict, engine.SYSTEM_ERROR)
+
+    def test_fail_task(self):
+        task = self.enqueue()
+        # The first crash puts it back in the queue, the last one fails it
+        self.assertEqual(fail_task(claim_task(task, 'w1'), 'boom'), 'Pending')
+        self.assertEqual(fail_task(claim_task(task, 'w1'), 'boom'), 'Failed')
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.error, task.submission.verdict), ('Failed', 'boom', engine.SYSTEM_ERROR))
+
+
+    def test_long_error_verdict(self):
+        # A traceback or the compiler's output runs to kilobytes; only its short label is the verdict
+        task = self.enqueue()
+        error = 'Traceback (most recent call last):\n' + 'x' * 5000
+        judgement = engine.Judgement('Execution Error:\n' + error)
+        with mock.patch('judge.engine.judge_code_submission', return_value=judgement):
+            self.assertEqual(engine.judge_task(claim_task(task, 'w1')), 'Runtime Error')
+        task.refresh_from_db()
+        submission = task.submission
+        self.assertEqual((submission.verdict, submission.verdict_details, task.verdict),
+                         ('Runtime Error', error, 'Runtime Error'))
+        # Within max_length, which SQLite doesn't enforce but PostgreSQL does
+        submission.full_clean()
+        task.full_clean()
+
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('submission_result', args=[submission.pk])), 'x' * 5000)
+        rejudge = enqueue_rejudge(CodeSubmission.objects.filter(pk=submission.pk))
+        self.assertEqual(rejudge.tasks.get().previous_verdict, 'Runtime Error')
+        submission.refresh_from_db()
+        self.assertEqual((submission.verdict, submission.verdict_details), (engine.QUEUED, ''))
+
+@override_settings(JUDGE_MAX_ATTEMPTS=3, JUDGE_SANDBOX_POOL_SIZE=0)
+class RejudgeTests(TestCase):
+    """
+    A rejudge keeps every submission's verdict from before, to report exactly what changed.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='pw')
+        cls.problem = Problem.objects.create(title='P', description='-', difficulty='Easy')
+        cls.accepted, cls.wrong, cls.waiting = [
+            CodeSubmission.objects.create(user=cls.user, problem=cls.problem, language='py', code='print(1)',
+                                          verdict=verdict)
+            for verdict in ('Accepted', 'Wrong Answer', 'Queued')
+        ]
+        JudgeTask.objects.create(code_submission=cls.waiting)
+
+    def rejudge(self):
+        return enqueue_rejudge(CodeSubmission.objects.filter(problem=self.problem), created_by=self.user,
+                               description='New tests')
+
+    def judge_all(self, rejudge, verdicts):
+        # Judges every task of the rejudge; `verdicts` maps a submission to its new verdict
+        def judge(submission, on_case=None):
+            return engine.Judgement(verdicts[submission.pk])
+
+        with mock.patch('judge.engine.judge_code_submission', side_effect=judge):
+            for task in rejudge.tasks.all():
+                engine.judge_task(claim_task(task, worker='test'))
+
+    def test_previous_verdicts(self):
+        rejudge = self.rejudge()
+        # The submission still waiting for the judge isn't queued a second time
+        self.assertEqual(rejudge.total, 2)
+        self.assertEqual(dict(rejudge.tasks.values_list('code_submission_id', 'previous_verdict')),
+                         {self.accepted.pk: 'Accepted', self.wrong.pk: 'Wrong Answer'})
+        self.assertEqual(set(rejudge.tasks.values_list('priority', flat=True)), {JudgeTask.PRIORITY_REJUDGE})
+        self.accepted.refresh_from_db()
+        self.assertEqual(self.accepted.verdict, engine.QUEUED)
+        self.assertFalse(rejudge.is_finished())
+
+        self.judge_all(rejudge, {self.accepted.pk: 'Wrong Answer', self.wrong.pk: 'Wrong Answer'})
+        self.assertTrue(rejudge.is_finished())
+        self.assertEqual(rejudge.progress(), {'Done': 2})
+        self.assertEqual([(task.submission.pk, task.previous_verdict, task.verdict) for task in rejudge.changes()],
+                         [(self.accepted.pk, 'Accepted', 'Wrong Answer')])
+
+    def test_report(self):
+        rejudge = self.rejudge()
+        self.judge_all(rejudge, {self.accepted.pk: 'Accepted', self.wrong.pk: 'Accepted'})
+        out = io.StringIO()
+        call_command('rejudge', report=rejudge.id, stdout=out)
+        self.assertIn(f'Rejudge {rejudge.id}: 2/2 judged', out.getvalue())
+        self.assertIn('1 verdict(s) changed', out.getvalue())
+        self.assertIn(f'codesubmission {self.wrong.pk} (alice): Wrong Answer -> Accepted', out.getvalue())
+
+
+@override_settings(LIVE_UPDATES_KEEPALIVE_SECONDS=5)
+class LiveEventTests(TestCase):
+    """
+    The server-sent event stream of a submission, fed by the judge publishing from its own thread.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='pw')
+        cls.problem = Problem.objects.create(title='P', description='-', difficulty='Easy')
+        cls.submission = CodeSubmission.objects.create(user=cls.user, problem=cls.problem, language='py',
+                                                       code='print(1)', verdict=engine.QUEUED)
+
+    def setUp(self):
+        broker = mock.patch.object(events, '_broker', events.LocalBroker())
+        broker.start()
+        self.addCleanup(broker.stop)
+        self.url = reverse('submission_events', args=['code', self.submission.pk])
+
+    def publish(self, event, data):
+        # Like the judge: from another thread, while the stream waits on its event loop
+        thread = threading.Thread(target=events.publish,
+                                  args=(events.submission_channel('code', self.submission.pk), event, data))
+        thread.start()
+        thread.join()
+
+    async def test_stream_until_verdict(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        # The current state comes first
+        self.assertEqual(await anext(stream), b'event: verdict\ndata: {"verdict": "Queued", "is_pending": true, '
+                                              b'"time_ms": null, "memory_kb": null}\n\n')
+
+        self.publish('progress', {'case': 1, 'verdict': 'Accepted'})
+        self.assertEqual(await anext(stream), b'event: progress\ndata: {"case": 1, "verdict": "Accepted"}\n\n')
+        self.publish('verdict', {'verdict': 'Accepted', 'is_pending': False, 'time_ms': 12, 'memory_kb': 2048})
+        self.assertIn(b'"verdict": "Accepted"', await anext(stream))
+        # A final verdict ends the stream, and with it the subscription
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(events._broker._subscribers, {})
+
+    async def test_judged_before_connecting(self):
+        await CodeSubmission.objects.filter(pk=self.submission.pk).aupdate(verdict='Wrong Answer')
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 2)
+        self.assertIn(b'"is_pending": false', chunks[1])
+
+    def test_wsgi_and_missing_submissions(self):
+        self.client.force_login(self.user)
+        # Without ASGI the browser is told to stop and poll instead
+        self.assertEqual(self.client.get(self.url).status_code, 204)
+        for args in (['code', uuid.uuid4()], ['code', 'x'], ['other', self.submission.pk],
+                     ['contest', self.submission.pk]):
+            with self.subTest(args):
+                self.assertEqual(self.client.get(reverse('submission_events', args=args)).status_code, 404)
+
+
+class JudgeWorkerTests(TransactionTestCase):
+    """
+    run_judge_worker against a task that crashes the judge every time.
+    """
+
+    def test_worker_survives_poison_task(self):
+        user = User.objects.create_user('alice', password='pw')
+        problem = Problem.objects.create(title='Sum', description='a+b', difficulty='Easy')
+        poison = enqueue_code_submission(CodeSubmission.objects.create(user=user, problem=problem, language='py',
+                                                                       code='print(1)'))
+        good = enqueue_code_submission(CodeSubmission.objects.create(user=user, problem=problem, language='py',
+                                                                     code='print(2)'))
+
+        def judge_task(task):
+            if task.id == poison.id:
+                raise RuntimeError('boom')
+            return 'Accepted'
+
+        with mock.patch('judge.management.commands.run_judge_worker.judge_task', judge_task), \
+                self.assertLogs('judge.management.commands.run_judge_worker', 'ERROR') as logs:
+            call_command('run_judge_worker', once=True, concurrency=1, stdout=io.StringIO())
+        self.assertEqual(len(logs.records), 3)
+
+        poison.refresh_from_db()
+        self.assertEqual((poison.status, poison.attempts), ('Failed', 3))
+        self.assertEqual(poison.submission.verdict, engine.SYSTEM_ERROR)
+        # The worker kept going after the crashes
+        self.assertEqual(JudgeTask.objects.get(id=good.id).attempts, 1)
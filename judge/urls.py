@@ -0,0 +1,11 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    # Staff-only JSON metrics for monitoring (queue depth, compile cache hits/misses, ...)
+    path('metrics/', views.judge_metrics, name='judge_metrics'),
+
+    # Server-sent event streams pushing live verdicts, test progress and scoreboard changes
+    path('events/submission/<str:kind>/<str:submission_id>/', views.submission_events, name='submission_events'),
+    path('events/scoreboard/<int:contest_id>/', views.scoreboard_events, name='scoreboard_events'),
+]
@@ -0,0 +1,127 @@
+import asyncio
+import json
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from contest.models import Contest, ContestSubmission
+from submission.models import CodeSubmission
+from . import events
+from .engine import PENDING_VERDICTS
+from .models import JudgeCounter, JudgeTask
+
+
+@staff_member_required
+def judge_metrics(request):
+    """
+    Monitoring endpoint: queue depth per status and the shared judge counters.
+    """
+    queue = dict(JudgeTask.objects.values_list('status').annotate(count=Count('id')))
+    return JsonResponse({
+        'queue': queue,
+        'counters': JudgeCounter.snapshot(),
+    })
+
+
+# Server-sent event streams for live updates (see judge/events.py). They hold their
+# connection open, so they only stream when served by ASGI (uvicorn backend.asgi:application);
+# under WSGI they answer 204 No Content, which stops the browser's EventSource and makes the
+# page fall back to polling.
+
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def _event_stream(request, channel, snapshot, finished=None):
+    """
+    Streams the messages published to `channel`. `snapshot()` is an async callable
+    returning the current state as (event, data), sent first and again after every
+    quiet keepalive interval; the stream ends once `finished(message)` is true.
+    """
+    async def stream():
+        subscription = events.get_broker().subscribe(channel)
+        try:
+            # Ask the browser to reconnect quickly if the connection drops
+            yield 'retry: 3000\n\n'
+            # Subscribed before reading the state, so nothing published in between is missed
+            message = await snapshot()
+            while True:
+                if message is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield _sse(message['event'], message['data'])
+                    if finished and finished(message):
+                        return
+                try:
+                    message = await asyncio.wait_for(subscription.get(), settings.LIVE_UPDATES_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Quiet for a while: resend the state, which also catches anything a slow client missed
+                    message = await snapshot()
+        finally:
+            subscription.close()
+
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _verdict_message(submission):
+    return {'event': 'verdict', 'data': {
+        'verdict': submission.verdict,
+        'is_pending': submission.verdict in PENDING_VERDICTS,
+        'time_ms': submission.time_ms,
+        'memory_kb': submission.memory_kb,
+    }}
+
+
+@login_required
+async def submission_events(request, kind, submission_id):
+    """
+    Live verdict and per-test-case progress of one submission. Practice results are
+    visible to any logged-in user (like their result page); contest submissions only
+    to their author.
+    """
+    if kind == 'code':
+        model, owner = CodeSubmission, {}
+    elif kind == 'contest':
+        model, owner = ContestSubmission, {'user': await request.auser()}
+    else:
+        raise Http404
+    try:
+        submission = await model.objects.filter(id=submission_id, **owner).only('id').afirst()
+    except (ValidationError, ValueError):
+        # Not a valid id for this kind of submission
+        submission = None
+    if submission is None:
+        raise Http404
+    submissions = model.objects.filter(pk=submission.pk).only('verdict', 'time_ms', 'memory_kb')
+
+    async def snapshot():
+        return _verdict_message(await submissions.afirst())
+
+    def finished(message):
+        return message['event'] == 'verdict' and not message['data']['is_pending']
+
+    return _event_stream(request, events.submission_channel(kind, submission.pk), snapshot, finished)
+
+
+async def scoreboard_events(request, contest_id):
+    """
+    Changed scoreboard cells of a contest, with the user's new totals, as the public
+    scoreboard shows them.
+    """
+    if not await Contest.objects.filter(id=contest_id).aexists():
+        raise Http404
+
+    async def snapshot():
+        # The page itself holds the standings; only keep the connection alive
+        return None
+
+    return _event_stream(request, events.scoreboard_channel(contest_id), snapshot)
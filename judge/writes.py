@@ -0,0 +1,27 @@
+# judge/writes.py
+#
+# SQLite allows one writer at a time. When several judge threads finish together, each
+# result's writes (the verdict, the task status and everything the save signals update:
+# solve counts, leaderboard, scoreboard) would otherwise interleave and wait on the
+# database lock in turn, possibly several times per result. Here they are grouped into
+# one transaction per result and taken one at a time per process, so each result waits
+# once and then holds the lock briefly. On other databases only the transaction remains.
+import threading
+from contextlib import contextmanager
+from django.db import connection, transaction
+
+_sqlite_write_lock = threading.Lock()
+
+
+@contextmanager
+def result_write():
+    """
+    Stores one judged result atomically; on SQLite, one result per process at a time.
+    """
+    if connection.vendor != 'sqlite':
+        with transaction.atomic():
+            yield
+        return
+    with _sqlite_write_lock:
+        with transaction.atomic():
+            yield
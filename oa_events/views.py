@@ -6,6 +6,8 @@ from django.db.models import Count
 from django.utils import timezone
 import json
 import re # For basic spam filtering
+from home.cache import get_or_build
+from backend.db_router import read_from_replica
 
 # Define constants for comment restrictions
 MAX_COMMENTS_PER_EVENT_PER_USER = 10
@@ -15,11 +17,17 @@ MIN_COMMENT_LENGTH = 1
 SPAM_KEYWORDS = ['http://', 'https://', 'www.', '.com', '.ru', 'buy now', 'free money', 'sex', 'viagra']
 
 # Create your views here.
+@read_from_replica
 def oa_event_list(request):
     """
     Displays a list of all Company OA/Interview Events.
     """
-    events = OAEvent.objects.all().order_by('-event_date', 'company__name') # Order by latest events first
+    # Cached until an event or company changes; the company is fetched along for the logos and names
+    events = get_or_build(
+        'oa_event_list',
+        lambda: list(OAEvent.objects.select_related('company').order_by('-event_date', 'company__name')), # Order by latest events first
+        groups=['oa_events'],
+    )
     context = {
         'events': events,
         'page_title': "Company OA/Interview Events"
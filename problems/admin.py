@@ -2,10 +2,26 @@ from django.contrib import admin
 
 # Register your models here.
 from .models import Problem, TestCase
+from judge.admin import message_rejudge_queued
+from judge.forms import TestDataForm
+from judge.queue import enqueue_rejudge
+from submission.models import CodeSubmission
 
 @admin.register(Problem)
 class ProblemAdmin(admin.ModelAdmin):
-    list_display = ('title', 'difficulty', 'created_at')
+    list_display = ('title', 'difficulty', 'time_limit', 'memory_limit', 'checker', 'created_at')
     search_fields = ('title',)
+    actions = ['rejudge_problems']
+
+    @admin.action(description="Rejudge all submissions to selected problems")
+    def rejudge_problems(self, request, queryset):
+        titles = ', '.join(problem.title for problem in queryset)
+        rejudge = enqueue_rejudge(code_submissions=CodeSubmission.objects.filter(problem__in=queryset),
+                                  created_by=request.user, description=f"Admin: problems {titles}"[:255])
+        message_rejudge_queued(self, request, rejudge)
     
-admin.site.register(TestCase)
\ No newline at end of file
+@admin.register(TestCase)
+class TestCaseAdmin(admin.ModelAdmin):
+    form = TestDataForm
+    fields = ('problem', 'input_data', 'input_file', 'output_data', 'output_file')
+    list_display = ('__str__', 'input_size', 'output_size')
\ No newline at end of file
@@ -0,0 +1,93 @@
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from oa_events.models import Company
+from problems.models import Problem
+from problems.search import rebuild_index
+from problems.views import problem_search
+
+# Topic words the synthetic titles are made of and descriptions mention
+WORDS = ('array string tree graph path sum minimum maximum subarray matrix binary search sort prefix suffix '
+         'interval merge window stack queue heap trie palindrome substring sequence count distinct pairs '
+         'shortest longest cycle bridge flow cut knapsack coin change partition game grid island robot '
+         'segment fenwick bitmask modulo prime divisor factorial permutation combination parity median').split()
+QUERIES = ['sum', 'tree pa', 'longest palindrome', 'shortest path gr', 'bi', 'minimum cut flow', 'coin ch',
+           'segment tree query', 'median of subarray', 'isl']
+TARGET_MS = 20
+
+
+class Command(BaseCommand):
+    help = ('Times the problem search endpoint on a synthetic set of problems (rolled back afterwards), '
+            'against the substring search it replaced.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problems', type=int, default=50000, help='Synthetic problems to search.')
+        parser.add_argument('--rounds', type=int, default=20, help='Times each query is run.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._populate(options['problems'])
+            self._run(options['rounds'])
+            # Leave the database as it was
+            transaction.set_rollback(True)
+
+    def _populate(self, count):
+        self.stdout.write(f'Creating {count} problems...')
+        rng = random.Random(0)
+        # The rest of a description: a vocabulary of made-up words, a few of them common
+        filler = [''.join(rng.choice('bcdfgklmnprstvz') + rng.choice('aeiou') for _ in range(rng.randint(2, 4)))
+                  for _ in range(5000)]
+        weights = [1 / (rank + 1) for rank in range(len(filler))]
+
+        def description():
+            words = rng.choices(filler, weights, k=rng.randint(80, 200)) + rng.sample(WORDS, 8)
+            rng.shuffle(words)
+            return ' '.join(words)
+
+        companies = [Company.objects.create(name=f'Benchmark company {i}') for i in range(20)]
+        difficulties = [choice for choice, _ in Problem.DIFFICULTY_CHOICES]
+        Problem.objects.bulk_create(
+            (Problem(
+                title=' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title() + f' {i}',
+                description=description(),
+                difficulty=rng.choice(difficulties),
+                company_tag=rng.choice(companies) if rng.random() < 0.3 else None,
+            ) for i in range(count)),
+            batch_size=1000,
+        )
+        # bulk_create sends no signals, so the index is built in one go
+        started = time.perf_counter()
+        rebuild_index()
+        self.stdout.write(f'Indexed in {time.perf_counter() - started:.1f}s')
+        self.company_id = companies[0].id
+
+    def _run(self, rounds):
+        factory = RequestFactory()
+        searches = [{'q': query} for query in QUERIES]
+        searches += [{'q': query, 'difficulty': 'Hard'} for query in QUERIES[:3]]
+        searches += [{'q': query, 'company': self.company_id} for query in QUERIES[:3]]
+
+        def time_view(params):
+            request = factory.get('/problems/search/', params)
+            started = time.perf_counter()
+            problem_search(request)
+            return (time.perf_counter() - started) * 1000
+
+        def time_scan(params):
+            # What the problem list did before: an unranked substring scan of the titles
+            started = time.perf_counter()
+            list(Problem.objects.filter(title__icontains=params['q']).order_by('created_at')[:10])
+            return (time.perf_counter() - started) * 1000
+
+        for label, measure in (('full-text index', time_view), ('title__icontains', time_scan)):
+            timings = [measure(params) for _ in range(rounds) for params in searches]
+            ordered = sorted(timings)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            self.stdout.write(f'{label:>17}: p50 {statistics.median(timings):6.2f} ms, p95 {p95:6.2f} ms, '
+                              f'max {ordered[-1]:6.2f} ms over {len(timings)} searches')
+            if measure is time_view:
+                style = self.style.SUCCESS if p95 < TARGET_MS else self.style.ERROR
+                self.stdout.write(style(f'p95 is {"within" if p95 < TARGET_MS else "over"} the {TARGET_MS} ms target'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from contest.models import Contest, ContestTestCase
+from problems import packages
+from problems.models import Problem, TestCase
+
+
+class Command(BaseCommand):
+    help = ('Exports problems and their test cases as a zip or tar package (the layout is described in '
+            'problems/packages.py), for import_problems.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('package', help='The file to write: .tar, .tar.gz or .tgz for a tar file, else a zip.')
+        parser.add_argument('--contest', type=int, help="Export this contest's problems instead of the problem set.")
+        parser.add_argument('--ids', type=int, nargs='+', help='Only the problems with these ids.')
+
+    def handle(self, *args, **options):
+        if options['contest']:
+            try:
+                contest = Contest.objects.get(id=options['contest'])
+            except Contest.DoesNotExist:
+                raise CommandError(f'Contest {options["contest"]} does not exist.')
+            problems = contest.problems.all()
+            test_cases = ContestTestCase.objects.order_by('id')
+        else:
+            problems = Problem.objects.select_related('company_tag')
+            test_cases = TestCase.objects.order_by('id')
+        if options['ids']:
+            problems = problems.filter(id__in=options['ids'])
+
+        # A hundred problems at a time in memory, each with its test cases in the order they were added
+        problems = problems.order_by('id').prefetch_related(Prefetch('test_cases', queryset=test_cases))
+        problem_count, test_count = packages.write(options['package'], problems.iterator(chunk_size=100))
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {problem_count} problem(s) with {test_count} test case(s) to {options["package"]}.'
+        ))
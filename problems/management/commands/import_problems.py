@@ -0,0 +1,107 @@
+import time
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from contest.models import Contest, ContestProblem, ContestTestCase
+from home.cache import invalidate
+from oa_events.models import Company
+from problems import packages, search
+from problems.models import Problem, TestCase
+
+
+class Command(BaseCommand):
+    help = ('Imports problems and their test cases from a zip or tar package (the layout is described in '
+            'problems/packages.py), into the problem set or a contest.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('package', help='The .zip, .tar, .tar.gz or .tgz file.')
+        parser.add_argument('--contest', type=int, help='Add the problems to this contest instead of the problem set.')
+        parser.add_argument('--skip-existing', action='store_true',
+                            help='Leave out problems whose title is already taken (in the problem set or the contest).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per INSERT.')
+
+    def handle(self, *args, **options):
+        contest = None
+        if options['contest']:
+            try:
+                contest = Contest.objects.get(id=options['contest'])
+            except Contest.DoesNotExist:
+                raise CommandError(f'Contest {options["contest"]} does not exist.')
+        model, test_model = (ContestProblem, ContestTestCase) if contest else (Problem, TestCase)
+
+        started = time.perf_counter()
+        try:
+            # The test files are stored on the volume while the archive is read
+            packaged = packages.read(options['package'])
+        except OSError as e:
+            raise CommandError(f'Could not read {options["package"]}: {e}')
+        except ValidationError as e:
+            raise CommandError(f'Not a valid problem package: {"; ".join(e.messages)}')
+
+        taken = set()
+        if options['skip_existing']:
+            taken = set(model.objects.filter(**({'contest': contest} if contest else {}))
+                        .values_list('title', flat=True))
+
+        pending = []
+        # Problem-set problems and the names of their companies, tagged once the import is underway
+        tagged = []
+        skipped = 0
+        for problem in packaged:
+            if problem['fields'].get('title') in taken:
+                skipped += 1
+                continue
+            instance = model(**problem['fields'])
+            if contest:
+                instance.contest = contest
+                if problem['points'] is not None:
+                    instance.points = problem['points']
+            elif problem['company']:
+                tagged.append((instance, problem['company']))
+            try:
+                instance.full_clean(exclude=['contest', 'company_tag'])
+            except ValidationError as e:
+                raise CommandError(f'{problem["directory"]}: {"; ".join(e.messages)}')
+            pending.append((instance, problem['tests']))
+
+        batch_size = options['batch_size']
+        test_count = 0
+        with transaction.atomic():
+            if tagged:
+                # Missing companies are created in the same transaction, so a failed import leaves none behind
+                companies = self._companies({name for _, name in tagged})
+                for instance, name in tagged:
+                    instance.company_tag = companies[name]
+            # Problems first, a batch at a time, then all test cases of that batch
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                model.objects.bulk_create([instance for instance, _ in batch])
+                cases = [
+                    test_model(problem=instance, input_hash=input_hash, input_size=input_size,
+                               output_hash=output_hash, output_size=output_size)
+                    for instance, tests in batch
+                    for input_hash, input_size, output_hash, output_size in tests
+                ]
+                test_model.objects.bulk_create(cases, batch_size=batch_size)
+                test_count += len(cases)
+            if not contest:
+                # bulk_create sends no signals: index the new problems here
+                search.index_problems([instance.pk for instance, _ in pending])
+        if not contest:
+            invalidate('problems', 'leaderboard')
+
+        skipped_note = f', skipped {skipped} already there' if skipped else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {len(pending)} problem(s) with {test_count} test case(s){skipped_note} '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
+
+    def _companies(self, names):
+        # Company tags by name, creating the companies the site doesn't know yet
+        companies = {company.name: company for company in Company.objects.filter(name__in=names)}
+        missing = [Company(name=name) for name in sorted(names - set(companies))]
+        if missing:
+            for company in Company.objects.bulk_create(missing):
+                companies[company.name] = company
+            invalidate('oa_events')
+        return companies
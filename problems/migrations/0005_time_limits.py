@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0004_problem_company_tag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='language_time_multipliers',
+            field=models.JSONField(blank=True, default=dict, help_text='Optional per-language time limit multipliers, e.g. {"py": 3}. Languages not listed use the site defaults.'),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='time_limit',
+            field=models.IntegerField(blank=True, default=None, help_text='CPU time limit per test case in ms (empty: the site default)', null=True),
+        ),
+    ]
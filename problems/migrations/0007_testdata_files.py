@@ -0,0 +1,72 @@
+# Moves test case data out of the database into content-addressed files
+
+from django.db import migrations, models
+from judge import testdata
+
+
+def move_to_files(apps, schema_editor):
+    Model = apps.get_model('problems', 'testcase')
+    for case in Model.objects.iterator():
+        case.input_hash, case.input_size = testdata.store(case.input_data)
+        case.output_hash, case.output_size = testdata.store(case.output_data)
+        case.save(update_fields=['input_hash', 'input_size', 'output_hash', 'output_size'])
+
+
+def move_to_database(apps, schema_editor):
+    Model = apps.get_model('problems', 'testcase')
+    for case in Model.objects.iterator():
+        case.input_data = testdata.read_text(case.input_hash)
+        case.output_data = testdata.read_text(case.output_hash)
+        case.save(update_fields=['input_data', 'output_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0006_checkers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcase',
+            name='input_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='testcase',
+            name='input_size',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Input size in bytes'),
+        ),
+        migrations.AddField(
+            model_name='testcase',
+            name='output_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='testcase',
+            name='output_size',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Expected output size in bytes'),
+        ),
+        # The old columns must allow being empty again when migrating backwards
+        migrations.AlterField(
+            model_name='testcase',
+            name='input_data',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='testcase',
+            name='output_data',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(move_to_files, move_to_database),
+        migrations.RemoveField(
+            model_name='testcase',
+            name='input_data',
+        ),
+        migrations.RemoveField(
+            model_name='testcase',
+            name='output_data',
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from problems.search import get_backend
+    backend = get_backend(schema_editor.connection)
+    if backend is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in backend.create_sql:
+            cursor.execute(sql)
+        backend.rebuild(cursor)
+
+
+def drop_search_index(apps, schema_editor):
+    from problems.search import get_backend
+    backend = get_backend(schema_editor.connection)
+    if backend is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in backend.drop_sql:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0008_output_limit'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
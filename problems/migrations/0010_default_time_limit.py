@@ -0,0 +1,19 @@
+# Time limits are added as nullable in 0005_time_limits; databases that added them with the
+# old 2000 ms default get the nullable column here, and keep the limits they store
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='problem',
+            name='time_limit',
+            field=models.IntegerField(blank=True, help_text='CPU time limit per test case in ms (empty: the site default)', null=True),
+        ),
+    ]
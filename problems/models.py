@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.db import models
+from django.core.exceptions import ValidationError
 from oa_events.models import Company
+from judge.testdata import TestData
 
 # Create your models here.
 class Problem(models.Model):
@@ -8,26 +11,59 @@ class Problem(models.Model):
         ('Medium', 'Medium'),
         ('Hard', 'Hard'),
     ]
+    CHECKER_CHOICES = [
+        ('line', 'Line by line (ignores trailing whitespace)'),
+        ('token', 'Token by token'),
+        ('float', 'Floating point tokens'),
+        ('special', 'Special judge program'),
+    ]
+    CHECKER_LANGUAGE_CHOICES = [
+        ('cpp', 'C++'),
+        ('py', 'Python'),
+    ]
     title       = models.CharField(max_length=200)
     description = models.TextField()
     difficulty  = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES)
     created_at  = models.DateTimeField(auto_now_add=True)
     memory_limit = models.IntegerField(default=256, help_text="Memory limit in MB")
+    time_limit = models.IntegerField(null=True, blank=True,
+                                     help_text="CPU time limit per test case in ms (empty: the site default)")
+    output_limit = models.IntegerField(default=16, help_text="Output limit per test case in MB")
+    language_time_multipliers = models.JSONField(default=dict, blank=True,
+                                                 help_text='Optional per-language time limit multipliers, e.g. {"py": 3}. '
+                                                           'Languages not listed use the site defaults.')
+    checker = models.CharField(max_length=10, choices=CHECKER_CHOICES, default='line',
+                               help_text="How outputs are compared with the expected answers")
+    checker_abs_error = models.FloatField(default=1e-6, help_text="Allowed absolute error for the float checker")
+    checker_rel_error = models.FloatField(default=1e-6, help_text="Allowed relative error for the float checker")
+    checker_language = models.CharField(max_length=10, choices=CHECKER_LANGUAGE_CHOICES, default='cpp')
+    checker_code = models.TextField(blank=True,
+                                    help_text="Special judge source. It is run as `checker input.txt output.txt answer.txt` "
+                                              "and accepts with exit code 0 (1 or 2 mean wrong answer).")
     company_tag = models.ForeignKey(Company, on_delete=models.SET_NULL,
                                     null=True, blank=True,
                                     help_text="Optional: Tag this problem with a company if it's an OA/Interview problem.")
     
     def __str__(self):
         return self.title 
+
+    @property
+    def effective_time_limit(self):
+        # The CPU time limit in ms: the problem's own (before language multipliers) or the
+        # site default, which applies to every language as it is
+        return self.time_limit or settings.JUDGE_DEFAULT_TIME_LIMIT_MS
+
+    def clean(self):
+        if self.checker == 'special' and not self.checker_code.strip():
+            raise ValidationError({'checker_code': "A special judge needs its checker source code."})
     
-class TestCase(models.Model):
+# Input and expected output are files on the test data volume (see judge.testdata)
+class TestCase(TestData):
     problem = models.ForeignKey(
         Problem, 
         on_delete=models.CASCADE, 
         related_name='test_cases'
     )
-    input_data = models.TextField()
-    output_data = models.TextField()
 
     def __str__(self):
         # This will give a helpful name in the admin panel
@@ -0,0 +1,202 @@
+# problems/packages.py
+#
+# Problem packages: zip or tar archives holding whole problems with their test data, to
+# move problem sets between sites or into a contest without typing them into forms.
+# One directory per problem:
+#
+#   0001-two-sum/
+#       problem.json    title, difficulty, limits, checker settings, company / points
+#       statement.md    the description
+#       checker.cpp     the special judge, if any (checker.py when it is Python)
+#       tests/1.in      inputs and expected outputs, paired by name and judged in
+#       tests/1.out     natural order (2 before 10)
+#
+# Archives are streamed member by member both ways: test files are copied between the
+# archive and the test data volume (see judge.testdata) in pieces, so neither a whole
+# archive nor a whole test file is ever held in memory.
+import io
+import json
+import posixpath
+import re
+import tarfile
+import time
+import zipfile
+from django.core.exceptions import ValidationError
+from django.utils.text import slugify
+from judge import testdata
+
+# The fields of problem.json, shared by Problem and ContestProblem
+FIELDS = ['title', 'difficulty', 'memory_limit', 'time_limit', 'output_limit', 'language_time_multipliers',
+          'checker', 'checker_abs_error', 'checker_rel_error', 'checker_language']
+CHECKER_FILES = {'checker.cpp': 'cpp', 'checker.py': 'py'}
+TEST_RE = re.compile(r'^(?P<name>.+)\.(?P<kind>in|out)$')
+TAR_MODES = {'.tar': 'w', '.tar.gz': 'w:gz', '.tgz': 'w:gz', '.tar.bz2': 'w:bz2', '.tar.xz': 'w:xz'}
+
+
+def _natural_key(name):
+    # "2" sorts before "10"; re.split puts the digit runs at the odd positions
+    return [int(part) if index % 2 else part for index, part in enumerate(re.split(r'(\d+)', name))]
+
+
+def _members(path):
+    # (name, binary file object) for every file of the archive, front to back
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as member:
+                        yield info.filename, member
+    else:
+        # Stream mode reads a (compressed) tar sequentially, without seeking back
+        with tarfile.open(path, 'r|*') as archive:
+            for info in archive:
+                if info.isfile():
+                    yield info.name, archive.extractfile(info)
+
+
+def read(path):
+    """
+    Reads the package at `path` and returns its problems in directory order, as dicts
+    with 'directory', 'fields' (model fields), 'company' (a name or None), 'points'
+    (or None) and 'tests' [(input hash, input size, output hash, output size)]. Test
+    files are stored on the test data volume while reading; files of a package that
+    fails to import are removed later by prune_testdata. Raises ValidationError for
+    anything that isn't a well-formed package.
+    """
+    found = {}
+    try:
+        for name, member in _members(path):
+            directory, filename = posixpath.split(name)
+            parent, folder = posixpath.split(directory)
+            match = TEST_RE.match(filename)
+            if folder == 'tests' and match:
+                problem = found.setdefault(parent, {'inputs': {}, 'outputs': {}})
+                problem['inputs' if match['kind'] == 'in' else 'outputs'][match['name']] = testdata.store(member)
+            elif filename == 'problem.json':
+                try:
+                    meta = json.load(member)
+                except ValueError as e:
+                    raise ValidationError(f'{name}: {e}')
+                if not isinstance(meta, dict):
+                    raise ValidationError(f'{name}: expected an object')
+                found.setdefault(directory, {'inputs': {}, 'outputs': {}})['meta'] = meta
+            elif filename == 'statement.md':
+                found.setdefault(directory, {'inputs': {}, 'outputs': {}})['description'] = _text(name, member)
+            elif filename in CHECKER_FILES:
+                problem = found.setdefault(directory, {'inputs': {}, 'outputs': {}})
+                problem['checker_file'] = (CHECKER_FILES[filename], _text(name, member))
+            # Anything else (READMEs, reference solutions...) is not part of a problem
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        raise ValidationError(f'Not a readable zip or tar archive: {e}')
+
+    return [_problem(directory, found[directory]) for directory in sorted(found)]
+
+
+def _text(name, member):
+    try:
+        return member.read().decode('utf-8')
+    except UnicodeDecodeError:
+        raise ValidationError(f'{name}: not UTF-8 text')
+
+
+def _problem(directory, found):
+    if 'meta' not in found:
+        raise ValidationError(f'{directory}: no problem.json')
+    if 'description' not in found:
+        raise ValidationError(f'{directory}: no statement.md')
+    unpaired = set(found['inputs']) ^ set(found['outputs'])
+    if unpaired:
+        raise ValidationError(f'{directory}: tests without an input or output: {", ".join(sorted(unpaired))}')
+
+    meta = found['meta']
+    fields = {field: meta[field] for field in FIELDS if field in meta}
+    fields['description'] = found['description']
+    if 'checker_file' in found:
+        fields['checker_language'], fields['checker_code'] = found['checker_file']
+    tests = [found['inputs'][name] + found['outputs'][name] for name in sorted(found['inputs'], key=_natural_key)]
+    return {
+        'directory': directory,
+        'fields': fields,
+        'company': meta.get('company'),
+        'points': meta.get('points'),
+        'tests': tests,
+    }
+
+
+class _ZipPackage:
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+
+    def add_text(self, name, text):
+        self.archive.writestr(name, text)
+
+    def add_testdata(self, name, key, size):
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        # Members past 2 GiB need zip64 headers, which must be asked for up front
+        with self.archive.open(info, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as member:
+            for chunk in testdata.iter_bytes(key):
+                member.write(chunk)
+
+    def close(self):
+        self.archive.close()
+
+
+class _TarPackage:
+    def __init__(self, path, mode):
+        self.archive = tarfile.open(path, mode)
+
+    def _info(self, name, size):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = time.time()
+        info.mode = 0o644
+        return info
+
+    def add_text(self, name, text):
+        data = text.encode()
+        self.archive.addfile(self._info(name, len(data)), io.BytesIO(data))
+
+    def add_testdata(self, name, key, size):
+        with open(testdata.path(key), 'rb') as data_file:
+            self.archive.addfile(self._info(name, size), data_file)
+
+    def close(self):
+        self.archive.close()
+
+
+def _open(path):
+    for suffix, mode in TAR_MODES.items():
+        if str(path).endswith(suffix):
+            return _TarPackage(path, mode)
+    return _ZipPackage(path)
+
+
+def write(path, problems):
+    """
+    Writes `problems` (Problems or ContestProblems) and their test cases as a
+    package: a tar file for the .tar(.gz/.tgz/.bz2/.xz) names, a zip file otherwise.
+    Returns the number of problems and test cases written.
+    """
+    package = _open(path)
+    problem_count = test_count = 0
+    try:
+        for problem in problems:
+            problem_count += 1
+            directory = f'{problem_count:04d}-{slugify(problem.title)[:50] or "problem"}'
+            meta = {field: getattr(problem, field) for field in FIELDS}
+            if getattr(problem, 'company_tag', None):
+                meta['company'] = problem.company_tag.name
+            if hasattr(problem, 'points'):
+                meta['points'] = problem.points
+            package.add_text(f'{directory}/problem.json', json.dumps(meta, indent=2) + '\n')
+            package.add_text(f'{directory}/statement.md', problem.description)
+            if problem.checker_code:
+                package.add_text(f'{directory}/checker.{problem.checker_language}', problem.checker_code)
+            for index, case in enumerate(problem.test_cases.all(), 1):
+                package.add_testdata(f'{directory}/tests/{index}.in', case.input_hash, case.input_size)
+                package.add_testdata(f'{directory}/tests/{index}.out', case.output_hash, case.output_size)
+                test_count += 1
+    finally:
+        package.close()
+    return problem_count, test_count
@@ -0,0 +1,219 @@
+# problems/search.py
+#
+# Full-text search over problem titles and descriptions. The words of every problem
+# live in a search index next to the problems table, kept up to date by the Problem
+# signals in problems/signals.py:
+#   - SQLite: an FTS5 table ranked with bm25()
+#   - Postgres: a tsvector column with a GIN index ranked with ts_rank_cd()
+# Problems whose title matches come first, then those matching only in the description,
+# each group ranked by relevance. Ranking only the title matches first keeps a search
+# for a common word fast: it doesn't score every description that mentions it when
+# enough titles do. The last word of a query matches as a prefix, so the search box can
+# suggest problems while typing.
+# Other databases fall back to a plain (unranked, unindexed) substring search.
+import re
+from django.db import connections, router
+from django.db.models import Q
+from .models import Problem
+
+# Most results a search returns
+SEARCH_LIMIT = 50
+# Words of a query beyond this are ignored
+MAX_TERMS = 8
+
+# Only letters, digits and underscores reach the index, so user input can never be read
+# as FTS5 or tsquery syntax
+WORD_RE = re.compile(r'\w+')
+
+FTS_TABLE = 'problems_problem_fts'
+TSVECTOR_TABLE = 'problems_problem_search'
+
+
+def query_terms(query):
+    return WORD_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def _not_in(column, exclude):
+    return f" AND {column} NOT IN ({', '.join(['%s'] * len(exclude))})" if exclude else ''
+
+
+class SQLiteSearch:
+    # Besides the words, every problem gets "tags" naming its difficulty and company
+    # ("hard company7"), so the filters are matched inside the index too instead of
+    # looking up the problem of every match
+    tags = "lower(difficulty) || coalesce(' company' || company_tag_id, '')"
+    create_sql = [
+        # The rowid is the problem id; prefixes of 2 and 3 characters get their own index for typeahead
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"title, description, tags, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    ]
+    drop_sql = [f'DROP TABLE IF EXISTS {FTS_TABLE}']
+
+    def index(self, cursor, problem_id):
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [problem_id])
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, title, description, tags) '
+                       f'SELECT id, title, description, {self.tags} FROM problems_problem WHERE id = %s',
+                       [problem_id])
+
+    def remove(self, cursor, problem_id):
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [problem_id])
+
+    def rebuild(self, cursor):
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, title, description, tags) '
+                       f'SELECT id, title, description, {self.tags} FROM problems_problem')
+
+    def search(self, cursor, terms, difficulty, company_id, limit, title_only, exclude):
+        # "two" "sum"* : every word must appear, the last one possibly unfinished
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        if title_only:
+            match = f'title : ({match})'
+        else:
+            match = f'{{title description}} : ({match})'
+        if difficulty:
+            match += f' AND tags : "{difficulty.lower()}"'
+        if company_id:
+            match += f' AND tags : "company{int(company_id)}"'
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s{_not_in("rowid", exclude)} '
+            f'ORDER BY bm25({FTS_TABLE}, 10.0, 1.0, 0.0), rowid LIMIT %s',
+            [match, *exclude, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearch:
+    # Title words weigh "A", description words "B"; "simple" keeps words as written (no
+    # stemming), like the SQLite index
+    document = ("setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('simple', coalesce(description, '')), 'B')")
+    create_sql = [
+        f'CREATE TABLE IF NOT EXISTS {TSVECTOR_TABLE} ('
+        f'problem_id bigint PRIMARY KEY REFERENCES problems_problem (id) ON DELETE CASCADE '
+        f'DEFERRABLE INITIALLY DEFERRED, document tsvector NOT NULL)',
+        f'CREATE INDEX IF NOT EXISTS {TSVECTOR_TABLE}_document_idx ON {TSVECTOR_TABLE} USING GIN (document)',
+    ]
+    drop_sql = [f'DROP TABLE IF EXISTS {TSVECTOR_TABLE}']
+
+    def index(self, cursor, problem_id):
+        cursor.execute(
+            f'INSERT INTO {TSVECTOR_TABLE} (problem_id, document) '
+            f'SELECT id, {self.document} FROM problems_problem WHERE id = %s '
+            f'ON CONFLICT (problem_id) DO UPDATE SET document = EXCLUDED.document',
+            [problem_id],
+        )
+
+    def remove(self, cursor, problem_id):
+        cursor.execute(f'DELETE FROM {TSVECTOR_TABLE} WHERE problem_id = %s', [problem_id])
+
+    def rebuild(self, cursor):
+        cursor.execute(f'DELETE FROM {TSVECTOR_TABLE}')
+        cursor.execute(f'INSERT INTO {TSVECTOR_TABLE} (problem_id, document) '
+                       f'SELECT id, {self.document} FROM problems_problem')
+
+    def search(self, cursor, terms, difficulty, company_id, limit, title_only, exclude):
+        # two & sum:* : every word must appear, the last one possibly unfinished; with
+        # "A" (two:A & sum:*A) only among the title words
+        weight = 'A' if title_only else ''
+        tsquery = ' & '.join(f'{term}:{weight}' if weight else term for term in terms[:-1])
+        tsquery += (' & ' if tsquery else '') + f'{terms[-1]}:*{weight}'
+        # The filters use the problems table's columns; Postgres picks the cheaper of
+        # the GIN index and the problems' indexes
+        filters, params = '', []
+        if difficulty:
+            filters += ' AND p.difficulty = %s'
+            params.append(difficulty)
+        if company_id:
+            filters += ' AND p.company_tag_id = %s'
+            params.append(company_id)
+        cursor.execute(
+            f"SELECT p.id FROM {TSVECTOR_TABLE} s JOIN problems_problem p ON p.id = s.problem_id, "
+            f"to_tsquery('simple', %s) q WHERE s.document @@ q{filters}{_not_in('p.id', exclude)} "
+            f"ORDER BY ts_rank_cd(s.document, q) DESC, p.id LIMIT %s",
+            [tsquery, *params, *exclude, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearch(),
+    'postgresql': PostgresSearch(),
+}
+
+
+def get_backend(connection):
+    # None on databases without a search index
+    return BACKENDS.get(connection.vendor)
+
+
+def index_problem(problem_id):
+    connection = connections[router.db_for_write(Problem)]
+    backend = get_backend(connection)
+    if backend:
+        with connection.cursor() as cursor:
+            backend.index(cursor, problem_id)
+
+
+def index_problems(problem_ids):
+    # For problems created by bulk_create, which sends no signals
+    connection = connections[router.db_for_write(Problem)]
+    backend = get_backend(connection)
+    if backend:
+        with connection.cursor() as cursor:
+            for problem_id in problem_ids:
+                backend.index(cursor, problem_id)
+
+
+def remove_problem(problem_id):
+    connection = connections[router.db_for_write(Problem)]
+    backend = get_backend(connection)
+    if backend:
+        with connection.cursor() as cursor:
+            backend.remove(cursor, problem_id)
+
+
+def rebuild_index(using=None):
+    connection = connections[using or router.db_for_write(Problem)]
+    backend = get_backend(connection)
+    if backend:
+        with connection.cursor() as cursor:
+            backend.rebuild(cursor)
+
+
+def search_problems(query, difficulty=None, company_id=None, limit=SEARCH_LIMIT, fields=None):
+    """
+    Problems matching the query, best match first, optionally only those of one
+    difficulty and / or company. Without search words, the filtered problem list.
+    `fields` limits the columns loaded, e.g. to those a result list shows.
+    """
+    problems = Problem.objects.all()
+    if fields:
+        problems = problems.only(*fields)
+    if difficulty:
+        problems = problems.filter(difficulty=difficulty)
+    if company_id:
+        problems = problems.filter(company_tag_id=company_id)
+
+    terms = query_terms(query)
+    if not terms:
+        return list(problems.order_by('created_at')[:limit])
+
+    alias = router.db_for_read(Problem)
+    backend = get_backend(connections[alias])
+    if backend is None:
+        matches = Q()
+        for term in terms:
+            matches &= Q(title__icontains=term) | Q(description__icontains=term)
+        return list(problems.filter(matches).order_by('created_at')[:limit])
+
+    with connections[alias].cursor() as cursor:
+        ids = backend.search(cursor, terms, difficulty, company_id, limit, title_only=True, exclude=[])
+        if len(ids) < limit:
+            # Too few titles match: fill up with problems that match in the description
+            ids += backend.search(cursor, terms, difficulty, company_id, limit - len(ids), title_only=False,
+                                  exclude=ids)
+
+    # The problems are loaded with the filters applied again, so a match found through
+    # an index entry that is out of date is dropped rather than shown
+    found = problems.using(alias).in_bulk(ids)
+    return [found[problem_id] for problem_id in ids if problem_id in found]
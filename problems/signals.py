@@ -0,0 +1,22 @@
+# problems/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Problem
+from . import search
+
+INDEXED_FIELDS = {'title', 'description', 'difficulty', 'company_tag'}
+
+
+# Keeps the full-text search index (see problems/search.py) in step with the problems
+@receiver(post_save, sender=Problem)
+def index_problem(sender, instance, update_fields=None, **kwargs):
+    # Saves that leave the title, description, difficulty and company alone don't change
+    # what a search finds
+    if update_fields is not None and not INDEXED_FIELDS & set(update_fields):
+        return
+    search.index_problem(instance.pk)
+
+
+@receiver(post_delete, sender=Problem)
+def unindex_problem(sender, instance, **kwargs):
+    search.remove_problem(instance.pk)
@@ -1,3 +1,184 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import zipfile
+from pathlib import Path
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from contest.models import Contest
+from oa_events.models import Company
+from .models import Problem
+from . import search
+from .search import search_problems
 
-# Create your tests here.
+
+class ProblemSearchTests(TestCase):
+    """
+    The full-text search behind the problem list and the search box's suggestions.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.company = Company.objects.create(name='Acme')
+        cls.two_sum = Problem.objects.create(title='Two Sum', description='Find a pair adding up to the target.',
+                                             difficulty='Easy', company_tag=cls.company)
+        cls.path_sum = Problem.objects.create(title='Path Sum', description='Sum of a path in a binary tree.',
+                                              difficulty='Medium')
+        cls.islands = Problem.objects.create(title='Number of Islands', description='Count the islands; each '
+                                             'island is a connected sum of land cells.', difficulty='Hard')
+        cls.user = User.objects.create_user('alice', password='pw')
+
+    def setUp(self):
+        cache.clear()
+
+    def titles(self, *args, **kwargs):
+        return [problem.title for problem in search_problems(*args, **kwargs)]
+
+    def test_title_matches_rank_first(self):
+        # Both titles say "sum" (Path Sum's description too); the islands only mention it
+        # in their description
+        self.assertEqual(self.titles('sum'), ['Path Sum', 'Two Sum', 'Number of Islands'])
+        self.assertEqual(self.titles('binary tree'), ['Path Sum'])
+
+    def test_prefix_and_words(self):
+        self.assertEqual(self.titles('isl'), ['Number of Islands'])
+        self.assertEqual(self.titles('two su'), ['Two Sum'])
+        # Every word has to match, and punctuation is not query syntax
+        self.assertEqual(self.titles('two "islands'), [])
+        self.assertEqual(self.titles('path* (sum'), ['Path Sum'])
+
+    def test_filters(self):
+        self.assertEqual(self.titles('sum', difficulty='Hard'), ['Number of Islands'])
+        self.assertEqual(self.titles('sum', company_id=self.company.id), ['Two Sum'])
+        self.assertEqual(self.titles('', difficulty='Medium'), ['Path Sum'])
+        self.assertEqual(self.titles('sum', difficulty='Hard', company_id=self.company.id), [])
+
+    def test_index_follows_changes(self):
+        self.two_sum.title = 'Three Sum'
+        self.two_sum.save()
+        self.assertEqual(self.titles('three'), ['Three Sum'])
+        self.assertEqual(self.titles('two'), [])
+
+        self.path_sum.difficulty = 'Hard'
+        self.path_sum.save(update_fields=['difficulty'])
+        self.assertEqual(self.titles('sum', difficulty='Hard'), ['Path Sum', 'Number of Islands'])
+
+        self.islands.delete()
+        self.assertEqual(self.titles('island'), [])
+
+    def test_problem_list(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('problems-list'), {'q': 'sum', 'difficulty': 'Medium'})
+        self.assertEqual(list(response.context['problems']), [self.path_sum])
+        # Unknown filter values are ignored
+        response = self.client.get(reverse('problems-list'), {'q': 'sum', 'difficulty': 'Impossible'})
+        self.assertEqual(len(response.context['problems']), 3)
+        # The cached full list leaves the descriptions in the database
+        response = self.client.get(reverse('problems-list'))
+        self.assertEqual(list(response.context['problems']), [self.two_sum, self.path_sum, self.islands])
+        self.assertIn('description', response.context['problems'][0].get_deferred_fields())
+
+    def test_search_endpoint(self):
+        response = self.client.get(reverse('problem-search'), {'q': 'su', 'limit': '1'})
+        self.assertEqual(response.json(), {'results': [{
+            'id': self.path_sum.id,
+            'title': 'Path Sum',
+            'difficulty': 'Medium',
+            'url': reverse('problem-detail', args=[self.path_sum.id]),
+        }]})
+        response = self.client.get(reverse('problem-search'), {'q': 'sum', 'company': str(self.company.id)})
+        self.assertEqual([result['title'] for result in response.json()['results']], ['Two Sum'])
+
+
+class ProblemPackageTests(TestCase):
+    """
+    import_problems and export_problems, through a package on disk.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        testdata_dir = override_settings(JUDGE_TESTDATA_DIR=str(self.directory / 'testdata'))
+        testdata_dir.enable()
+        self.addCleanup(testdata_dir.disable)
+
+    def write_package(self, name, files):
+        path = self.directory / name
+        with zipfile.ZipFile(path, 'w') as archive:
+            for member, content in files.items():
+                archive.writestr(member, content)
+        return str(path)
+
+    def test_import(self):
+        package = self.write_package('problems.zip', {
+            'b/problem.json': json.dumps({'title': 'Bravo', 'difficulty': 'Hard', 'company': 'Acme'}),
+            'b/statement.md': 'Add two numbers.',
+            'b/tests/10.in': '10', 'b/tests/10.out': '20',
+            'b/tests/2.in': '2', 'b/tests/2.out': '4',
+            'a/problem.json': json.dumps({'title': 'Alpha', 'difficulty': 'Easy', 'checker': 'special'}),
+            'a/statement.md': 'Anything goes.',
+            'a/checker.py': 'import sys',
+            'a/README': 'not part of the problem',
+        })
+        call_command('import_problems', package, stdout=io.StringIO())
+
+        alpha, bravo = Problem.objects.order_by('title')
+        self.assertEqual((alpha.checker, alpha.checker_language, alpha.checker_code), ('special', 'py', 'import sys'))
+        self.assertEqual(bravo.company_tag.name, 'Acme')
+        # Tests keep their natural order: 2 before 10
+        self.assertEqual([case.input_data for case in bravo.test_cases.order_by('id')], ['2', '10'])
+        self.assertEqual(search_problems('bravo'), [bravo])
+
+        # Importing again with --skip-existing adds nothing
+        call_command('import_problems', package, skip_existing=True, stdout=io.StringIO())
+        self.assertEqual(Problem.objects.count(), 2)
+
+    def test_failed_import_creates_no_companies(self):
+        package = self.write_package('problems.zip', {
+            'a/problem.json': json.dumps({'title': 'Alpha', 'difficulty': 'Easy', 'company': 'Acme'}),
+            'a/statement.md': 'A',
+        })
+        with mock.patch.object(search, 'index_problems', side_effect=RuntimeError('index down')), \
+                self.assertRaises(RuntimeError):
+            call_command('import_problems', package, stdout=io.StringIO())
+        self.assertFalse(Problem.objects.exists())
+        self.assertFalse(Company.objects.exists())
+
+    def test_broken_packages(self):
+        broken = {
+            'no statement': {'a/problem.json': '{"title": "A", "difficulty": "Easy"}'},
+            'unpaired test': {'a/problem.json': '{"title": "A", "difficulty": "Easy"}', 'a/statement.md': 'A',
+                              'a/tests/1.in': '1'},
+            'invalid field': {'a/problem.json': '{"title": "A", "difficulty": "Trivial"}', 'a/statement.md': 'A'},
+        }
+        for label, files in broken.items():
+            with self.subTest(label), self.assertRaises(CommandError):
+                call_command('import_problems', self.write_package('broken.zip', files))
+        self.assertFalse(Problem.objects.exists())
+
+    def test_export_and_import_into_contest(self):
+        problem = Problem.objects.create(title='Echo', description='Print the input.', difficulty='Medium',
+                                         time_limit=1500)
+        for data in ('a', 'b', 'c'):
+            problem.test_cases.create(input_data=data, output_data=data)
+        user = User.objects.create_user('alice', password='pw')
+        contest = Contest.objects.create(title='Cup', start_time=timezone.now(), end_time=timezone.now(),
+                                         created_by=user)
+
+        for name in ('problems.zip', 'problems.tar.gz'):
+            with self.subTest(name):
+                package = str(self.directory / name)
+                call_command('export_problems', package, stdout=io.StringIO())
+                call_command('import_problems', package, contest=contest.id, stdout=io.StringIO())
+                copy = contest.problems.latest('id')
+                self.assertEqual((copy.title, copy.description, copy.time_limit), ('Echo', 'Print the input.', 1500))
+                # The copies point at the same test data files
+                self.assertEqual([case.input_hash for case in copy.test_cases.order_by('id')],
+                                 [case.input_hash for case in problem.test_cases.order_by('id')])
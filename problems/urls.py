@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import problems_list, problem_detail
+from .views import problems_list, problem_detail, problem_search
 
 urlpatterns = [
     path('list/', problems_list, name='problems-list'),  # URL for the problems list view
     path('detail/<int:problem_id>/', problem_detail, name='problem-detail'),  # URL for the problem detail view
+    path('search/', problem_search, name='problem-search'),  # JSON search used by the search box's suggestions
 ]
\ No newline at end of file
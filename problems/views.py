@@ -1,33 +1,86 @@
 from django.shortcuts import render, get_object_or_404
+from django.http import JsonResponse
+from django.urls import reverse
 from .models import Problem
 from django.contrib.auth.decorators import login_required
 from contest.models import Contest
+from oa_events.models import Company
 from django.utils import timezone
-from django.db.models import Q
+from home.cache import get_or_build
+from backend.db_router import read_from_replica
+from .search import SEARCH_LIMIT, search_problems
 
+# What a list of problems shows; descriptions stay in the database
+LIST_FIELDS = ('id', 'title', 'difficulty', 'created_at')
+
+
+def _search_filters(request):
+    # The difficulty and company filters of a search, ignoring values that can't match anything
+    difficulty = request.GET.get('difficulty', '')
+    if difficulty not in dict(Problem.DIFFICULTY_CHOICES):
+        difficulty = ''
+    company = request.GET.get('company', '')
+    company_id = int(company) if company.isdigit() else None
+    return difficulty, company_id
+
+@read_from_replica
 def problems_list(request):
     search_query = request.GET.get('q', '')
+    difficulty, company_id = _search_filters(request)
 
-    problems = Problem.objects.all()
-    if search_query:
-        problems = problems.filter(title__icontains=search_query)
+    if search_query or difficulty or company_id:
+        # Best matches first, from the full-text index (see problems/search.py)
+        problems = search_problems(search_query, difficulty, company_id, fields=LIST_FIELDS)
+    else:
+        # The full list is the same for everyone, so it is cached until a problem changes
+        problems = get_or_build('problems_list', lambda: list(Problem.objects.only(*LIST_FIELDS).order_by('created_at')),
+                               groups=['problems'])
+    # For the company filter; cached along with the OA events, which also show companies
+    companies = get_or_build('company_list', lambda: list(Company.objects.order_by('name')), groups=['oa_events'])
 
-    problems = problems.order_by('created_at')
-    
+    # Contests are cached as one list and sorted by the current time on every request,
+    # so a contest starting or ending never waits for the cache to expire
     now = timezone.now()
-    active_contests = Contest.objects.filter(start_time__lte=now, end_time__gte=now)
-    upcoming_contests = Contest.objects.filter(start_time__gt=now).order_by('start_time')[:2] # Get the next 2 upcoming
+    contests = get_or_build('contest_list', lambda: list(Contest.objects.order_by('start_time')), groups=['contests'])
+    active_contests = [contest for contest in contests if contest.start_time <= now <= contest.end_time]
+    upcoming_contests = [contest for contest in contests if contest.start_time > now][:2] # Get the next 2 upcoming
     
     context = {
         'problems': problems,
         'active_contests': active_contests,
         'upcoming_contests': upcoming_contests,
         'search_query': search_query,
+        'difficulty': difficulty,
+        'company_id': company_id,
+        'difficulties': [choice for choice, _ in Problem.DIFFICULTY_CHOICES],
+        'companies': companies,
     }
     
     # Pass them into your template
     return render(request, 'problems.html', context)
 
+@read_from_replica
+def problem_search(request):
+    """
+    JSON search for the search box's suggestions: ranked matches of `q` (the last
+    word may be unfinished), optionally filtered by `difficulty` and `company`.
+    """
+    difficulty, company_id = _search_filters(request)
+    limit = request.GET.get('limit', '')
+    limit = min(int(limit), SEARCH_LIMIT) if limit.isdigit() and int(limit) > 0 else 10
+    problems = search_problems(request.GET.get('q', ''), difficulty, company_id, limit, fields=LIST_FIELDS)
+    return JsonResponse({
+        'results': [
+            {
+                'id': problem.id,
+                'title': problem.title,
+                'difficulty': problem.difficulty,
+                'url': reverse('problem-detail', args=[problem.id]),
+            }
+            for problem in problems
+        ]
+    })
+
 @login_required
 def problem_detail(request, problem_id):
     problem = get_object_or_404(Problem, id=problem_id)
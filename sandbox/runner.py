@@ -1,49 +1,544 @@
 # In /sandbox/runner.py
+#
+# Judges one submission per invocation. The judge and the runner talk in frames: a
+# 4-byte big-endian header length, a JSON header, and then the raw bytes of every blob
+# the header lists in "blobs": [[name, size], ...] (see judge/protocol.py).
+#
+# The request on stdin is one header frame, carrying the source as the "code" blob:
+#     {"type": "request", "language": "py" | "cpp", "case_count": 3,
+#      "time_limit_ms": 2000, "wall_limit_ms": 5000, "memory_limit_kb": 262144,
+#      "output_limit_bytes": 16777216, "stdout_capture_bytes": 65536, "stderr_capture_bytes": 65536,
+#      "compile_flags": [...], "return_binary": true,
+#      "checker": {"language": "cpp", "return_binary": true}}
+# plus a "binary" blob (and "checker_binary") when the judge has the program compiled
+# already, in which case it is run as it is instead of being compiled again.
+# followed by one frame per test case, read only when that case is about to run:
+#     {"type": "input", "case": 0} with a "data" blob
+# which is copied to a file as it arrives, not read into memory. For problems judged by
+# a special judge program, the request also carries a "checker_code" blob and every
+# input frame is followed by an "answer" frame of the same shape.
+#
+# The runner starts as root only to keep the programs apart: the submission is compiled
+# and run as SUBMISSION_USER and the special judge as CHECKER_USER, while each case's
+# input and answer sit in a directory neither of them can list, in which only the
+# checker may read. A submission can't read the tests or the answers, not even through
+# a process it leaves running in the background. (Started as any other user, the runner
+# can't switch and runs everything as itself.)
+#
+# The source is compiled once and every input is then run in turn. One frame is
+# written to stdout per event, as soon as it happens:
+#     {"type": "compiled", "target": "main" | "checker", "cache": "hit" | "miss"}
+#      (with a "binary" blob if it was requested)
+#     {"type": "compile_error", "message": "..."}
+#     {"type": "checker_error", "message": "..."}
+#     {"type": "case", "case": 0, "status": "ok", "exit_code": 0, "wall_ms": 12, "cpu_ms": 9,
+#      "memory_kb": 9120, "stdout_size": 6, "stderr_size": 0,
+#      "checker": {"status": "accepted" | "wrong_answer" | "failed", "message": "..."}}
+#      (with "stdout" and "stderr" blobs)
+# where status is one of ok, runtime_error, timeout (CPU or wall time limit), memory
+# (over the memory limit), output_limit (wrote more than output_limit_bytes to stdout)
+# or killed (SIGKILLed by the container's OOM killer). The "checker" result is only
+# present when a special judge ran on a case with status ok. The blobs only hold the
+# first stdout/stderr_capture_bytes of each stream; the sizes are the full byte counts.
+#     {"type": "error", "message": "..."}
+import json
+import math
+import os
+import pwd
+import resource
+import shutil
+import signal
+import struct
 import sys
 import subprocess
+import tempfile
+import threading
+import time
 from pathlib import Path
 
-def main():
-    try:
-        # Read language, code, and input from the data piped into this script
-        language = sys.stdin.readline().strip()
-        code_and_input = sys.stdin.read()
-        parts = code_and_input.split('---!!!INPUT_DELIMITER!!!---')
-        code = parts[0]
-        input_data = parts[1] if len(parts) > 1 else ''
-
-        if language == "py":
-            filename = "main.py"
-        elif language == "cpp":
-            filename = "main.cpp"
+SUBMISSION_USER = 'sandboxuser'
+CHECKER_USER = 'checker'
+# Every job gets a fresh working directory so a reused container never sees old files
+JOB_DIR = Path('/home') / SUBMISSION_USER / 'job'
+# One directory per test case for its input, answer and checking, under a parent that
+# others may pass through but not list
+CASES_DIR = Path('/judge/cases')
+COMPILE_TIMEOUT = 30
+# Inputs and answers are copied off the request in pieces of this many bytes
+COPY_CHUNK_SIZE = 64 * 1024
+# Defaults for requests that don't carry their own limits
+DEFAULT_TIME_LIMIT_MS = 5000
+DEFAULT_MEMORY_LIMIT_KB = 256 * 1024
+DEFAULT_OUTPUT_LIMIT_BYTES = 16 * 1024 * 1024
+# Only this much of a program's stderr is ever kept; the rest is read and thrown away
+DEFAULT_STDERR_CAPTURE_BYTES = 64 * 1024
+# The address-space cap leaves room for shared libraries and thread stacks; the peak
+# resident memory is what actually gets compared against the limit
+ADDRESS_SPACE_HEADROOM = 64 * 1024 * 1024
+FRAME_PREFIX = struct.Struct('>I')
+# What an allocation failure under the address-space cap looks like on stderr
+OUT_OF_MEMORY_MARKERS = (b'MemoryError', b'std::bad_alloc')
+# Limits for one run of a special judge program
+CHECKER_TIME_LIMIT_MS = 10000
+CHECKER_MEMORY_LIMIT_KB = 256 * 1024
+# Special judges follow the testlib convention: exit code 0 accepts, 1 (wrong answer)
+# and 2 (presentation error) reject, anything else means the checker itself failed
+CHECKER_REJECT_CODES = (1, 2)
+CHECKER_MESSAGE_LIMIT = 1000
+
+
+class CompilationError(Exception):
+    pass
+
+
+def reset():
+    # Called by the warm pool between jobs: kill anything the last job left behind
+    # (background processes, forks) and wipe its files.
+    me = os.getpid()
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        pid = int(entry)
+        # PID 1 is the keep-alive process that holds the container open
+        if pid in (1, me):
+            continue
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    shutil.rmtree(JOB_DIR, ignore_errors=True)
+    shutil.rmtree(CASES_DIR, ignore_errors=True)
+    for leftover in Path('/tmp').iterdir():
+        if leftover.is_dir():
+            shutil.rmtree(leftover, ignore_errors=True)
         else:
-            print("Unsupported language.", file=sys.stderr)
-            return
+            leftover.unlink(missing_ok=True)
+    print("ok")
+
+
+def _account(name):
+    # (uid, gid) to run as, or None when the runner can't switch users (it isn't root)
+    if os.geteuid() != 0:
+        return None
+    entry = pwd.getpwnam(name)
+    return entry.pw_uid, entry.pw_gid
+
+
+def _give_to(account, *paths):
+    # Makes `paths` belong to `account` (a no-op when not switching users)
+    if account is not None:
+        for path in paths:
+            os.chown(path, *account)
+
+
+def _switch_user(account):
+    # Runs in the child between fork() and exec(), after the limits are set
+    if account is not None:
+        uid, gid = account
+        os.setgroups([])
+        os.setgid(gid)
+        os.setuid(uid)
+
+
+def emit(event, **blobs):
+    # Writes one event frame; blobs are written raw after the header
+    header = json.dumps(dict(event, blobs=[[name, len(data)] for name, data in blobs.items()])).encode()
+    out = sys.stdout.buffer
+    out.write(FRAME_PREFIX.pack(len(header)))
+    out.write(header)
+    for data in blobs.values():
+        out.write(data)
+    out.flush()
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError("The request was cut off.")
+    return data
+
+
+def _copy_exact(stream, size, path):
+    with open(path, 'wb') as target:
+        while size:
+            chunk = stream.read(min(size, COPY_CHUNK_SIZE))
+            if not chunk:
+                raise EOFError("The request was cut off.")
+            target.write(chunk)
+            size -= len(chunk)
+
 
-        Path(filename).write_text(code)
+def read_frame(stream, files=None):
+    # Reads one frame as a dict of its header fields plus one bytes value per blob; the
+    # blobs named in `files` are copied to those paths instead, a piece at a time
+    (header_size,) = FRAME_PREFIX.unpack(_read_exact(stream, FRAME_PREFIX.size))
+    frame = json.loads(_read_exact(stream, header_size))
+    for name, size in frame.pop('blobs', []):
+        if files and name in files:
+            _copy_exact(stream, size, files[name])
+            frame[name] = files[name]
+        else:
+            frame[name] = _read_exact(stream, size)
+    return frame
 
-        if language == "py":
-            command = ['python', filename]
-        elif language == "cpp":
-            compile_cmd = ['g++', filename, '-o', 'main']
-            subprocess.run(compile_cmd, check=True, capture_output=True, text=True)
-            command = ['./main']
 
-        # Run the compiled/interpreted code
-        result = subprocess.run(command, input=input_data, capture_output=True, text=True, timeout=10)
+def read_data(stream, kind, index, path):
+    # Copies the next input or answer to `path`
+    frame = read_frame(stream, files={'data': path})
+    if frame.get('type') != kind or frame.get('case') != index or 'data' not in frame:
+        raise ValueError(f"Expected the {kind} of test case {index}.")
+    return path
 
-        if result.stdout:
-            print(result.stdout)
-        if result.stderr:
-            print(result.stderr, file=sys.stderr)
 
+def _compile(command, directory, account):
+    try:
+        # Relative names keep the sandbox's paths out of the error messages users see
+        subprocess.run(command, check=True, cwd=directory, capture_output=True, text=True,
+                       timeout=COMPILE_TIMEOUT, preexec_fn=lambda: _switch_user(account))
     except subprocess.CalledProcessError as e:
-        print("Compilation Error:", file=sys.stderr)
-        print(e.stderr, file=sys.stderr)
+        raise CompilationError(e.stderr)
     except subprocess.TimeoutExpired:
-        print("Execution Timed Out (10 seconds)", file=sys.stderr)
+        raise CompilationError(f"Compilation Timed Out ({COMPILE_TIMEOUT} seconds)")
+
+
+def prepare(language, code, directory, name='main', compile_flags=(), binary=None, return_binary=False,
+            account=None):
+    """
+    Writes the source into `directory`, compiles it if needed, and returns the
+    command that runs it from inside that directory. `binary` is the compiled
+    program sent by the judge, if it had it. `name` tells the judge which program a
+    "compiled" event is for; the compiler runs as `account`, which owns `directory`.
+    """
+    if language == "py":
+        source = directory / f"{name}.py"
+        source.write_bytes(code)
+        return ['python', source.name]
+
+    if language == "cpp":
+        source = directory / f"{name}.cpp"
+        program = directory / name
+        source.write_bytes(code)
+
+        # Reuse the binary the judge already compiled for exactly this source and flags
+        if binary is not None:
+            program.write_bytes(binary)
+            os.chmod(program, 0o755)
+            emit({"type": "compiled", "target": name, "cache": "hit"})
+            return [f'./{name}']
+
+        _compile(['g++', *compile_flags, source.name, '-o', name], directory, account)
+
+        event = {"type": "compiled", "target": name, "cache": "miss"}
+        if return_binary:
+            # Hand the binary back so the judge can add it to the cache
+            emit(event, binary=program.read_bytes())
+        else:
+            emit(event)
+        return [f'./{name}']
+
+    raise ValueError("Unsupported language.")
+
+
+def prepare_checker(spec, code, binary, compile_flags):
+    """
+    Compiles the special judge once, as CHECKER_USER, and keeps the result in memory.
+    It is written to each test case's own directory before it checks that case.
+    """
+    account = _account(CHECKER_USER)
+    build_dir = Path(tempfile.mkdtemp(prefix='checker-', dir=CASES_DIR))
+    _give_to(account, build_dir)
+    try:
+        command = prepare(spec['language'], code, build_dir, name='checker',
+                          compile_flags=compile_flags, binary=binary,
+                          return_binary=spec.get('return_binary', False), account=account)
+        artifact = build_dir / Path(command[-1]).name
+        return {"interpreter": command[:-1], "name": artifact.name, "program": artifact.read_bytes(),
+                "account": account}
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def case_directory(checker):
+    # A fresh directory for one test case's files: the runner's own, or the checker's
+    # when there is one. Either way the submission can't get in.
+    directory = Path(tempfile.mkdtemp(prefix='case-', dir=CASES_DIR))
+    if checker is not None:
+        _give_to(checker['account'], directory)
+    return directory
+
+
+def run_checker(checker, directory, output):
+    # Runs the special judge as `checker input.txt output.txt answer.txt` in the case's directory
+    program = directory / checker['name']
+    program.write_bytes(checker['program'])
+    os.chmod(program, 0o700)
+    (directory / 'output.txt').write_bytes(output)
+    _give_to(checker['account'], program, directory / 'input.txt', directory / 'output.txt',
+             directory / 'answer.txt')
+
+    command = [*checker['interpreter'], f'./{program.name}', 'input.txt', 'output.txt', 'answer.txt']
+    result = run_case(command, b'', CHECKER_TIME_LIMIT_MS, CHECKER_TIME_LIMIT_MS * 2,
+                      CHECKER_MEMORY_LIMIT_KB, cwd=directory, account=checker['account'])
+
+    if result['status'] == 'ok':
+        status = "accepted"
+    elif result['status'] == 'runtime_error' and result['exit_code'] in CHECKER_REJECT_CODES:
+        status = "wrong_answer"
+    else:
+        status = "failed"
+    message = (result['stdout'] or result['stderr']).strip()[:CHECKER_MESSAGE_LIMIT].decode(errors='replace')
+    return {"status": status, "message": message}
+
+
+def _feed(pipe, data):
+    try:
+        pipe.write(data)
+    except BrokenPipeError:
+        # The program exited without reading all of its input, which is fine
+        pass
+    finally:
+        try:
+            pipe.close()
+        except BrokenPipeError:
+            pass
+
+
+class BoundedBuffer:
+    # Keeps the first `limit` bytes written to it and only counts the rest
+    def __init__(self, limit):
+        self.limit = limit
+        self.data = bytearray()
+        self.size = 0
+
+    @property
+    def overflowed(self):
+        return self.size > self.limit
+
+    def add(self, chunk):
+        room = self.limit - len(self.data)
+        if room > 0:
+            self.data += chunk[:room]
+        self.size += len(chunk)
+
+    def getvalue(self):
+        # Handed out without a copy; nothing is added once the pipe is drained
+        return self.data
+
+
+def _drain(pipe, buffer, on_overflow=None):
+    # Reads the pipe to the end so the program never blocks on it, whatever it writes
+    for chunk in iter(lambda: pipe.read(65536), b''):
+        buffer.add(chunk)
+        if on_overflow is not None and buffer.overflowed:
+            on_overflow()
+            on_overflow = None
+    pipe.close()
+
+
+def _watch_memory(pid, peak, finished):
+    # ru_maxrss from wait4 also counts the runner's own memory from before exec(),
+    # so we sample the program's high-water mark (VmHWM) instead. It only ever grows,
+    # so polling can at most miss growth in the last few milliseconds of the run.
+    status_path = f'/proc/{pid}/status'
+    while True:
+        try:
+            with open(status_path) as status:
+                for line in status:
+                    if line.startswith('VmHWM:'):
+                        peak[0] = max(peak[0], int(line.split()[1]))
+                        break
+        except (FileNotFoundError, ProcessLookupError, ValueError):
+            return
+        if finished.wait(0.005):
+            return
+
+
+def _kill_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _limit_resources(time_limit_ms, memory_limit_kb, account):
+    # Runs in the child between fork() and exec(). RLIMIT_CPU only has one second
+    # granularity, so it is a hard backstop above the limit; the exact limit is
+    # checked afterwards against the measured CPU time.
+    cpu_seconds = math.ceil(time_limit_ms / 1000) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    address_space = memory_limit_kb * 1024 + ADDRESS_SPACE_HEADROOM
+    resource.setrlimit(resource.RLIMIT_AS, (address_space, address_space))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    _switch_user(account)
+
+
+def run_case(command, input_data, time_limit_ms, wall_limit_ms, memory_limit_kb, cwd=None,
+             output_limit=DEFAULT_OUTPUT_LIMIT_BYTES, stderr_limit=DEFAULT_STDERR_CAPTURE_BYTES, account=None):
+    """
+    Runs one test case as `account` under its CPU time and memory limits and measures it.
+    os.wait4 gives us the resource usage of exactly this child, so the CPU time is
+    per test case; the wall clock limit only catches programs that sleep or block.
+    `input_data` is bytes or the path of the input file, which the runner opens and
+    hands over as the program's stdin: the program never needs to be able to open it.
+    At most `output_limit` bytes of stdout are kept: one byte more and the program is killed.
+    """
+    stdout, stderr = BoundedBuffer(output_limit), BoundedBuffer(stderr_limit)
+    input_file = open(input_data, 'rb') if isinstance(input_data, Path) else None
+    started = time.monotonic()
+    try:
+        # A new session puts the program and anything it forks into one process group we can kill
+        proc = subprocess.Popen(command, stdin=input_file or subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, start_new_session=True, cwd=cwd,
+                                preexec_fn=lambda: _limit_resources(time_limit_ms, memory_limit_kb, account))
+    finally:
+        # The child has its own copy of the descriptor
+        if input_file is not None:
+            input_file.close()
+
+    output_exceeded = threading.Event()
+
+    def on_output_exceeded():
+        output_exceeded.set()
+        _kill_group(proc.pid)
+
+    # Feed stdin and drain both outputs concurrently so a full pipe can never deadlock the program
+    threads = [
+        threading.Thread(target=_drain, args=(proc.stdout, stdout, on_output_exceeded)),
+        threading.Thread(target=_drain, args=(proc.stderr, stderr)),
+    ]
+    if input_file is None:
+        threads.append(threading.Thread(target=_feed, args=(proc.stdin, input_data)))
+    for thread in threads:
+        thread.start()
+
+    peak_kb = [0]
+    finished = threading.Event()
+    watcher = threading.Thread(target=_watch_memory, args=(proc.pid, peak_kb, finished))
+    watcher.start()
+
+    timed_out = threading.Event()
+
+    def on_timeout():
+        timed_out.set()
+        _kill_group(proc.pid)
+
+    timer = threading.Timer(wall_limit_ms / 1000, on_timeout)
+    timer.start()
+    _, status, usage = os.wait4(proc.pid, 0)
+    timer.cancel()
+    finished.set()
+    wall_ms = int((time.monotonic() - started) * 1000)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    # Kill leftover children still holding the pipes open, then collect the output
+    _kill_group(proc.pid)
+    for thread in threads:
+        thread.join()
+    watcher.join()
+
+    cpu_ms = int((usage.ru_utime + usage.ru_stime) * 1000)
+    memory_kb = peak_kb[0] or usage.ru_maxrss
+    output = stdout.getvalue()
+    error_output = stderr.getvalue()
+
+    if output_exceeded.is_set():
+        status_name = "output_limit"
+    elif timed_out.is_set() or cpu_ms > time_limit_ms or proc.returncode == -signal.SIGXCPU:
+        status_name = "timeout"
+    elif proc.returncode == -signal.SIGKILL:
+        # A SIGKILL we didn't send is the cgroup OOM killer
+        status_name = "killed"
+    elif memory_kb > memory_limit_kb or (
+            proc.returncode != 0 and any(marker in error_output for marker in OUT_OF_MEMORY_MARKERS)):
+        status_name = "memory"
+    elif proc.returncode != 0:
+        status_name = "runtime_error"
+    else:
+        status_name = "ok"
+
+    return {
+        "status": status_name,
+        "exit_code": proc.returncode,
+        "stdout": output,
+        "stderr": error_output,
+        "stdout_size": stdout.size,
+        "stderr_size": stderr.size,
+        "wall_ms": wall_ms,
+        "cpu_ms": cpu_ms,
+        "memory_kb": memory_kb,
+    }
+
+
+def main():
+    stdin = sys.stdin.buffer
+    try:
+        request = read_frame(stdin)
+
+        submitter = _account(SUBMISSION_USER)
+        shutil.rmtree(JOB_DIR, ignore_errors=True)
+        JOB_DIR.mkdir()
+        _give_to(submitter, JOB_DIR)
+        os.chdir(JOB_DIR)
+        shutil.rmtree(CASES_DIR, ignore_errors=True)
+        CASES_DIR.mkdir(parents=True)
+        os.chmod(CASES_DIR, 0o711)
+
+        try:
+            command = prepare(
+                request['language'],
+                request['code'],
+                JOB_DIR,
+                compile_flags=request.get('compile_flags', []),
+                binary=request.get('binary'),
+                return_binary=request.get('return_binary', False),
+                account=submitter,
+            )
+        except CompilationError as e:
+            emit({"type": "compile_error", "message": str(e)})
+            return
+
+        checker = None
+        if request.get('checker'):
+            try:
+                checker = prepare_checker(request['checker'], request['checker_code'],
+                                          request.get('checker_binary'), request.get('compile_flags', []))
+            except CompilationError as e:
+                # Not the submission's fault, so it gets its own event type
+                emit({"type": "checker_error", "message": str(e)})
+                return
+
+        time_limit_ms = request.get('time_limit_ms') or DEFAULT_TIME_LIMIT_MS
+        wall_limit_ms = request.get('wall_limit_ms') or time_limit_ms * 2 + 1000
+        memory_limit_kb = request.get('memory_limit_kb') or DEFAULT_MEMORY_LIMIT_KB
+        output_limit = request.get('output_limit_bytes') or DEFAULT_OUTPUT_LIMIT_BYTES
+        stderr_limit = request.get('stderr_capture_bytes') or DEFAULT_STDERR_CAPTURE_BYTES
+        # The whole output is kept for the special judge, but only this much is sent back
+        stdout_capture = request.get('stdout_capture_bytes')
+        if stdout_capture is None:
+            stdout_capture = output_limit
+
+        # Compiled once above; now every test case reuses the same binary
+        for index in range(request['case_count']):
+            directory = case_directory(checker)
+            try:
+                input_path = read_data(stdin, 'input', index, directory / 'input.txt')
+                if checker is not None:
+                    read_data(stdin, 'answer', index, directory / 'answer.txt')
+                result = run_case(command, input_path, time_limit_ms, wall_limit_ms, memory_limit_kb,
+                                  output_limit=output_limit, stderr_limit=stderr_limit, account=submitter)
+                if checker is not None and result['status'] == 'ok':
+                    result['checker'] = run_checker(checker, directory, result['stdout'])
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            stdout, stderr = result.pop('stdout'), result.pop('stderr')
+            emit({"type": "case", "case": index, **result}, stdout=memoryview(stdout)[:stdout_capture], stderr=stderr)
+
     except Exception as e:
-        print(f"An unexpected error occurred: {e}", file=sys.stderr)
+        emit({"type": "error", "message": f"An unexpected error occurred: {e}"})
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == '--reset':
+        reset()
+    else:
+        main()
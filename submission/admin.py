@@ -1,3 +1,20 @@
 from django.contrib import admin
+from judge.admin import message_rejudge_queued
+from judge.queue import enqueue_rejudge
+from .models import CodeSubmission
 
 # Register your models here.
+@admin.register(CodeSubmission)
+class CodeSubmissionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'problem', 'language', 'verdict', 'timestamp')
+    list_filter = ('verdict', 'language')
+    search_fields = ('user__username', 'problem__title')
+    raw_id_fields = ('problem', 'user')
+    actions = ['rejudge_submissions']
+
+    @admin.action(description="Rejudge selected submissions")
+    def rejudge_submissions(self, request, queryset):
+        # Custom runs have no problem and are never judged
+        rejudge = enqueue_rejudge(code_submissions=queryset.filter(problem__isnull=False), created_by=request.user,
+                                  description=f"Admin: {queryset.count()} selected submission(s)")
+        message_rejudge_queued(self, request, rejudge)
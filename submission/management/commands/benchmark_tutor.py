@@ -0,0 +1,63 @@
+import asyncio
+import random
+import statistics
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from problems.models import Problem
+from submission import tutor
+
+
+class Command(BaseCommand):
+    help = ('Sends a burst of AI tutor questions, many of them identical, through the fake model backend and '
+            'reports how many reached the model and how long users waited.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Questions in the burst.')
+        parser.add_argument('--distinct', type=int, default=20, help='Different (code, question) pairs among them.')
+        parser.add_argument('--users', type=int, default=200, help='Users asking.')
+        parser.add_argument('--delay-ms', type=int, default=1000, help="The fake model's answer time.")
+
+    def handle(self, *args, **options):
+        # An unsaved problem: nothing is written to the database
+        problem = Problem(id=0, title='Benchmark', description='Print the sum of two integers.')
+        with override_settings(AI_TUTOR_BACKEND='fake', AI_TUTOR_FAKE_DELAY_MS=options['delay_ms']):
+            cache.clear()
+            backend = tutor.get_backend()
+            calls = backend.calls
+            started = time.perf_counter()
+            results = asyncio.run(self._burst(problem, options))
+            elapsed = time.perf_counter() - started
+            calls = backend.calls - calls
+
+        answered = [seconds for outcome, seconds in results if outcome == 'answer']
+        busy = sum(1 for outcome, _ in results if outcome == 'busy')
+        failed = len(results) - len(answered) - busy
+        ordered = sorted(answered) or [0]
+        self.stdout.write(
+            f"{options['requests']} question(s) from {options['users']} user(s), {options['distinct']} distinct, "
+            f"model answering in {options['delay_ms']} ms:"
+        )
+        self.stdout.write(f'  model calls: {calls} (without caching and coalescing: {options["requests"]})')
+        self.stdout.write(f'  answered {len(answered)}, turned away (one question per user at a time) {busy}, '
+                          f'failed {failed}')
+        self.stdout.write(f'  wait p50 {statistics.median(ordered) * 1000:.0f} ms, '
+                          f'p95 {ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000:.0f} ms, '
+                          f'whole burst {elapsed:.1f}s')
+
+    async def _burst(self, problem, options):
+        rng = random.Random(0)
+
+        async def one(user_id, variant):
+            started = time.perf_counter()
+            try:
+                await tutor.ask(user_id, problem, f'print(sum(map(int, input().split())) + {variant})', 'Why WA?')
+            except tutor.TutorBusy:
+                return 'busy', 0
+            except tutor.TutorUnavailable:
+                return 'failed', 0
+            return 'answer', time.perf_counter() - started
+
+        return await asyncio.gather(*[one(rng.randrange(options['users']), rng.randrange(options['distinct']))
+                                      for _ in range(options['requests'])])
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submission', '0005_codesubmission_verdict_delete_solution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codesubmission',
+            name='case_results',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='codesubmission',
+            name='memory_kb',
+            field=models.PositiveIntegerField(blank=True, help_text='Peak resident memory of a test case in KB', null=True),
+        ),
+        migrations.AddField(
+            model_name='codesubmission',
+            name='time_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Peak CPU time of a test case in ms', null=True),
+        ),
+        migrations.AddField(
+            model_name='codesubmission',
+            name='wall_time_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Peak wall clock time of a test case in ms', null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0008_output_limit'),
+        ('submission', '0006_submission_measurements'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='codesubmission',
+            index=models.Index(fields=['user', 'problem', '-timestamp'], name='submission_user_problem_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='codesubmission',
+            index=models.Index(condition=models.Q(('verdict', 'Accepted')), fields=['user', 'problem', 'timestamp'], name='submission_accepted_idx'),
+        ),
+    ]
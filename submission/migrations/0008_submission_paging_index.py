@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0008_output_limit'),
+        ('submission', '0007_submission_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='codesubmission',
+            name='submission_user_problem_idx',
+        ),
+        migrations.AddIndex(
+            model_name='codesubmission',
+            index=models.Index(fields=['user', 'problem', '-timestamp', '-id'], name='submission_user_problem_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0010_default_time_limit'),
+        ('submission', '0008_submission_paging_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='codesubmission',
+            index=models.Index(condition=models.Q(('verdict', 'Accepted')), fields=['user', 'timestamp', 'problem'], name='submission_calendar_idx'),
+        ),
+    ]
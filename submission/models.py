@@ -13,7 +13,28 @@ class CodeSubmission(models.Model):
     input_data = models.TextField(null=True,blank=True)
     output_data = models.TextField(null=True,blank=True)
     verdict = models.CharField(max_length=100, blank=True)
+    # A short label like "Runtime Error"; the compiler's or the program's error output goes here
+    verdict_details = models.TextField(blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Measurements from the judge: the slowest / hungriest test case, plus every case that ran
+    time_ms = models.PositiveIntegerField(null=True, blank=True, help_text="Peak CPU time of a test case in ms")
+    wall_time_ms = models.PositiveIntegerField(null=True, blank=True, help_text="Peak wall clock time of a test case in ms")
+    memory_kb = models.PositiveIntegerField(null=True, blank=True, help_text="Peak resident memory of a test case in KB")
+    case_results = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            # A user's submissions to a problem, newest first, a page at a time (submission_list)
+            models.Index(fields=['user', 'problem', '-timestamp', '-id'], name='submission_user_problem_idx'),
+            # The earliest Accepted submission of a user to a problem (SolvedProblem.revoke,
+            # backfill_solve_stats); only Accepted rows are indexed
+            models.Index(fields=['user', 'problem', 'timestamp'], condition=models.Q(verdict="Accepted"),
+                         name='submission_accepted_idx'),
+            # A user's Accepted submissions in a date range (the profile calendar), with the
+            # problem in the index so it is counted without reading the rows
+            models.Index(fields=['user', 'timestamp', 'problem'], condition=models.Q(verdict="Accepted"),
+                         name='submission_calendar_idx'),
+        ]
 
     def __str__(self):
         return f'Submission by {self.user.username} for Problem {self.problem_id}'
\ No newline at end of file
@@ -1,3 +1,124 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from home.testing import QueryPlanMixin
+from problems.models import Problem
+from . import tutor
+from .models import CodeSubmission
 
-# Create your tests here.
+
+class SubmissionQueryTests(QueryPlanMixin, TestCase):
+    """
+    Query counts and plans of the submission pages a user keeps reloading.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='pw')
+        other = User.objects.create_user('bob', password='pw')
+        cls.problem = Problem.objects.create(title='Sum', description='a+b', difficulty='Easy')
+        other_problem = Problem.objects.create(title='Max', description='max', difficulty='Hard')
+        for user in (cls.user, other):
+            for problem in (cls.problem, other_problem):
+                for verdict in ('Wrong Answer', 'Accepted', 'Time Limit Exceeded'):
+                    CodeSubmission.objects.create(user=user, problem=problem, language='py', code='print(1)',
+                                                  verdict=verdict)
+        cls.submission = CodeSubmission.objects.filter(user=cls.user, problem=cls.problem).first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_submission_list(self):
+        # Problem, session, user, the user's permissions (two, for the navigation bar) and the submissions
+        with self.assertNumQueries(6) as queries:
+            response = self.client.get(reverse('submission_list', args=[self.problem.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['submissions']), 3)
+        sql = self.query_on(queries, 'submission_codesubmission')
+        self.assertUsesIndex(sql, 'submission_user_problem_idx')
+        # The code and outputs stay in the database until the result page is opened
+        self.assertNotIn('"submission_codesubmission"."code"', sql)
+        self.assertNotIn('"submission_codesubmission"."output_data"', sql)
+
+    @mock.patch('submission.views.SUBMISSIONS_PAGE_SIZE', 2)
+    def test_submission_list_pages(self):
+        url = reverse('submission_list', args=[self.problem.id])
+        seen = []
+        response = self.client.get(url)
+        while True:
+            seen += [submission.id for submission in response.context['submissions']]
+            if not response.context['next_cursor']:
+                break
+            with self.assertNumQueries(6) as queries:
+                response = self.client.get(url, {'before': response.context['next_cursor']})
+            self.assertUsesIndex(self.query_on(queries, 'submission_codesubmission'), 'submission_user_problem_idx')
+        expected = CodeSubmission.objects.filter(user=self.user, problem=self.problem).order_by('-timestamp', '-id')
+        self.assertEqual(seen, [submission.id for submission in expected])
+
+        # A broken cursor shows the first page
+        response = self.client.get(url, {'before': 'not-a-cursor'})
+        self.assertEqual(len(response.context['submissions']), 2)
+
+    def test_submission_status(self):
+        # Session, user, submission
+        with self.assertNumQueries(3) as queries:
+            response = self.client.get(reverse('submission_status', args=[self.submission.id]))
+        self.assertEqual(response.json()['verdict'], self.submission.verdict)
+        self.assertNoFullScan(self.query_on(queries, 'submission_codesubmission'), 'submission_codesubmission')
+
+
+@override_settings(AI_TUTOR_BACKEND='fake', AI_TUTOR_FAKE_DELAY_MS=200)
+class TutorTests(TestCase):
+    """
+    The AI tutor, answered by the fake backend.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='pw')
+        cls.problem = Problem.objects.create(title='Sum', description='Print a+b.', difficulty='Easy')
+
+    def setUp(self):
+        cache.clear()
+        self.calls = tutor.get_backend().calls
+
+    def model_calls(self):
+        return tutor.get_backend().calls - self.calls
+
+    def test_answers_are_cached(self):
+        self.client.force_login(self.user)
+        url = reverse('get_ai_suggestion', args=[self.problem.id])
+        first = self.client.post(url, {'code': 'print(1)\r\n', 'user_question': 'Is this  right?'})
+        self.assertEqual(first.status_code, 200)
+        self.assertContains(first, 'smallest possible input')
+        # The same code and question, written slightly differently
+        second = self.client.post(url, {'code': '\nprint(1)   ', 'user_question': ' is this right? '})
+        self.assertEqual(second.context['ai_response'], first.context['ai_response'])
+        self.assertEqual(self.model_calls(), 1)
+
+        self.client.post(url, {'code': 'print(2)', 'user_question': 'Is this right?'})
+        self.assertEqual(self.model_calls(), 2)
+
+    async def test_identical_questions_coalesce(self):
+        answers = await asyncio.gather(*[tutor.ask(user_id, self.problem, 'print(1)', 'Why?') for user_id in range(5)])
+        self.assertEqual(len(set(answers)), 1)
+        self.assertEqual(self.model_calls(), 1)
+
+    async def test_one_question_per_user_at_a_time(self):
+        results = await asyncio.gather(tutor.ask(1, self.problem, 'print(1)', 'Why?'),
+                                       tutor.ask(1, self.problem, 'print(2)', 'Why?'), return_exceptions=True)
+        # Whichever comes second is turned away
+        self.assertEqual(sorted(type(result).__name__ for result in results), ['TutorBusy', 'str'])
+        # The slot is free again once the answer is in
+        await tutor.ask(1, self.problem, 'print(2)', 'Why?')
+
+    async def test_model_failure(self):
+        with mock.patch.object(tutor.FakeTutor, 'generate', side_effect=RuntimeError('quota exceeded')):
+            with self.assertRaisesMessage(tutor.TutorUnavailable, 'quota exceeded'):
+                await tutor.ask(1, self.problem, 'print(1)', 'Why?')
+        # Failures are not cached
+        self.assertIn('Hint', await tutor.ask(1, self.problem, 'print(1)', 'Why?'))
@@ -0,0 +1,289 @@
+# submission/tutor.py
+#
+# The AI tutor behind "Get AI Suggestion". A model takes seconds to answer, so:
+#   - the view is async and the model is called from a small thread pool of its own
+#     (AI_TUTOR_MAX_CONCURRENT threads per process); served over ASGI (see the Dockerfile),
+#     a request waiting for its answer holds no web worker. Under WSGI (runserver) the
+#     request's worker thread still waits for it;
+#   - answers are cached by problem, code and question, with whitespace normalized,
+#     so the same hint is only asked for once;
+#   - a question that is already being answered is not asked again: requests in the
+#     same process wait for the same answer, other processes wait for it to show up in
+#     the cache (like the rebuild lock in home/cache.py);
+#   - each user can have at most AI_TUTOR_MAX_PER_USER questions in flight.
+# AI_TUTOR_BACKEND="fake" answers without calling any model, for tests and benchmarks.
+import asyncio
+import contextlib
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# How often a request waiting for another process's answer checks the cache
+WAIT_INTERVAL = 0.1
+
+SYSTEM_PROMPT = """
+    You are an expert AI Coding Tutor for an Online Judge platform. Your personality is encouraging, helpful, and Socratic. Your primary goal is to guide users to the optimal solution themselves, not to give it away.
+
+    **Your Task:**
+    Analyze the user's code for a given problem and respond to their specific question. Guide them step-by-step towards the most optimal solution in terms of time and space complexity.
+
+    **Strict Rules:**
+    1. NEVER give away the final solution code. Do not write full, correct solutions. You can provide small snippets to illustrate a concept, but never the complete answer.
+    2. NEVER reveal spoilers or talk about parts of the problem the user hasn't reached yet.
+    3. Adhere to the user's progress. Base your guidance strictly on the code and question provided.
+    4. If the user asks for the direct solution, gently refuse and reiterate your role as a tutor who helps them think.
+    5. Structure your response using markdown for clarity. Use bold text for key terms and code blocks for any small examples.
+
+    **Guidance Scenarios:**
+    * If the user has written no code: Help them understand the problem. Ask clarifying questions to break it down.
+    * If the user has a brute-force solution: Acknowledge their success first, then gently introduce the concept of optimization.
+    * If the user's code has errors: Identify the likely logical error without fixing it directly. Ask a question that leads them to the mistake.
+    * If the user has an optimal solution: Congratulate them. Only at this stage, you can show them their own code back but with best practices applied, commenting on the changes.
+    """
+
+
+class TutorBusy(Exception):
+    """The user already waits for as many answers as allowed."""
+
+
+class TutorUnavailable(Exception):
+    """No answer: the tutor isn't configured, or the model failed or took too long."""
+
+
+class GeminiTutor:
+    name = 'gemini'
+
+    def __init__(self):
+        if not settings.GOOGLE_API_KEY:
+            raise TutorUnavailable('API Key not configured.')
+        import google.generativeai as genai
+        # Configured once per process rather than on every request
+        genai.configure(api_key=settings.GOOGLE_API_KEY)
+        self.model = genai.GenerativeModel(settings.AI_TUTOR_MODEL)
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt, request_options={'timeout': settings.AI_TUTOR_TIMEOUT_SECONDS})
+        return response.text
+
+
+class FakeTutor:
+    """
+    Answers after AI_TUTOR_FAKE_DELAY_MS without calling anything. Counts the prompts
+    it was given, so tests and benchmarks can see how many reached "the model".
+    """
+    name = 'fake'
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        with self._lock:
+            self.calls += 1
+        time.sleep(settings.AI_TUTOR_FAKE_DELAY_MS / 1000)
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        return f'**Hint {digest}:** what does your code do on the smallest possible input?'
+
+
+BACKENDS = {
+    'gemini': GeminiTutor,
+    'fake': FakeTutor,
+}
+
+_backend = None
+_executor = None
+_setup_lock = threading.Lock()
+
+# Answers being worked out in this process, by cache key
+_inflight = {}
+# Reentrant: a future that is already done runs its done-callback (which takes the
+# lock) right away, in the thread adding it
+_inflight_lock = threading.RLock()
+
+
+def get_backend():
+    global _backend
+    with _setup_lock:
+        if _backend is None or _backend.name != settings.AI_TUTOR_BACKEND:
+            _backend = BACKENDS[settings.AI_TUTOR_BACKEND]()
+        return _backend
+
+
+def _get_executor():
+    global _executor
+    with _setup_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(settings.AI_TUTOR_MAX_CONCURRENT, thread_name_prefix='ai-tutor')
+        return _executor
+
+
+def normalize_code(code):
+    # Line endings, trailing spaces and blank lines around the code don't change the hint
+    return '\n'.join(line.rstrip() for line in code.replace('\r\n', '\n').split('\n')).strip('\n')
+
+
+def normalize_question(question):
+    return ' '.join(question.split())
+
+
+def cache_key(problem, code, question):
+    # The statement is part of the key, so editing a problem retires its old hints
+    digest = hashlib.sha256()
+    for part in (settings.AI_TUTOR_BACKEND, settings.AI_TUTOR_MODEL, str(problem.id), problem.description,
+                 code, question.casefold()):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return f'ai-tutor:{digest.hexdigest()}'
+
+
+def build_prompt(problem, code, question):
+    return f"""
+    {SYSTEM_PROMPT}
+
+    ---
+    **Problem Statement:**
+    {problem.description}
+
+    ---
+    **User's Code:**
+    ```
+    {code}
+    ```
+
+    ---
+    **User's Question:**
+    "{question}"
+    """
+
+
+def _answer(key, backend, prompt):
+    # Runs on the tutor's thread pool
+    lock_key = f'{key}:lock'
+    owner = cache.add(lock_key, True, settings.AI_TUTOR_TIMEOUT_SECONDS)
+    if not owner:
+        # Another process is asking the model the same thing: wait for its answer
+        deadline = time.monotonic() + settings.AI_TUTOR_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            answer = cache.get(key)
+            if answer is not None:
+                return answer
+            if cache.get(lock_key) is None:
+                # It failed; ask ourselves
+                break
+    try:
+        answer = backend.generate(prompt)
+    except Exception as e:
+        logger.exception("The AI tutor's model failed")
+        raise TutorUnavailable(f'An error occurred while communicating with the AI model: {e}')
+    finally:
+        if owner:
+            cache.delete(lock_key)
+    cache.set(key, answer, settings.AI_TUTOR_CACHE_SECONDS)
+    return answer
+
+
+def _forget(key, future):
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def _start(key, backend, prompt):
+    # The answer being worked out for `key`, asking for it unless that is already happening
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is None:
+            future = _get_executor().submit(_answer, key, backend, prompt)
+            _inflight[key] = future
+            future.add_done_callback(lambda done: _forget(key, done))
+        return future
+
+
+def _wait_for(future):
+    """
+    An asyncio future that follows the (thread pool) `future`. Unlike wrap_future,
+    giving up on it never cancels `future`, which other requests may be waiting for.
+    """
+    loop = asyncio.get_running_loop()
+    waiter = loop.create_future()
+
+    def settle(done):
+        if waiter.done():
+            return
+        if done.exception() is not None:
+            waiter.set_exception(done.exception())
+        else:
+            waiter.set_result(done.result())
+
+    def on_done(done):
+        try:
+            loop.call_soon_threadsafe(settle, done)
+        except RuntimeError:
+            # The request that was waiting has finished and its event loop is closed
+            pass
+
+    future.add_done_callback(on_done)
+    return waiter
+
+
+def _take_slot(key):
+    # Sync on purpose: the cache's own incr is atomic (BaseCache.aincr is a get and a set)
+    timeout = settings.AI_TUTOR_TIMEOUT_SECONDS * 2
+    cache.add(key, 0, timeout)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Expired just now
+        cache.set(key, 1, timeout)
+        count = 1
+    if count > settings.AI_TUTOR_MAX_PER_USER:
+        cache.decr(key)
+        return False
+    return True
+
+
+def _release_slot(key):
+    with contextlib.suppress(ValueError):
+        cache.decr(key)
+
+
+@contextlib.asynccontextmanager
+async def _user_slot(user_id):
+    # Counted in the cache so the limit holds across processes; the count expires on its
+    # own should a process die while holding a slot
+    key = f'ai-tutor:user:{user_id}'
+    if not await sync_to_async(_take_slot)(key):
+        raise TutorBusy('You are already waiting for a hint. Please wait for it before asking again.')
+    try:
+        yield
+    finally:
+        await sync_to_async(_release_slot)(key)
+
+
+async def ask(user_id, problem, code, question):
+    """
+    The tutor's answer (markdown) to `question` about `code` for `problem`. Raises
+    TutorBusy when the user already waits for AI_TUTOR_MAX_PER_USER answers, and
+    TutorUnavailable when no answer can be had.
+    """
+    code, question = normalize_code(code), normalize_question(question)
+    key = cache_key(problem, code, question)
+    answer = await cache.aget(key)
+    if answer is not None:
+        return answer
+
+    backend = get_backend()
+    async with _user_slot(user_id):
+        future = _start(key, backend, build_prompt(problem, code, question))
+        try:
+            return await asyncio.wait_for(_wait_for(future), settings.AI_TUTOR_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise TutorUnavailable('The AI tutor is taking too long to answer. Please try again in a moment.')
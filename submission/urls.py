@@ -10,6 +10,9 @@ urlpatterns = [
     
     # URL for displaying the final solution result
     path('result/<uuid:submission_id>/', views.submission_result, name='submission_result'),
+
+    # URL polled by the result page until the judge has produced a verdict
+    path('result/<uuid:submission_id>/status/', views.submission_status, name='submission_status'),
     
     #URL for handling AI suggestions
     path('ai/suggest/<int:problem_id>/', views.get_ai_suggestion, name='get_ai_suggestion'),
@@ -1,19 +1,20 @@
 # submission/views.py
 from django.shortcuts import render
-from django.conf import settings
-import os
-import uuid
-import subprocess
-from pathlib import Path
+from django.http import Http404, JsonResponse
+from asgiref.sync import sync_to_async
 from .forms import CodeSubmissionForm
 from django.contrib.auth.decorators import login_required
 from problems.models import Problem
 from .models import CodeSubmission
 from django.shortcuts import get_object_or_404, redirect
-import google.generativeai as genai
-from dotenv import load_dotenv
-import docker
-import time
+from judge.sandbox import run_code
+from judge.engine import QUEUED, PENDING_VERDICTS, problem_limits
+from judge.queue import enqueue_code_submission
+from home.pagination import keyset_page
+from . import tutor
+
+# Submissions per page of a submission list
+SUBMISSIONS_PAGE_SIZE = 50
 
 @login_required
 def submit_code(request):
@@ -26,8 +27,15 @@ def submit_code(request):
             # 2. Assign the logged-in user to the submission
             submission.user = request.user
 
+            # Custom runs get the same limits as a real submission to the problem
+            limits = {}
+            if submission.problem is not None:
+                memory_limit, time_limit_ms = problem_limits(submission.problem, submission.language)
+                limits = {"memory_limit": memory_limit, "time_limit_ms": time_limit_ms,
+                          "output_limit": submission.problem.output_limit}
+
             output = run_code(
-                submission.language, submission.code, submission.input_data
+                submission.language, submission.code, submission.input_data, **limits
             )
 
             submission.output_data = output
@@ -61,35 +69,13 @@ def submit_solution(request, problem_id):
             submission.user = request.user
             submission.problem = problem # Link the submission to the problem
             
-            # Determine the final verdict by running against all official test cases
-            final_verdict = "Accepted" # Assume success initially
-            test_cases = problem.test_cases.all()
-
-            if not test_cases.exists():
-                final_verdict = "System Error: No Test Cases"
-            else:
-                for case in test_cases:
-                    # Use your existing run_code utility for each test case
-                    output = run_code(submission.language, submission.code, case.input_data, problem.memory_limit)
-                    
-                    # Check for execution errors first
-                    if "Error" in output or "Timed Out" in output:
-                        final_verdict = output # Set verdict to the error message
-                        break # Stop checking other test cases
-
-                    # Check if the code's output matches the test case's expected output
-                    if output.strip() != case.output_data.strip():
-                        final_verdict = "Wrong Answer"
-                        break # Stop on the first wrong answer
-            
-            # Add the final verdict to our submission object
-            submission.verdict = final_verdict
-            
-            # Now, save the complete submission object to the database
-            # The UUID for the 'id' will be generated automatically here
+            # Save the submission right away as "Queued" so the result page can show it,
+            # then hand it to the judge workers instead of running it inside this request
+            submission.verdict = QUEUED
             submission.save()
+            enqueue_code_submission(submission)
 
-            # Redirect to the result page, passing the new submission's ID
+            # Redirect to the result page, which polls until the verdict is ready
             return redirect('submission_result', submission_id=submission.id)
 
     # If the request is not POST, just redirect back to the problem page
@@ -101,75 +87,42 @@ def submit_solution(request, problem_id):
 def submission_result(request, submission_id):
     # We fetch a CodeSubmission object instead of a Solution object
     submission = get_object_or_404(CodeSubmission, id=submission_id)
-    return render(request, 'submission/solution_result.html', {'submission': submission})
+    context = {
+        'submission': submission,
+        'is_pending': submission.verdict in PENDING_VERDICTS,
+    }
+    return render(request, 'submission/solution_result.html', context)
 
 @login_required
-def get_ai_suggestion(request, problem_id):
-    # --- 1. SETUP ---
-    problem = get_object_or_404(Problem, id=problem_id)
-    language = request.POST.get('language', 'py')
-    
-    # Load the API key from your .env file
-    load_dotenv()
-    api_key = os.getenv('GOOGLE_API_KEY')
-    if not api_key:
-        # Handle the error case where the API key is not found
-        return render(request, 'submission/ai_response.html', {'error': 'API Key not configured.'})
-    
-    genai.configure(api_key=api_key)
+def submission_status(request, submission_id):
+    # Lightweight endpoint polled by the result page while the judge is working
+    submission = get_object_or_404(CodeSubmission.objects.only('verdict', 'time_ms', 'memory_kb'), id=submission_id)
+    return JsonResponse({
+        'verdict': submission.verdict,
+        'is_pending': submission.verdict in PENDING_VERDICTS,
+        'time_ms': submission.time_ms,
+        'memory_kb': submission.memory_kb,
+    })
 
-    # --- 2. GET DATA FROM FORM ---
+@login_required
+async def get_ai_suggestion(request, problem_id):
+    # The model is asked off the web workers, so a slow answer holds no worker (see submission/tutor.py)
+    try:
+        problem = await Problem.objects.only('id', 'title', 'description').aget(id=problem_id)
+    except Problem.DoesNotExist:
+        raise Http404
+    language = request.POST.get('language', 'py')
     user_code = request.POST.get('code', '')
     user_question = request.POST.get('user_question', '')
-    
-    # --- 3. DEFINE THE GUIDING PROMPT ---
-    # This is the improved prompt we created earlier
-    system_prompt = """
-    You are an expert AI Coding Tutor for an Online Judge platform. Your personality is encouraging, helpful, and Socratic. Your primary goal is to guide users to the optimal solution themselves, not to give it away.
-
-    **Your Task:**
-    Analyze the user's code for a given problem and respond to their specific question. Guide them step-by-step towards the most optimal solution in terms of time and space complexity.
-
-    **Strict Rules:**
-    1. NEVER give away the final solution code. Do not write full, correct solutions. You can provide small snippets to illustrate a concept, but never the complete answer.
-    2. NEVER reveal spoilers or talk about parts of the problem the user hasn't reached yet.
-    3. Adhere to the user's progress. Base your guidance strictly on the code and question provided.
-    4. If the user asks for the direct solution, gently refuse and reiterate your role as a tutor who helps them think.
-    5. Structure your response using markdown for clarity. Use bold text for key terms and code blocks for any small examples.
-
-    **Guidance Scenarios:**
-    * If the user has written no code: Help them understand the problem. Ask clarifying questions to break it down.
-    * If the user has a brute-force solution: Acknowledge their success first, then gently introduce the concept of optimization.
-    * If the user's code has errors: Identify the likely logical error without fixing it directly. Ask a question that leads them to the mistake.
-    * If the user has an optimal solution: Congratulate them. Only at this stage, you can show them their own code back but with best practices applied, commenting on the changes.
-    """
-
-    # --- 4. CONSTRUCT THE FINAL PROMPT FOR THE AI ---
-    final_prompt = f"""
-    {system_prompt}
-
-    ---
-    **Problem Statement:**
-    {problem.description}
-
-    ---
-    **User's Code:**
-    ```
-    {user_code}
-    ```
-
-    ---
-    **User's Question:**
-    "{user_question}"
-    """
-    
-    # --- 5. CALL THE API AND RENDER THE RESPONSE ---
+    user = await request.auser()
+
+    status = 200
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash-latest')
-        response = model.generate_content(final_prompt)
-        ai_response = response.text
-    except Exception as e:
-        ai_response = f"An error occurred while communicating with the AI model: {e}"
+        ai_response = await tutor.ask(user.id, problem, user_code, user_question)
+    except tutor.TutorBusy as e:
+        ai_response, status = str(e), 429
+    except tutor.TutorUnavailable as e:
+        ai_response = str(e)
 
     context = {
         'problem': problem,
@@ -178,8 +131,8 @@ def get_ai_suggestion(request, problem_id):
         'ai_response': ai_response,
         'language': language,
     }
-
-    return render(request, 'submission/ai_response.html', context)
+    # Rendering reads the session user and permissions, which are sync database queries
+    return await sync_to_async(render)(request, 'submission/ai_response.html', context, status=status)
 
 def submission_list(request, problem_id):
     # Get the specific problem object
@@ -188,59 +141,21 @@ def submission_list(request, problem_id):
     # Filter submissions to find ones that match:
     # 1. The current logged-in user
     # 2. The specific problem
-    # Order them by the most recent submission first
+    # Only the columns of the table are loaded; the code and outputs are on the result page
     submissions = CodeSubmission.objects.filter(
         user=request.user, 
         problem=problem
-    ).order_by('-timestamp')
+    ).only('id', 'timestamp', 'language', 'verdict', 'time_ms', 'memory_kb')
+
+    # One page at a time, the most recent submission first
+    submissions, next_cursor = keyset_page(submissions, 'timestamp', request.GET.get('before', ''),
+                                           SUBMISSIONS_PAGE_SIZE)
     
     context = {
         'problem': problem,
         'submissions': submissions,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('before'),
     }
     
     return render(request, 'submission/submission_list.html', context)
-
-def run_code(language, code, input_data, memory_limit=256):
-    # Get the sandbox image name from the environment variables
-    image_name = os.getenv('DOCKER_SANDBOX_IMAGE_NAME', 'onlinejudge-sandbox:latest')
-    if not image_name:
-        return "Error: Sandbox image is not configured."
-
-    # Prepare the data to be sent to the container's standard input
-    stdin_payload = f"{language}\n{code}---!!!INPUT_DELIMITER!!!---{input_data}"
-
-    try:
-        # Use a direct 'docker run' command. This is faster and avoids API timeouts.
-        result = subprocess.run(
-            [
-                'docker', 'run',
-                '--rm',         # Automatically remove the container when it exits
-                '-i',           # Keep STDIN open to send our payload
-                '--network', 'none',
-                '--memory', f'{memory_limit}m',
-                '--cpus', '0.5',
-                image_name,
-            ],
-            input=stdin_payload,
-            capture_output=True,
-            text=True,
-            timeout=15 # A generous timeout for the entire process
-        )
-        
-        # Exit code 137 from Docker means the container was killed for using too much memory.
-        if result.returncode == 137:
-            return "Memory Limit Exceeded"
-        
-        # If the runner script printed anything to stderr, it's a compilation or runtime error.
-        if result.stderr:
-            return f"Execution Error:\n{result.stderr}"
-
-        # If everything is fine, the output is in stdout.
-        return result.stdout
-
-    except subprocess.TimeoutExpired:
-        # If the entire 'docker run' process takes too long, it's a TLE.
-        return "Time Limit Exceeded"
-    except Exception as e:
-        return f"An unexpected error occurred: {e}"
\ No newline at end of file
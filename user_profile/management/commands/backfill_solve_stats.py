@@ -0,0 +1,62 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from submission.models import CodeSubmission
+from user_profile.models import LeaderboardScore, SolvedProblem, UserSolveStats
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds every user\'s solved problems, solve counts and leaderboard scores from their Accepted '
+            'submissions. Safe to run at any time; run it nightly (e.g. from cron) to fix any drift.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per query.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # The first Accepted submission of every (user, problem) pair
+        wanted = {}
+        accepted = (CodeSubmission.objects.filter(verdict="Accepted", problem__isnull=False)
+                    .order_by('timestamp')
+                    .values_list('pk', 'user_id', 'problem_id', 'problem__difficulty', 'timestamp'))
+        for pk, user_id, problem_id, difficulty, timestamp in accepted.iterator(chunk_size=batch_size):
+            wanted.setdefault((user_id, problem_id), (pk, difficulty, timestamp))
+
+        with transaction.atomic():
+            existing = {(solved.user_id, solved.problem_id): solved for solved in SolvedProblem.objects.all()}
+
+            stale = [solved.pk for key, solved in existing.items() if key not in wanted]
+            SolvedProblem.objects.filter(pk__in=stale).delete()
+
+            created, changed = [], []
+            for (user_id, problem_id), (pk, difficulty, timestamp) in wanted.items():
+                solved = existing.get((user_id, problem_id))
+                if solved is None:
+                    created.append(SolvedProblem(user_id=user_id, problem_id=problem_id, submission_id=pk,
+                                                 difficulty=difficulty, solved_at=timestamp))
+                elif (solved.submission_id, solved.difficulty, solved.solved_at) != (pk, difficulty, timestamp):
+                    solved.submission_id, solved.difficulty, solved.solved_at = pk, difficulty, timestamp
+                    changed.append(solved)
+            SolvedProblem.objects.bulk_create(created, batch_size=batch_size)
+            SolvedProblem.objects.bulk_update(changed, ['submission', 'difficulty', 'solved_at'], batch_size=batch_size)
+
+            # Recount everyone from the solved set in one query
+            counts = {}
+            for user_id, difficulty, count in (SolvedProblem.objects.values_list('user_id', 'difficulty')
+                                               .annotate(count=Count('id')).order_by()):
+                counts.setdefault(user_id, {})[difficulty] = count
+            UserSolveStats.objects.all().delete()
+            stats = []
+            for user_id, user_counts in counts.items():
+                solved = (user_counts.get('Easy', 0), user_counts.get('Medium', 0), user_counts.get('Hard', 0))
+                stats.append(UserSolveStats(user_id=user_id, solved_easy=solved[0], solved_medium=solved[1],
+                                            solved_hard=solved[2], score=UserSolveStats.compute_score(*solved)))
+            UserSolveStats.objects.bulk_create(stats, batch_size=batch_size)
+            LeaderboardScore.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(wanted)} solved problem(s) for {len(counts)} of {User.objects.count()} user(s): '
+            f'{len(created)} added, {len(changed)} updated, {len(stale)} removed.'
+        ))
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:51
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def compute_scores(apps, schema_editor):
+    # Scores for the stats that already exist; the model methods aren't available here
+    UserSolveStats = apps.get_model('user_profile', 'UserSolveStats')
+    LeaderboardScore = apps.get_model('user_profile', 'LeaderboardScore')
+    for stats in UserSolveStats.objects.all():
+        weight = 1 if stats.solved_easy else 3 if stats.solved_medium else 5 if stats.solved_hard else 0
+        stats.score = weight * (stats.solved_easy + stats.solved_medium + stats.solved_hard)
+        stats.save(update_fields=['score'])
+    LeaderboardScore.objects.bulk_create([
+        LeaderboardScore(score=score, users=users)
+        for score, users in (UserSolveStats.objects.filter(score__gt=0).values_list('score')
+                             .annotate(users=Count('id')).order_by())
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0002_solve_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardScore',
+            fields=[
+                ('score', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('users', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='usersolvestats',
+            name='score',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='usersolvestats',
+            index=models.Index(fields=['-score', 'user'], name='solve_stats_rank_idx'),
+        ),
+        migrations.RunPython(compute_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 22:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0003_leaderboard'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='solvedproblem',
+            name='solved_problem_calendar_idx',
+        ),
+    ]
@@ -15,31 +15,31 @@ class  UserProfile(models.Model):
     def __str__(self):
         return f'{self.user.username} Profile'
     
+    # Solve counts come from the user's UserSolveStats row (kept up to date by the
+    # judge's verdicts, see user_profile/signals.py) instead of counting submissions
+    @property
+    def solve_stats(self):
+        try:
+            return self.user.solve_stats
+        except UserSolveStats.DoesNotExist:
+            # Nothing solved yet (or the stats haven't been backfilled)
+            return UserSolveStats(user=self.user)
+
     @property
     def solved_easy(self):
-        return CodeSubmission.objects.filter(
-            user=self.user, 
-            verdict="Accepted",
-            problem__difficulty='Easy'
-        ).values('problem').distinct().count()
+        return self.solve_stats.solved_easy
 
     @property
     def solved_medium(self):
-        return CodeSubmission.objects.filter(
-            user=self.user, 
-            verdict="Accepted",
-            problem__difficulty='Medium'
-        ).values('problem').distinct().count()
+        return self.solve_stats.solved_medium
 
     @property
     def solved_hard(self):
-        return CodeSubmission.objects.filter(
-            user=self.user, 
-            verdict="Accepted",
-            problem__difficulty='Hard'
-        ).values('problem').distinct().count()
-        
+        return self.solve_stats.solved_hard
+
     def get_submission_calendar(self):
+        # Distinct problems with an Accepted submission on each of the last 31 days,
+        # solved before or not
         end_date = timezone.now()
         start_date = end_date - datetime.timedelta(days=31)
 
@@ -52,5 +52,175 @@ class  UserProfile(models.Model):
         ).values('day').annotate(
             count=Count('problem', distinct=True)
         ).values('day', 'count')
-        
-        return {item['day'].date(): item['count'] for item in submissions}
\ No newline at end of file
+
+        return {item['day'].date(): item['count'] for item in submissions}
+
+
+# The problems a user has solved, one row per problem: the first Accepted submission
+# and when it was judged. The difficulty is copied so the stats can be recounted
+# without touching the problems table.
+class SolvedProblem(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='solved_problems')
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='solved_by')
+    submission = models.ForeignKey(CodeSubmission, on_delete=models.SET_NULL, null=True, blank=True)
+    difficulty = models.CharField(max_length=10, choices=Problem.DIFFICULTY_CHOICES)
+    solved_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'problem'], name='solved_problem_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} solved {self.problem_id}'
+
+    @classmethod
+    def record(cls, submission):
+        """
+        Adds the submission's problem to its user's solved set if it isn't there yet.
+        Returns True if this is the user's first Accepted submission for the problem.
+        """
+        solved, created = cls.objects.get_or_create(
+            user_id=submission.user_id,
+            problem_id=submission.problem_id,
+            defaults={
+                'submission': submission,
+                'difficulty': submission.problem.difficulty,
+                'solved_at': submission.timestamp,
+            },
+        )
+        if created:
+            UserSolveStats.add(submission.user_id, solved.difficulty, 1)
+        return created
+
+    @classmethod
+    def revoke(cls, user_id, problem_id):
+        """
+        Re-derives one entry of the solved set after an Accepted submission was rejudged
+        or deleted: the next earliest Accepted submission takes its place, if any.
+        """
+        cls.objects.filter(user_id=user_id, problem_id=problem_id).delete()
+        earliest = (CodeSubmission.objects.filter(user_id=user_id, problem_id=problem_id, verdict="Accepted")
+                    .select_related('problem').order_by('timestamp').first())
+        if earliest is not None:
+            cls.record(earliest)
+
+
+# Denormalized solve counts per user, one row each, so a profile or leaderboard never
+# has to count a user's submissions. The score is what the leaderboard ranks by.
+class UserSolveStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='solve_stats')
+    solved_easy = models.PositiveIntegerField(default=0)
+    solved_medium = models.PositiveIntegerField(default=0)
+    solved_hard = models.PositiveIntegerField(default=0)
+    score = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "User solve stats"
+        indexes = [
+            # Leaderboard pages: highest score first, ties in a fixed order for keyset pagination
+            models.Index(fields=['-score', 'user'], name='solve_stats_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} solve stats'
+
+    @property
+    def solved_total(self):
+        return self.solved_easy + self.solved_medium + self.solved_hard
+
+    @staticmethod
+    def compute_score(solved_easy, solved_medium, solved_hard):
+        # The weighted score the leaderboard has always ranked by: the problem count, weighted
+        # by the easiest difficulty the user has solved anything in
+        if solved_easy:
+            weight = 1
+        elif solved_medium:
+            weight = 3
+        elif solved_hard:
+            weight = 5
+        else:
+            weight = 0
+        return weight * (solved_easy + solved_medium + solved_hard)
+
+    @classmethod
+    def add(cls, user_id, difficulty, amount):
+        # A single UPDATE, so concurrent verdicts for the same user don't lose increments
+        field = f'solved_{difficulty.lower()}'
+        updated = cls.objects.filter(user_id=user_id).update(
+            **{field: models.F(field) + amount, 'updated_at': timezone.now()})
+        if updated:
+            cls.update_score(user_id)
+        elif amount > 0:
+            # First solve of this user: count from the solved set, which already includes it
+            cls.recount(user_id)
+
+    @classmethod
+    def recount(cls, user_id):
+        counts = dict(SolvedProblem.objects.filter(user_id=user_id)
+                      .values_list('difficulty').annotate(count=Count('id')))
+        stats, _ = cls.objects.update_or_create(user_id=user_id, defaults={
+            'solved_easy': counts.get('Easy', 0),
+            'solved_medium': counts.get('Medium', 0),
+            'solved_hard': counts.get('Hard', 0),
+        })
+        cls.update_score(user_id)
+        return stats
+
+    @classmethod
+    def update_score(cls, user_id, attempts=5):
+        """
+        Recomputes a user's score from their counts and moves them to the new score's
+        LeaderboardScore row. The score is only written if nobody else changed it since
+        it was read, so concurrent verdicts for one user never move them twice.
+        """
+        for _ in range(attempts):
+            row = (cls.objects.filter(user_id=user_id)
+                   .values_list('solved_easy', 'solved_medium', 'solved_hard', 'score').first())
+            if row is None:
+                return
+            *counts, old_score = row
+            new_score = cls.compute_score(*counts)
+            if new_score == old_score:
+                return
+            if cls.objects.filter(user_id=user_id, score=old_score).update(score=new_score):
+                LeaderboardScore.move(old_score, new_score)
+                return
+        # Lost every race; backfill_solve_stats puts it right
+
+
+# How many users have each leaderboard score (above 0). There are only as many rows as
+# distinct scores, so a user's dense rank is one small count instead of a scan of every user.
+class LeaderboardScore(models.Model):
+    score = models.PositiveIntegerField(primary_key=True)
+    # Not a PositiveIntegerField: drift must never make a verdict fail, the nightly rebuild fixes it
+    users = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.users} user(s) with score {self.score}'
+
+    @classmethod
+    def move(cls, old_score, new_score):
+        if old_score > 0:
+            cls.objects.filter(score=old_score).update(users=models.F('users') - 1)
+        if new_score > 0:
+            if not cls.objects.filter(score=new_score).update(users=models.F('users') + 1):
+                _, created = cls.objects.get_or_create(score=new_score, defaults={'users': 1})
+                if not created:
+                    cls.objects.filter(score=new_score).update(users=models.F('users') + 1)
+
+    @classmethod
+    def dense_rank(cls, score):
+        # Users with equal scores share a rank, and the next score down is the next rank
+        return cls.objects.filter(score__gt=score, users__gt=0).count() + 1
+
+    @classmethod
+    def rebuild(cls):
+        # Recounts every score from UserSolveStats
+        cls.objects.all().delete()
+        cls.objects.bulk_create([
+            cls(score=score, users=users)
+            for score, users in (UserSolveStats.objects.filter(score__gt=0).values_list('score')
+                                 .annotate(users=Count('id')).order_by())
+        ])
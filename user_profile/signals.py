@@ -1,12 +1,55 @@
 # In profile/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import UserProfile
+from judge.engine import QUEUED, RUNNING
+from problems.models import Problem
+from submission.models import CodeSubmission
+from .models import SolvedProblem, UserProfile, UserSolveStats
 
 # This function will run every time a User object is saved
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
     # If a new user was created...
     if created:
-        UserProfile.objects.create(user=instance)
\ No newline at end of file
+        UserProfile.objects.create(user=instance)
+
+
+# Keeps the solved set and solve counts up to date as verdicts come in
+@receiver(post_save, sender=CodeSubmission)
+def update_solved_problems(sender, instance, **kwargs):
+    # Custom runs have no problem, and a submission still being judged hasn't changed anything yet
+    if instance.problem_id is None or instance.verdict in (QUEUED, RUNNING):
+        return
+    if instance.verdict == "Accepted":
+        SolvedProblem.record(instance)
+    elif SolvedProblem.objects.filter(submission=instance).exists():
+        # A rejudge took away the Accepted verdict this solve was counted from
+        SolvedProblem.revoke(instance.user_id, instance.problem_id)
+
+
+@receiver(post_delete, sender=CodeSubmission)
+def remove_deleted_solve(sender, instance, **kwargs):
+    # Deleting the submission a solve was counted from leaves it without one
+    if instance.problem_id and instance.verdict == "Accepted":
+        if SolvedProblem.objects.filter(user_id=instance.user_id, problem_id=instance.problem_id,
+                                        submission__isnull=True).exists():
+            SolvedProblem.revoke(instance.user_id, instance.problem_id)
+
+
+@receiver(post_delete, sender=SolvedProblem)
+def uncount_solve(sender, instance, **kwargs):
+    UserSolveStats.add(instance.user_id, instance.difficulty, -1)
+
+
+@receiver(post_save, sender=Problem)
+def update_solve_difficulty(sender, instance, created, **kwargs):
+    if created:
+        return
+    # A problem moved to another difficulty: recount everyone who solved it
+    changed = SolvedProblem.objects.filter(problem=instance).exclude(difficulty=instance.difficulty)
+    user_ids = list(changed.values_list('user_id', flat=True))
+    if user_ids:
+        changed.update(difficulty=instance.difficulty)
+        for user_id in user_ids:
+            UserSolveStats.recount(user_id)
@@ -1,3 +1,122 @@
+import datetime
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from home.testing import QueryPlanMixin
+from problems.models import Problem
+from submission.models import CodeSubmission
+from . import views
+from .models import LeaderboardScore, SolvedProblem
 
-# Create your tests here.
+
+class ProfileQueryTests(QueryPlanMixin, TestCase):
+    """
+    Query counts and plans of the profile and leaderboard pages and of the solve bookkeeping.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', password='pw')
+        cls.others = [User.objects.create_user(f'user{i}', password='pw') for i in range(3)]
+        cls.problems = [Problem.objects.create(title=f'P{i}', description='-', difficulty=difficulty)
+                        for i, difficulty in enumerate(['Easy', 'Medium', 'Hard'])]
+        for user in [cls.user, *cls.others]:
+            for problem in cls.problems:
+                for verdict in ('Wrong Answer', 'Accepted', 'Accepted'):
+                    CodeSubmission.objects.create(user=user, problem=problem, language='py', code='print(1)',
+                                                  verdict=verdict)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_profile_view(self):
+        # Session, user, the profile's user with profile and solve counts, the calendar
+        # and the viewer's permissions (two, for the navigation bar)
+        with self.assertNumQueries(6) as queries:
+            response = self.client.get(reverse('profile_view', args=[self.user.username]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['profile'].solved_hard, 1)
+        # Grouped by day, which needs a sort of the (few) rows found
+        self.assertUsesIndex(self.query_on(queries, 'submission_codesubmission'), 'submission_calendar_idx',
+                             sorts=True)
+
+    def test_submission_calendar(self):
+        # Every problem a day saw accepted counts once that day, whether or not it was solved before
+        first, second = self.problems[:2]
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        for problem in (first, first, second):
+            submission = CodeSubmission.objects.create(user=self.user, problem=problem, language='py',
+                                                       code='print(1)', verdict='Accepted')
+            CodeSubmission.objects.filter(pk=submission.pk).update(timestamp=yesterday)
+        calendar = self.user.userprofile.get_submission_calendar()
+        self.assertEqual(calendar, {timezone.localdate(): 3, timezone.localdate(yesterday): 2})
+
+    def test_leaderboard_view(self):
+        url = reverse('leaderboard')
+        # Session, user, the first page and its first rank, the viewer's score and rank, and permissions (two)
+        with self.assertNumQueries(8) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['my_rank'], 1)
+        page = self.query_on(queries, 'user_profile_usersolvestats',
+                             contains='ORDER BY "user_profile_usersolvestats"."score" DESC')
+        self.assertUsesIndex(page, 'solve_stats_rank_idx')
+        # The first page is cached
+        with self.assertNumQueries(6):
+            self.client.get(url)
+
+    def test_revoke_uses_accepted_index(self):
+        # A rejudged Accepted submission: the next earliest Accepted one becomes the solve
+        problem = self.problems[0]
+        with CaptureQueriesContext(connection) as queries:
+            SolvedProblem.revoke(self.user.id, problem.id)
+        self.assertUsesIndex(self.query_on(queries, 'submission_codesubmission'), 'submission_accepted_idx')
+        self.assertTrue(SolvedProblem.objects.filter(user=self.user, problem=problem).exists())
+
+
+class LeaderboardTests(TestCase):
+    """
+    Dense ranks from the number of users per score, kept up to date as scores change.
+    """
+
+    def test_move(self):
+        LeaderboardScore.move(0, 3)
+        LeaderboardScore.move(0, 3)
+        LeaderboardScore.move(3, 5)
+        LeaderboardScore.move(5, 0)
+        self.assertEqual(dict(LeaderboardScore.objects.values_list('score', 'users')), {3: 1, 5: 0})
+
+    def test_dense_rank(self):
+        LeaderboardScore.objects.bulk_create([LeaderboardScore(score=10, users=2), LeaderboardScore(score=7, users=1),
+                                              LeaderboardScore(score=5, users=0)])
+        # Tied users share a rank, and a score nobody has any more doesn't count
+        self.assertEqual([LeaderboardScore.dense_rank(score) for score in (10, 7, 5, 4)], [1, 2, 3, 3])
+
+    def test_ranks_follow_solves(self):
+        users = [User.objects.create_user(f'user{i}', password='pw') for i in range(4)]
+        problems = [Problem.objects.create(title=f'P{i}', description='-', difficulty='Easy') for i in range(3)]
+        for user, solved in zip(users, (3, 2, 2, 1)):
+            for problem in problems[:solved]:
+                CodeSubmission.objects.create(user=user, problem=problem, language='py', code='print(1)',
+                                              verdict='Accepted')
+        counts = dict(LeaderboardScore.objects.filter(users__gt=0).values_list('score', 'users'))
+        self.assertEqual(counts, {3: 1, 2: 2, 1: 1})
+        LeaderboardScore.rebuild()
+        self.assertEqual(dict(LeaderboardScore.objects.values_list('score', 'users')), counts)
+
+        # The tie is split across two pages and still shares its rank
+        rows = []
+        with mock.patch.object(views, 'LEADERBOARD_PAGE_SIZE', 2), \
+                mock.patch.object(views, 'render_to_string') as render:
+            _, cursor = views._leaderboard_page(None)
+            rows += render.call_args.args[1]['ranked_rows']
+            _, cursor = views._leaderboard_page(views._parse_cursor(cursor))
+            rows += render.call_args.args[1]['ranked_rows']
+        self.assertEqual(cursor, '')
+        self.assertEqual([(rank, stats.user.username) for rank, stats in rows],
+                         [(1, 'user0'), (2, 'user1'), (2, 'user2'), (3, 'user3')])
@@ -1,14 +1,22 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 import calendar
 from django.utils import timezone
 from .forms import ProfilePictureForm
-from django.db.models import Count, Q, Case, When, IntegerField
+from django.db.models import Q
+from home.cache import get_or_build
+from backend.db_router import read_from_replica
+from .models import LeaderboardScore, UserSolveStats
+
+# Users per leaderboard page
+LEADERBOARD_PAGE_SIZE = 50
 
 @login_required
 def profile_view(request, username):
-    user = get_object_or_404(User, username=username)
+    # The profile and solve counts come along in the same query
+    user = get_object_or_404(User.objects.select_related('userprofile', 'solve_stats'), username=username)
     profile = user.userprofile
     
     today = timezone.now().date()
@@ -68,36 +76,64 @@ def edit_profile(request, username):
     return render(request, 'user_profile/edit_profile.html', context)
 
 @login_required
+@read_from_replica
 def leaderboard_view(request):
-    
-    users_with_scores = User.objects.annotate(
-        solved_easy=Count(
-            'codesubmission__problem',
-            filter=Q(codesubmission__verdict="Accepted", codesubmission__problem__difficulty='Easy'),
-            distinct=True
-        ),
-        solved_medium=Count(
-            'codesubmission__problem',
-            filter=Q(codesubmission__verdict="Accepted", codesubmission__problem__difficulty='Medium'),
-            distinct=True
-        ),
-        solved_hard=Count(
-            'codesubmission__problem',
-            filter=Q(codesubmission__verdict="Accepted", codesubmission__problem__difficulty='Hard'),
-            distinct=True
-        ),
-        # You can create a weighted score for ranking
-        total_score=Case(
-            When(solved_easy__gt=0, then=1),
-            When(solved_medium__gt=0, then=3),
-            When(solved_hard__gt=0, then=5),
-            default=0,
-            output_field=IntegerField()
-        ) * (Count('codesubmission__problem', filter=Q(codesubmission__verdict="Accepted"), distinct=True))
-    ).filter(total_score__gt=0).order_by('-total_score')
+    after = _parse_cursor(request.GET.get('after', ''))
+    if after is None:
+        # The first page is what nearly everyone looks at, so it is rendered once and cached until a verdict changes
+        leaderboard_rows, next_cursor = get_or_build('leaderboard_first_page', lambda: _leaderboard_page(None),
+                                                     groups=['leaderboard'])
+    else:
+        leaderboard_rows, next_cursor = _leaderboard_page(after)
+
+    my_rank = None
+    my_stats = UserSolveStats.objects.filter(user=request.user).first()
+    if my_stats and my_stats.score:
+        my_rank = LeaderboardScore.dense_rank(my_stats.score)
 
     context = {
-        'ranked_users': users_with_scores,
+        'leaderboard_rows': leaderboard_rows,
+        'next_cursor': next_cursor,
+        'is_first_page': after is None,
+        'my_rank': my_rank,
     }
+    return render(request, 'user_profile/leaderboard.html', context)
+
+
+def _parse_cursor(cursor):
+    # Keyset pagination: "<score>-<user id>" of the last row on the previous page
+    try:
+        score, user_id = cursor.split('-')
+        return int(score), int(user_id)
+    except ValueError:
+        return None
+
+
+def _leaderboard_page(after):
+    """
+    Renders one page of the leaderboard, starting after the (score, user id) cursor.
+    Returns the rows' HTML and the cursor of the next page ('' on the last page).
+    """
+    ranked = UserSolveStats.objects.filter(score__gt=0).select_related('user').order_by('-score', 'user_id')
+    if after is not None:
+        score, user_id = after
+        ranked = ranked.filter(Q(score__lt=score) | Q(score=score, user_id__gt=user_id))
+    page = list(ranked[:LEADERBOARD_PAGE_SIZE + 1])
+    next_cursor = ''
+    if len(page) > LEADERBOARD_PAGE_SIZE:
+        page = page[:LEADERBOARD_PAGE_SIZE]
+        next_cursor = f'{page[-1].score}-{page[-1].user_id}'
+
+    # Dense ranks: look up the first row's, then count score changes down the page
+    ranked_rows = []
+    rank = previous_score = None
+    for stats in page:
+        if rank is None:
+            rank = LeaderboardScore.dense_rank(stats.score)
+        elif stats.score != previous_score:
+            rank += 1
+        previous_score = stats.score
+        ranked_rows.append((rank, stats))
 
-    return render(request, 'user_profile/leaderboard.html', context)
\ No newline at end of file
+    leaderboard_rows = render_to_string('user_profile/leaderboard_rows.html', {'ranked_rows': ranked_rows})
+    return leaderboard_rows, next_cursor